@@ -3,14 +3,13 @@ import json
 import csv
 import time
 import threading
-import struct
 from datetime import datetime
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QGridLayout, QLabel, QLineEdit, 
                              QPushButton, QComboBox, QTextEdit, QGroupBox,
                              QFrame, QSplitter, QTabWidget, QProgressBar,
                              QMessageBox)
-from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt, QUrl, QObject, pyqtSlot
+from PyQt5.QtCore import QTimer, QThread, pyqtSignal, Qt, QUrl, QObject, pyqtSlot, QFile, QIODevice
 from PyQt5.QtGui import QFont, QPixmap, QPalette, QColor
 from PyQt5.QtWebEngineWidgets import QWebEngineView
 import folium
@@ -24,15 +23,88 @@ import serial.tools.list_ports
 from PyQt5.QtWebChannel import QWebChannel
 import math
 import subprocess
-# MBTiles server will be imported when needed
+from tile_prefetch import TilePrefetcher, HttpPrefetchSink, ServicePrefetchSink
+from mbtiles_server import create_tile_service, PooledHTTPServer, MBTilesHandler, MAX_ZOOM
+from tile_catalog import TileCatalog
+from telemetry_protocol import FrameDecoder, MSG_POSITION
+from mavlink_protocol import MavlinkDecoder, MavlinkState
+from telemetry_ingest import LatestSampleCoalescer, SampleBatcher, READ_TIMEOUT, BATCH_INTERVAL
+from telemetry_store import TelemetryStore, MODES, STATUSES, code, code_name
+try:
+    # Qt 5.12+: tile'lar GUI sürecinde mbtiles:// şemasıyla sunulur
+    from tile_scheme import register_tile_scheme, TileSchemeHandler, SCHEME as TILE_SCHEME, BASE_URL as TILE_SCHEME_URL
+except ImportError:
+    register_tile_scheme = None
+
+MODE_AUTONOMOUS = code(MODES, 'AUTONOMOUS')
+STATUS_CONNECTED = code(STATUSES, 'CONNECTED')
+STATUS_SIMULATION = code(STATUSES, 'SIMULATION')
+# Telemetri günlüğü bu kadar satırdan sonra en eskileri atar
+TELEMETRY_LOG_LINES = 1000
+# mbtiles_server.py alt sürecinin dinlemeye başlaması için beklenecek en uzun süre (saniye)
+SERVER_START_TIMEOUT = 10
+
+
+def telemetry_csv_rows(batch):
+    """CSV rows of a SAMPLE_DTYPE batch, in the columns save_telemetry_to_csv writes"""
+    # Örnek zamanları time.monotonic(); CSV'de duvar saati yazılır
+    offset = time.time() - time.monotonic()
+    return [[datetime.fromtimestamp(t + offset).strftime('%H:%M:%S'), lat, lon, alt, speed, battery,
+             code_name(MODES, mode), code_name(STATUSES, status)]
+            for t, lat, lon, alt, speed, battery, mode, status in batch.tolist()]
+
+
+def append_telemetry_csv(rows):
+    """Append telemetry rows to the daily CSV file with one open and write"""
+    filename = f"telemetry_{datetime.now().strftime('%Y%m%d')}.csv"
+    try:
+        with open(filename, 'a', newline='') as file:
+            csv.writer(file).writerows(rows)
+    except Exception as e:
+        print(f"Error saving telemetry data: {e}")
+
+def qwebchannel_js():
+    """qwebchannel.js from the QtWebChannel resources, to inline into the map page
+
+    Gömülü olarak verilir: sayfanın kökeni (mbtiles:// veya http://) qrc:// betiği
+    yükleyemeyebilir.
+    """
+    script = QFile(':/qtwebchannel/qwebchannel.js')
+    if not script.open(QIODevice.ReadOnly):
+        return ''
+    try:
+        return bytes(script.readAll()).decode('utf-8')
+    finally:
+        script.close()
+
+class MapBridge(QObject):
+    """Object the Leaflet page reaches over QWebChannel to report map events"""
+    zoom_changed = pyqtSignal(int)
+
+    @pyqtSlot(int)
+    def setZoom(self, zoom):
+        self.zoom_changed.emit(zoom)
 
 class TelemetryThread(QThread):
-    """Thread for handling telemetry data updates from serial port"""
+    """Thread for handling telemetry data updates from serial port
+
+    The port is drained at line rate; the GUI gets only the newest sample
+    once per interval seconds (the display rate), older ones are counted as stale.
+    Every sample, including stale ones, is kept in the columnar history store.
+    Positions come from our own frames or from MAVLink v2; speed, battery and
+    mode are the latest values the autopilot reported over MAVLink.
+    With batch_interval set, telemetry_batch instead delivers every sample as
+    one SAMPLE_DTYPE array per tick (or per full batch), not one dict per sample,
+    and the batch is written to the telemetry CSV on this thread.
+    """
     telemetry_updated = pyqtSignal(dict)
+    telemetry_batch = pyqtSignal(object)  # numpy SAMPLE_DTYPE dizisi, eskiden yeniye
     connection_status = pyqtSignal(bool, str)  # connected, message
     
-    def __init__(self, port='COM2', baudrate=57600, interval=1.0):
+    def __init__(self, port='COM2', baudrate=57600, interval=1.0, store=None, batch_interval=None):
         super().__init__()
+        self.batcher = SampleBatcher(batch_interval) if batch_interval else None
+        self.store = store if store is not None else TelemetryStore()
         self.running = False
         self.connected = False
         self.port = port
@@ -40,10 +112,15 @@ class TelemetryThread(QThread):
         self.interval = interval
         self.ser = None
         self.auto_reconnect = True
+        self.decoder = FrameDecoder()
+        self.mavlink = MavlinkDecoder()
+        self.mavlink_state = MavlinkState()
+        self.coalescer = LatestSampleCoalescer(1.0 / interval)
     
     def run(self):
         self.running = True
         sim_counter = 0
+        next_sim = time.monotonic()
         
         while self.running:
             # Seri port bağlantısını kontrol et
@@ -51,7 +128,9 @@ class TelemetryThread(QThread):
                 try:
                     if self.ser and self.ser.is_open:
                         self.ser.close()
-                    self.ser = serial.Serial(self.port, self.baudrate, timeout=1)
+                    self.ser = serial.Serial(self.port, self.baudrate, timeout=READ_TIMEOUT)
+                    self.decoder = FrameDecoder()
+                    self.mavlink = MavlinkDecoder()
                     self.connected = True
                     self.connection_status.emit(True, f"Connected to {self.port}")
                     print(f"Serial port {self.port} opened successfully.")
@@ -62,66 +141,109 @@ class TelemetryThread(QThread):
                     print("Running in simulation mode with mock telemetry data.")
                     self.ser = None
             
-            # Telemetry verisi gönder
-            if self.connected:
-                if self.ser and self.ser.is_open:
-                    # Gerçek serial port verisi (binary format)
-                    try:
-                        # 24 byte oku (3 x double = 24 byte)
-                        data = self.ser.read(24)
-                        if len(data) == 24:
-                            # Little-endian 3 double değer olarak parse et
-                            vals = struct.unpack('<3d', data)
-                            lat, lon, alt = vals
-                            
-                            telemetry_data = {
-                                'gps': {'lat': lat, 'lon': lon, 'alt': alt},
-                                'speed': 25.0 + (sim_counter % 10),
-                                'battery': max(85, 100 - (sim_counter % 15)),
-                                'mode': 'AUTONOMOUS',
-                                'status': 'CONNECTED',
-                                'timestamp': datetime.now().strftime('%H:%M:%S')
-                            }
-                            self.telemetry_updated.emit(telemetry_data)
-                            print(f"Gelen binary veri: lat={lat}, lon={lon}, alt={alt}")
-                        elif len(data) > 0:
-                            print(f"Beklenmeyen veri uzunluğu: {len(data)} byte")
-                    except Exception as read_err:
-                        print(f"Serial read error: {read_err}")
-                        # Bağlantı hatası durumunda simülasyon moduna geç
-                        self.connected = False
-                        self.connection_status.emit(False, f"Serial read error: {read_err}")
-                else:
-                    # Simülasyon verisi
-                    import random
-                    
-                    # Ankara merkez etrafında dairesel hareket
-                    center_lat = 39.9334
-                    center_lon = 32.8597
-                    radius = 0.001  # Yaklaşık 100m
-                    
-                    angle = (sim_counter * 0.1) % (2 * math.pi)
-                    lat = center_lat + radius * math.cos(angle)
-                    lon = center_lon + radius * math.sin(angle)
-                    alt = 100 + 20 * math.sin(angle * 2)
-                    
+            if not self.connected:
+                self.msleep(int(self.interval * 1000))
+                continue
+            
+            if self.ser and self.ser.is_open:
+                # Gerçek serial port verisi (çerçeveli binary format, telemetry_protocol.py)
+                try:
+                    # Bekleyen tüm baytları oku (yoksa en fazla READ_TIMEOUT bekle); kayan/bozuk
+                    # baytlardan sonra çözücü yeniden senkronlanır
+                    data = self.ser.read(self.ser.in_waiting or 1)
+                    now = time.monotonic()
+                    # Aynı baytlar iki çözücüye de verilir: özel çerçeveler (A5 5A) ve MAVLink v2 (FD)
+                    for msg_id, seq, vals in self.decoder.feed(data):
+                        if msg_id == MSG_POSITION:
+                            self.record_sample(now, *vals)
+                    state = self.mavlink_state
+                    for msg_id, sysid, compid, message in self.mavlink.feed(data):
+                        if state.update(msg_id, message):
+                            self.record_sample(now, state.lat, state.lon, state.alt)
+                except Exception as read_err:
+                    print(f"Serial read error: {read_err}")
+                    # Bağlantı hatası durumunda simülasyon moduna geç
+                    self.connected = False
+                    self.connection_status.emit(False, f"Serial read error: {read_err}")
+                    continue
+                if self.batcher is not None:
+                    self.emit_batch(self.batcher.poll())
+                    continue
+                row = self.coalescer.poll()
+                if row is not None:
+                    _, lat, lon, alt, speed, battery, mode, status = row
                     telemetry_data = {
                         'gps': {'lat': lat, 'lon': lon, 'alt': alt},
-                        'speed': 25.0 + random.uniform(-2, 2),
-                        'battery': max(85, 100 - (sim_counter % 15)),
-                        'mode': 'AUTONOMOUS',
-                        'status': 'SIMULATION',
-                        'timestamp': datetime.now().strftime('%H:%M:%S')
+                        'speed': speed,
+                        'battery': battery,
+                        'mode': MODES[mode],
+                        'status': STATUSES[status],
+                        'timestamp': datetime.now().strftime('%H:%M:%S'),
+                        'stale': self.coalescer.stale
                     }
                     self.telemetry_updated.emit(telemetry_data)
-            
-            sim_counter += 1
-            self.msleep(int(self.interval * 1000))
+                    print(f"Gelen veri: lat={lat}, lon={lon}, alt={alt}, hız={speed:.1f}, batarya={battery:.0f}, "
+                          f"mod={MODES[mode]} (atlanan eski örnek: {self.coalescer.stale})")
+            else:
+                # Simülasyon verisi
+                import random
+                
+                self.msleep(max(0, int((next_sim - time.monotonic()) * 1000)))
+                next_sim = max(next_sim + self.interval, time.monotonic())
+                
+                # Ankara merkez etrafında dairesel hareket
+                center_lat = 39.9334
+                center_lon = 32.8597
+                radius = 0.001  # Yaklaşık 100m
+                
+                angle = (sim_counter * 0.1) % (2 * math.pi)
+                lat = center_lat + radius * math.cos(angle)
+                lon = center_lon + radius * math.sin(angle)
+                alt = 100 + 20 * math.sin(angle * 2)
+                
+                telemetry_data = {
+                    'gps': {'lat': lat, 'lon': lon, 'alt': alt},
+                    'speed': 25.0 + random.uniform(-2, 2),
+                    'battery': max(85, 100 - (sim_counter % 15)),
+                    'mode': 'AUTONOMOUS',
+                    'status': 'SIMULATION',
+                    'timestamp': datetime.now().strftime('%H:%M:%S'),
+                    'stale': 0
+                }
+                row = (time.monotonic(), lat, lon, alt, telemetry_data['speed'],
+                       telemetry_data['battery'], MODE_AUTONOMOUS, STATUS_SIMULATION)
+                self.store.append(*row)
+                if self.batcher is not None:
+                    # Dolan parti hemen gönderilir (record_sample ile aynı yol), sonra süre kontrolü
+                    self.emit_batch(self.batcher.add(row))
+                    self.emit_batch(self.batcher.poll())
+                else:
+                    self.telemetry_updated.emit(telemetry_data)
+                sim_counter += 1
         
         if self.ser and self.ser.is_open:
             self.ser.close()
             print(f"Serial port {self.port} closed.")
     
+    def record_sample(self, now, lat, lon, alt):
+        """Store one received position with the latest MAVLink speed, battery and mode"""
+        state = self.mavlink_state
+        row = (now, lat, lon, alt, state.speed, state.battery, code(MODES, state.mode), STATUS_CONNECTED)
+        self.store.append(*row)
+        if self.batcher is not None:
+            self.emit_batch(self.batcher.add(row))
+        else:
+            self.coalescer.offer(row)
+
+    def emit_batch(self, batch):
+        """Deliver a batch to the GUI in one queued signal; returns whether one was sent"""
+        if batch is None:
+            return False
+        # Dosya yazımı GUI iş parçacığını bekletmesin
+        append_telemetry_csv(telemetry_csv_rows(batch))
+        self.telemetry_batch.emit(batch)
+        return True
+
     def stop(self):
         self.running = False
         self.auto_reconnect = False
@@ -136,6 +258,22 @@ class TelemetryThread(QThread):
         if self.ser and self.ser.is_open:
             self.ser.close()
     
+    def set_display_rate(self, rate):
+        """Change how many telemetry updates per second reach the GUI
+
+        With batching this is the batch tick; otherwise the coalescer rate
+        (and the simulation rate, since every simulated sample is shown).
+        """
+        if self.batcher is not None:
+            self.batcher.interval = 1.0 / rate
+            return
+        self.interval = 1.0 / rate
+        self.coalescer.period = self.interval
+
+    def display_rate(self):
+        """Telemetry updates per second the GUI currently gets"""
+        return 1.0 / (self.batcher.interval if self.batcher is not None else self.interval)
+
     def set_baudrate(self, baudrate):
         """Change the baudrate"""
         self.baudrate = baudrate
@@ -144,10 +282,20 @@ class TelemetryThread(QThread):
             self.ser.close()
 
 class GroundControlStation(QMainWindow):
+    tileset_catalog_changed = pyqtSignal()
+
     def __init__(self):
         super().__init__()
-        self.telemetry_thread = TelemetryThread(port='COM2', baudrate=57600, interval=1.0)
+        # Uçuş geçmişi: grafik ve analizler dict yerine bu sütunlu depodan okur
+        self.telemetry_store = TelemetryStore()
+        # True: arayüz BATCH_INTERVAL aralıklı toplu dizilerle güncellenir (tüm örnekler CSV'ye);
+        # False: görüntüleme hızında yalnızca en yeni örnek. Hız arayüzden değişir (Display rate)
+        self.batch_telemetry = True
+        self.telemetry_thread = TelemetryThread(port='COM2', baudrate=57600, interval=1.0,
+                                                store=self.telemetry_store,
+                                                batch_interval=BATCH_INTERVAL if self.batch_telemetry else None)
         self.telemetry_thread.telemetry_updated.connect(self.update_telemetry)
+        self.telemetry_thread.telemetry_batch.connect(self.update_telemetry_batch)
         self.telemetry_thread.connection_status.connect(self.on_connection_status)
         self.telemetry_thread.start()
         
@@ -157,16 +305,52 @@ class GroundControlStation(QMainWindow):
         self.camera_fps = 30
         
         # MBTiles server setup
+        self.map_dir = 'map'  # Sunucu bu dizindeki tüm tile setlerini yayınlar
         self.mbtiles_path = 'map/map.mbtiles'  # Dizindeki map.mbtiles dosyası
         self.mbtiles_port = 8080
-        self.tile_server_proc = None  # mbtiles_server.py başlatmak için
+        self.overzoom_levels = 3  # Son zoom seviyesinin ötesinde atadan büyütülen seviye sayısı
+        self.tile_server_proc = None  # mbtiles_server.py başlatmak için (mbtiles:// yoksa)
+        self.share_tiles_over_http = False  # Harici istemciler için aynı servisi HTTP'den de yayınla
+        self.http_tile_server = None
+        # Harita listesi, sınırlar ve merkez katalogdan gelir; dizin arka planda izlenir
+        self.tile_catalog = TileCatalog(self.map_dir)
+        # İzleyici iş parçacığından gelen değişiklikler (ilk tarama dahil) GUI iş parçacığında,
+        # arayüz kurulduktan sonra işlenir
+        self.tileset_catalog_changed.connect(self.refresh_maps, Qt.QueuedConnection)
+        self.tile_catalog.add_listener(lambda changed: self.tileset_catalog_changed.emit())
+        self.tile_catalog.start_watching()
+        if self.tile_catalog.get(self.tileset_name()) is None and self.tile_catalog.names():
+            self.mbtiles_path = self.tile_catalog.path(self.tile_catalog.names()[0])
+        self.tile_service = None
+        if register_tile_scheme is not None and os.path.isdir(self.map_dir):
+            self.tile_service = create_tile_service(self.map_dir, default=self.tileset_name(),
+                                                    overzoom_levels=self.overzoom_levels,
+                                                    catalog=self.tile_catalog)
+        
+        # Uçağın altındaki ve önündeki tile'ları sunucu önbelleğine önceden yükle
+        if self.tile_service is not None:
+            prefetch_sink = ServicePrefetchSink(self.tile_service)
+        else:
+            prefetch_sink = HttpPrefetchSink(port=self.mbtiles_port)
+        self.tile_prefetcher = TilePrefetcher(prefetch_sink, tileset=self.tileset_name())
+        # Sayfa zoomend'de görünen zoom'u bildirir; önyükleme o seviye ve komşularını hedefler
+        self.map_bridge = MapBridge()
+        self.map_bridge.zoom_changed.connect(self.on_map_zoom)
+        self.on_map_zoom(self.initial_view()[2])
+        self.telemetry_thread.telemetry_updated.connect(self.tile_prefetcher.on_telemetry)
+        self.telemetry_thread.telemetry_batch.connect(self.tile_prefetcher.on_telemetry_batch)
+        self.tile_prefetcher.start()
         
         # Harita seçimi için
         self.available_maps = self.get_available_maps()
         
+        # Leaflet de tile sunucusundan yüklendiği için sunucu sayfadan önce başlar
+        if self.tile_service is None:
+            self.start_mbtiles_server_subprocess()  # mbtiles_server.py başlat
+        elif self.share_tiles_over_http:
+            self.start_http_tile_server()
         self.init_ui()
         self.setup_timers()
-        self.start_mbtiles_server_subprocess()  # mbtiles_server.py başlat
         
     def init_ui(self):
         self.setWindowTitle("Ground Control Station")
@@ -226,6 +410,16 @@ class GroundControlStation(QMainWindow):
         baud_layout.addWidget(self.baud_combo)
         serial_layout.addLayout(baud_layout)
         
+        # Arayüz güncelleme hızı (Hz); port her örneği okumaya devam eder
+        rate_layout = QHBoxLayout()
+        rate_layout.addWidget(QLabel("Display rate (Hz):"))
+        self.rate_combo = QComboBox()
+        self.rate_combo.addItems(['1', '2', '5', '10'])
+        self.rate_combo.setCurrentText(f"{self.telemetry_thread.display_rate():g}")
+        self.rate_combo.currentTextChanged.connect(self.on_display_rate_changed)
+        rate_layout.addWidget(self.rate_combo)
+        serial_layout.addLayout(rate_layout)
+        
         # Connection control
         conn_layout = QHBoxLayout()
         self.connect_serial_btn = QPushButton("Connect")
@@ -250,7 +444,7 @@ class GroundControlStation(QMainWindow):
         map_layout.addWidget(self.map_combo)
         
         self.refresh_maps_btn = QPushButton("Haritaları Yenile")
-        self.refresh_maps_btn.clicked.connect(self.refresh_maps)
+        self.refresh_maps_btn.clicked.connect(self.rescan_maps)
         map_layout.addWidget(self.refresh_maps_btn)
         
         self.change_map_btn = QPushButton("Haritayı Değiştir")
@@ -351,6 +545,7 @@ class GroundControlStation(QMainWindow):
         self.telemetry_log = QTextEdit()
         self.telemetry_log.setMaximumHeight(200)
         self.telemetry_log.setReadOnly(True)
+        self.telemetry_log.document().setMaximumBlockCount(TELEMETRY_LOG_LINES)
         log_layout.addWidget(self.telemetry_log)
         
         layout.addWidget(log_group)
@@ -371,8 +566,15 @@ class GroundControlStation(QMainWindow):
         # QWebEngineView ile Leaflet harita
         self.map_view = QWebEngineView()
         self.web_channel = QWebChannel()
+        self.web_channel.registerObject('gcs', self.map_bridge)
         self.map_view.page().setWebChannel(self.web_channel)
-        self.map_view.setHtml(self.leaflet_html(), QUrl(""))
+        if self.tile_service is not None:
+            self.tile_scheme_handler = TileSchemeHandler(self.tile_service, parent=self)
+            self.map_view.page().profile().installUrlSchemeHandler(TILE_SCHEME, self.tile_scheme_handler)
+            # Sayfa da mbtiles:// kökenli: /batch ve /static istekleri aynı kökenden
+            self.map_view.setHtml(self.leaflet_html(), QUrl(TILE_SCHEME_URL))
+        else:
+            self.map_view.setHtml(self.leaflet_html(), QUrl(""))
         layout.addWidget(self.map_view)
         
         return panel
@@ -505,33 +707,131 @@ class GroundControlStation(QMainWindow):
             <meta charset="utf-8" />
             <title>Offline Map</title>
             <meta name="viewport" content="width=device-width, initial-scale=1.0">
-            <link rel="stylesheet" href="https://unpkg.com/leaflet@1.7.1/dist/leaflet.css" />
-            <script src="https://unpkg.com/leaflet@1.7.1/dist/leaflet.js"></script>
+            <link rel="stylesheet" href="{self.tile_base_url()}static/leaflet-1.7.1/leaflet.css" />
+            <script src="{self.tile_base_url()}static/leaflet-1.7.1/leaflet.js"></script>
+            <script src="{self.tile_base_url()}static/tile_batch.js"></script>
+            <script>{qwebchannel_js()}</script>
         </head>
         <body style="margin:0;">
         <div id="map" style="width: 100vw; height: 97vh;"></div>
         <script>
-            var map = L.map('map').setView([39.9334, 32.8597], 14);
-            L.tileLayer('http://127.0.0.1:{self.mbtiles_port}/tiles/{{z}}/{{x}}/{{y}}.png', {{
+            var map = L.map('map').setView({json.dumps(self.initial_view()[:2])}, {self.initial_view()[2]});
+            var tileBaseUrl = '{self.tile_base_url()}tiles/';
+            var batchBaseUrl = '{self.tile_base_url()}batch/';
+            var tileOptions = {{
                 maxZoom: 18,
                 minZoom: 0,
                 attribution: 'HAYTÜRK Offline Map'
-            }}).addTo(map);
+            }};
+            // Görünümdeki tüm tile'lar tek /batch isteğiyle gelir; yükleyici yoksa tek tek
+            var tileLayer = (L.tileLayer.batch
+                ? L.tileLayer.batch(tileBaseUrl + '{self.tileset_name()}/{{z}}/{{x}}/{{y}}.png',
+                                    batchBaseUrl + '{self.tileset_name()}', tileOptions)
+                : L.tileLayer(tileBaseUrl + '{self.tileset_name()}/{{z}}/{{x}}/{{y}}.png', tileOptions)).addTo(map);
+            // Harita değişimi: sunucu yeniden başlatılmadan sadece katman URL'si değişir
+            window.setTileset = function(name, view) {{
+                var url = tileBaseUrl + name + '/{{z}}/{{x}}/{{y}}.png';
+                if (view) {{
+                    map.setView([view[0], view[1]], view[2]);
+                }}
+                if (tileLayer.setUrls) {{
+                    tileLayer.setUrls(url, batchBaseUrl + name);
+                }} else {{
+                    tileLayer.setUrl(url);
+                }}
+                applyTilesetInfo(name);
+            }};
+            // Katmanı tile setinin gerçek zoom aralığı ve sınırlarıyla kısıtla. XHR: QtWebEngine 5
+            // mbtiles:// gibi özel şemalarda fetch() desteklemez
+            function applyTilesetInfo(name) {{
+                var xhr = new XMLHttpRequest();
+                xhr.open('GET', tileBaseUrl + name + '/info.json');
+                xhr.responseType = 'json';
+                xhr.onload = function() {{
+                    var info = xhr.response;
+                    if ((xhr.status && xhr.status !== 200) || !info || info.minzoom === null) return;
+                    tileLayer.options.minZoom = info.minzoom;
+                    tileLayer.options.maxZoom = info.overzoom_maxzoom || info.maxzoom;
+                    var b = info.bounds;
+                    tileLayer.options.bounds = b ? L.latLngBounds([b[1], b[0]], [b[3], b[2]]) : undefined;
+                    // Haritanın zoom sınırları katman eklenirken hesaplanır: yeniden ekleyince
+                    // yeni aralık haritaya da uygulanır (redraw yalnızca tile'ları yeniler)
+                    map.removeLayer(tileLayer);
+                    tileLayer.addTo(map);
+                }};
+                xhr.send();
+            }}
+            applyTilesetInfo('{self.tileset_name()}');
+            // Görünen zoom uygulamaya bildirilir (tile önyükleme bu seviyeyi hedefler)
+            if (window.QWebChannel && window.qt && qt.webChannelTransport) {{
+                new QWebChannel(qt.webChannelTransport, function(channel) {{
+                    var reportZoom = function() {{ channel.objects.gcs.setZoom(Math.round(map.getZoom())); }};
+                    map.on('zoomend', reportZoom);
+                    reportZoom();
+                }});
+            }}
             var marker = L.marker([39.9334, 32.8597]).addTo(map).bindPopup('Ankara');
         </script>
         </body>
         </html>
         '''
 
+    def initial_view(self, name=None):
+        """[lat, lon, zoom] to open a tileset at, from its catalog entry (Ankara if unknown)"""
+        entry = self.tile_catalog.get(name or self.tileset_name())
+        if entry is None or entry['center'] is None:
+            return [39.9334, 32.8597, 14]
+        lon, lat, zoom = entry['center']
+        return [lat, lon, zoom]
+
+    def tile_base_url(self):
+        """Root URL the map page loads tiles from: in-process scheme or the HTTP server"""
+        if self.tile_service is not None:
+            return TILE_SCHEME_URL
+        return f'http://127.0.0.1:{self.mbtiles_port}/'
+
+    def start_http_tile_server(self):
+        """Serve the in-process tile service over HTTP for external clients"""
+        try:
+            self.http_tile_server = PooledHTTPServer(('127.0.0.1', self.mbtiles_port), MBTilesHandler,
+                                                     self.tile_service)
+        except OSError as e:
+            print(f"HTTP tile server could not start on {self.mbtiles_port}: {e}")
+            return
+        threading.Thread(target=self.http_tile_server.serve_forever, daemon=True).start()
+        print(f"HTTP tile server started: {self.mbtiles_port}")
+
+    def tileset_name(self):
+        """Tile set name of the current map as mounted by mbtiles_server.py"""
+        return os.path.splitext(os.path.basename(self.mbtiles_path))[0]
+
     def start_mbtiles_server_subprocess(self):
         python_exe = sys.executable
         tile_server_script = os.path.join(os.path.dirname(__file__), 'mbtiles_server.py')
-        if os.path.exists(tile_server_script) and os.path.exists(self.mbtiles_path):
-            self.tile_server_proc = subprocess.Popen([python_exe, tile_server_script, self.mbtiles_path, str(self.mbtiles_port)],
+        if os.path.exists(tile_server_script) and os.path.isdir(self.map_dir):
+            self.tile_server_proc = subprocess.Popen([python_exe, tile_server_script, self.map_dir, str(self.mbtiles_port),
+                                                      '--default', self.tileset_name(),
+                                                      '--overzoom', str(self.overzoom_levels)],
                                                     stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
             print(f"mbtiles_server.py başlatıldı: {self.mbtiles_port}")
+            # Sayfa Leaflet'i bu sunucudan yükler ve başarısız betiği yeniden denemez:
+            # sayfa yüklenmeden önce sunucunun dinlemeye başlamasını bekle
+            if not self.wait_for_tile_server():
+                print(f"mbtiles_server.py {SERVER_START_TIMEOUT} s içinde yanıt vermedi")
         else:
-            print(f"mbtiles_server.py veya map.mbtiles bulunamadı!")
+            print(f"mbtiles_server.py veya {self.map_dir} dizini bulunamadı!")
+
+    def wait_for_tile_server(self, timeout=None):
+        """Poll /tilesets.json until the tile server subprocess answers; False on timeout or exit"""
+        deadline = time.monotonic() + (SERVER_START_TIMEOUT if timeout is None else timeout)
+        while time.monotonic() < deadline and self.tile_server_proc.poll() is None:
+            try:
+                if requests.get(f'{self.tile_base_url()}tilesets.json', timeout=1).status_code == 200:
+                    return True
+            except requests.RequestException:
+                pass
+            time.sleep(0.1)
+        return False
             
     def update_camera_fps(self):
         """Update camera FPS display"""
@@ -542,6 +842,50 @@ class GroundControlStation(QMainWindow):
             
     def update_telemetry(self, data):
         """Update telemetry displays with new data"""
+        self.show_telemetry(data)
+        
+        # Update telemetry log
+        self.telemetry_log.append(self.telemetry_log_line(data))
+        
+        # Save to CSV
+        self.save_telemetry_to_csv(data)
+        
+        # Update map with new position
+        self.update_map_position(data['gps'])
+        
+    def update_telemetry_batch(self, batch):
+        """Slot for TelemetryThread.telemetry_batch: one GUI update per batch
+        
+        Etiketler ve harita en yeni örnekle güncellenir, günlüğe parti başına
+        tek özet satırı yazılır (CSV'yi telemetri iş parçacığı yazar).
+        """
+        if not len(batch):
+            return
+        # Örnek zamanları time.monotonic(); günlük için duvar saatine çevrilir
+        latest = self.batch_sample(batch[-1].tolist(), time.time() - time.monotonic())
+        self.show_telemetry(latest)
+        speed = batch['speed']
+        self.telemetry_log.append(
+            f"[{latest['timestamp']}] {len(batch)} samples | GPS: ({latest['gps']['lat']:.6f}, "
+            f"{latest['gps']['lon']:.6f}) | Speed: {speed.min():.1f}-{speed.max():.1f} m/s | "
+            f"Battery: {latest['battery']:.1f}% | Mode: {latest['mode']}\n")
+        self.update_map_position(latest['gps'])
+        
+    @staticmethod
+    def batch_sample(row, offset):
+        """Telemetry dict (as emitted by telemetry_updated) of one SAMPLE_DTYPE row"""
+        t, lat, lon, alt, speed, battery, mode, status = row
+        return {
+            'timestamp': datetime.fromtimestamp(t + offset).strftime('%H:%M:%S'),
+            'gps': {'lat': lat, 'lon': lon, 'alt': alt},
+            'speed': speed,
+            'battery': battery,
+            'mode': code_name(MODES, mode),
+            'status': code_name(STATUSES, status),
+        }
+        
+    def show_telemetry(self, data):
+        """Update the telemetry labels"""
         # Update GPS data
         self.lat_label.setText(f"{data['gps']['lat']:.6f}")
         self.lon_label.setText(f"{data['gps']['lon']:.6f}")
@@ -562,38 +906,24 @@ class GroundControlStation(QMainWindow):
         # Update mode
         self.mode_status_label.setText(f"Mode: {data['mode']}")
         
-        # Update telemetry log
-        log_entry = f"[{data['timestamp']}] GPS: ({data['gps']['lat']:.6f}, {data['gps']['lon']:.6f}) | Speed: {data['speed']:.1f} m/s | Battery: {data['battery']:.1f}% | Mode: {data['mode']}\n"
-        self.telemetry_log.append(log_entry)
-        
-        # Save to CSV
-        self.save_telemetry_to_csv(data)
-        
-        # Update map with new position
-        self.update_map_position(data['gps'])
+    def telemetry_log_line(self, data):
+        return f"[{data['timestamp']}] GPS: ({data['gps']['lat']:.6f}, {data['gps']['lon']:.6f}) | Speed: {data['speed']:.1f} m/s | Battery: {data['battery']:.1f}% | Mode: {data['mode']}\n"
+        
+    def telemetry_csv_row(self, data):
+        return [
+            data['timestamp'],
+            data['gps']['lat'],
+            data['gps']['lon'],
+            data['gps']['alt'],
+            data['speed'],
+            data['battery'],
+            data['mode'],
+            data['status']
+        ]
         
     def save_telemetry_to_csv(self, data):
         """Save telemetry data to CSV file"""
-        filename = f"telemetry_{datetime.now().strftime('%Y%m%d')}.csv"
-        
-        # Create CSV file with headers if it doesn't exist
-        try:
-            with open(filename, 'a', newline='') as file:
-                writer = csv.writer(file)
-                
-                # Write data
-                writer.writerow([
-                    data['timestamp'],
-                    data['gps']['lat'],
-                    data['gps']['lon'],
-                    data['gps']['alt'],
-                    data['speed'],
-                    data['battery'],
-                    data['mode'],
-                    data['status']
-                ])
-        except Exception as e:
-            print(f"Error saving telemetry data: {e}")
+        append_telemetry_csv([self.telemetry_csv_row(data)])
             
     def update_map_position(self, gps_data):
         """Update map with new aircraft position"""
@@ -605,6 +935,15 @@ class GroundControlStation(QMainWindow):
         """
         self.map_view.page().runJavaScript(js_code)
         
+    def on_map_zoom(self, zoom):
+        """Prefetch around the zoom level the map shows: one level out, the level itself, one in"""
+        zoom = min(max(int(zoom), 0), MAX_ZOOM)
+        self.tile_prefetcher.set_zooms(range(max(0, zoom - 1), min(zoom + 1, MAX_ZOOM) + 1))
+        
+    def on_display_rate_changed(self, rate):
+        """Handle display rate selection change"""
+        self.telemetry_thread.set_display_rate(float(rate))
+        
     def on_mode_changed(self, mode):
         """Handle mode selection change"""
         self.current_mode = mode
@@ -718,15 +1057,7 @@ class GroundControlStation(QMainWindow):
     
     def get_available_maps(self):
         """Get list of available map files in the map directory"""
-        maps = []
-        map_dir = 'map'
-        
-        if os.path.exists(map_dir):
-            for file in os.listdir(map_dir):
-                if file.endswith('.mbtiles'):
-                    maps.append(os.path.join(map_dir, file))
-        
-        return maps
+        return [self.tile_catalog.path(name) for name in self.tile_catalog.names()]
     
     def refresh_maps(self):
         """Refresh the available maps list and update combo box"""
@@ -738,11 +1069,20 @@ class GroundControlStation(QMainWindow):
                 map_name = os.path.basename(map_path)
                 self.map_combo.addItem(map_name, map_path)
             
-            # Select the first map by default
-            if self.map_combo.count() > 0:
-                self.map_combo.setCurrentIndex(0)
+            # Gösterilen harita seçili kalır; yoksa ilk harita
+            current = self.map_combo.findData(os.path.abspath(self.mbtiles_path))
+            self.map_combo.setCurrentIndex(max(current, 0))
         else:
             self.map_combo.addItem("No maps found")
+
+    def rescan_maps(self):
+        """Rescan the map directory now instead of waiting for the catalog watcher
+
+        Tarama izleyici iş parçacığında yapılır; değişiklik varsa liste
+        tileset_catalog_changed ile yeniden doldurulur.
+        """
+        self.refresh_maps()
+        self.tile_catalog.request_refresh()
     
     def change_map(self):
         """Change the current map"""
@@ -752,24 +1092,37 @@ class GroundControlStation(QMainWindow):
                 self.mbtiles_path = new_map_path
                 self.telemetry_log.append(f"[{datetime.now().strftime('%H:%M:%S')}] Map changed to: {os.path.basename(new_map_path)}\n")
                 
-                # Restart the tile server with new map
-                if self.tile_server_proc:
-                    self.tile_server_proc.terminate()
-                    self.tile_server_proc.wait()
-                self.start_mbtiles_server_subprocess()
+                # Sunucu tüm tile setlerini zaten yayınlıyor; sadece Leaflet katmanını değiştir
+                if self.tile_service is None and (self.tile_server_proc is None
+                                                  or self.tile_server_proc.poll() is not None):
+                    self.start_mbtiles_server_subprocess()
+                self.tile_prefetcher.set_tileset(self.tileset_name())
+                self.map_view.page().runJavaScript(f"window.setTileset({json.dumps(self.tileset_name())}, "
+                                                   f"{json.dumps(self.initial_view())});")
     
     def closeEvent(self, event):
         """Handle application close event"""
         self.telemetry_thread.stop()
+        self.tile_prefetcher.stop()
         
         # Shutdown MBTiles server
         if self.tile_server_proc:
             self.tile_server_proc.terminate()
             self.tile_server_proc.wait()
+        if getattr(self, 'tile_scheme_handler', None) is not None:
+            self.tile_scheme_handler.close()
+        if self.http_tile_server is not None:
+            self.http_tile_server.shutdown()
+            self.http_tile_server.server_close()  # Paylaşılan servisi de kapatır
+        elif self.tile_service is not None:
+            self.tile_service.close()
+        self.tile_catalog.close()
         
         event.accept()
 
 def main():
+    if register_tile_scheme is not None:
+        register_tile_scheme()
     app = QApplication(sys.argv)
     
     # Set application properties
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+"""
+MAVLink Protocol Module
+MAVLink v2 framing, CRC_EXTRA checking and decoding of the flight messages
+the ground station displays, plus a small state that folds them into one
+telemetry sample
+
+Çerçeve (little-endian):
+    FD | uzunluk | incompat | compat | sıra no | sysid | compid | msgid (3 bayt) | veri | CRC (u16) [| imza (13 bayt)]
+CRC, X.25 (CRC-16/MCRF4XX) ile uzunluk alanından verinin sonuna kadar, mesaja
+özgü CRC_EXTRA baytı da eklenerek hesaplanır. v2'de verinin sonundaki sıfır
+baytlar gönderilmez; çözücü eksik kısmı sıfırla tamamlar. MAVLink v1 (FE)
+çerçeveleri tanınmaz ve atlanan bayt olarak sayılır.
+"""
+
+import argparse
+import time
+from collections import namedtuple
+from struct import Struct
+
+STX = 0xFD
+HEADER = Struct('<BBBBBBBHB')  # stx, len, incompat, compat, seq, sysid, compid, msgid (alt 16 + üst 8 bit)
+CRC = Struct('<H')
+SIGNATURE_SIZE = 13
+INCOMPAT_SIGNED = 0x01
+MAX_PAYLOAD = 255
+
+MSG_HEARTBEAT = 0
+MSG_SYS_STATUS = 1
+MSG_GPS_RAW_INT = 24
+MSG_ATTITUDE = 30
+MSG_GLOBAL_POSITION_INT = 33
+MSG_VFR_HUD = 74
+
+
+class Message:
+    """Wire layout of one message: fields in MAVLink wire order (largest type first)"""
+
+    def __init__(self, msg_id, name, crc_extra, layout, fields):
+        self.msg_id = msg_id
+        self.name = name
+        self.crc_extra = crc_extra
+        self.layout = Struct(layout)
+        self.type = namedtuple(name, fields)
+        self.zeros = bytes(self.layout.size)
+
+    def unpack_from(self, buffer, offset, length):
+        """Message tuple of a payload of length bytes at offset (trimmed payloads zero-filled)"""
+        if length >= self.layout.size:
+            # Uzantı alanları (daha uzun veri) yok sayılır
+            return self.type._make(self.layout.unpack_from(buffer, offset))
+        payload = bytes(buffer[offset:offset + length]) + self.zeros[length:]
+        return self.type._make(self.layout.unpack(payload))
+
+    def pack(self, *values):
+        """Payload with trailing zero bytes trimmed, as MAVLink v2 senders do"""
+        payload = self.layout.pack(*values).rstrip(b'\x00')
+        return payload or b'\x00'
+
+
+MESSAGES = {message.msg_id: message for message in (
+    Message(MSG_HEARTBEAT, 'HEARTBEAT', 50, '<IBBBBB',
+            'custom_mode type autopilot base_mode system_status mavlink_version'),
+    Message(MSG_SYS_STATUS, 'SYS_STATUS', 124, '<IIIHHhHHHHHHb',
+            'onboard_control_sensors_present onboard_control_sensors_enabled onboard_control_sensors_health '
+            'load voltage_battery current_battery drop_rate_comm errors_comm '
+            'errors_count1 errors_count2 errors_count3 errors_count4 battery_remaining'),
+    Message(MSG_GPS_RAW_INT, 'GPS_RAW_INT', 24, '<QiiiHHHHBB',
+            'time_usec lat lon alt eph epv vel cog fix_type satellites_visible'),
+    Message(MSG_ATTITUDE, 'ATTITUDE', 39, '<I6f',
+            'time_boot_ms roll pitch yaw rollspeed pitchspeed yawspeed'),
+    Message(MSG_GLOBAL_POSITION_INT, 'GLOBAL_POSITION_INT', 104, '<IiiiihhhH',
+            'time_boot_ms lat lon alt relative_alt vx vy vz hdg'),
+    Message(MSG_VFR_HUD, 'VFR_HUD', 20, '<ffffhH',
+            'airspeed groundspeed alt climb heading throttle'),
+)}
+
+
+def _crc_table():
+    table = []
+    for byte in range(256):
+        crc = byte
+        for _ in range(8):
+            crc = (crc >> 1) ^ 0x8408 if crc & 1 else crc >> 1
+        table.append(crc)
+    return tuple(table)
+
+
+CRC_TABLE = _crc_table()
+
+
+def x25_crc(data, crc=0xFFFF):
+    """CRC-16/MCRF4XX (MAVLink's X.25 checksum) of data, continuing from crc
+
+    binascii.crc_hqx aynı polinomu yansıtılmamış bit sırasıyla hesapladığı için
+    burada kullanılamaz; tablo ile bayt başına bir adım.
+    """
+    table = CRC_TABLE
+    for byte in data:
+        crc = (crc >> 8) ^ table[(crc ^ byte) & 0xFF]
+    return crc
+
+
+def encode_message(msg_id, values, seq, sysid=1, compid=1):
+    """One unsigned MAVLink v2 frame of a known message"""
+    message = MESSAGES[msg_id]
+    payload = message.pack(*values)
+    frame = bytearray(HEADER.pack(STX, len(payload), 0, 0, seq & 0xFF, sysid, compid,
+                                  msg_id & 0xFFFF, msg_id >> 16))
+    frame += payload
+    crc = x25_crc(memoryview(frame)[1:])
+    frame += CRC.pack(x25_crc((message.crc_extra,), crc))
+    return bytes(frame)
+
+
+class MavlinkDecoder:
+    """Pulls every complete MAVLink v2 frame out of a byte stream fed in arbitrary chunks
+
+    Works like telemetry_protocol.FrameDecoder: one reusable bytearray,
+    frames parsed in place through a memoryview, and a bad CRC costs one
+    byte of resync. Frames of messages not in `messages` cannot be checked
+    (their CRC_EXTRA is unknown), so they are counted and resynced over the
+    same way instead of trusting their length.
+    """
+
+    def __init__(self, messages=MESSAGES):
+        self.messages = messages
+        self.buffer = bytearray()
+        self.frames = 0
+        self.bad_frames = 0
+        self.unknown_frames = 0
+        self.skipped_bytes = 0
+        self.lost_frames = 0
+        self._last_seq = {}
+
+    def feed(self, data):
+        """Add received bytes; returns [(msg_id, sysid, compid, message)] for every known frame"""
+        buffer = self.buffer
+        buffer += data
+        decoded = []
+        pos = 0
+        end = len(buffer)
+        with memoryview(buffer) as view:
+            while True:
+                start = buffer.find(STX, pos)
+                if start < 0:
+                    self.skipped_bytes += end - pos
+                    pos = end
+                    break
+                self.skipped_bytes += start - pos
+                pos = start
+                if end - start < HEADER.size:
+                    break
+                _, length, incompat, _, seq, sysid, compid, msg_low, msg_high = HEADER.unpack_from(buffer, start)
+                if incompat & ~INCOMPAT_SIGNED:
+                    # Bilinmeyen uyumsuzluk bayrağı: gerçek bir çerçeve değil ya da çözülemez
+                    self.bad_frames += 1
+                    pos = start + 1
+                    continue
+                msg_id = msg_low | msg_high << 16
+                message = self.messages.get(msg_id)
+                if message is None:
+                    # Doğrulanamaz: atlamak yerine bir bayt ilerlenir, yanlış bir FD arkasındaki
+                    # gerçek çerçeve kaybolmaz (bilinmeyen mesajın baytları atlanan sayılır)
+                    self.unknown_frames += 1
+                    pos = start + 1
+                    continue
+                payload_start = start + HEADER.size
+                crc_end = payload_start + length
+                frame_end = crc_end + CRC.size + (SIGNATURE_SIZE if incompat & INCOMPAT_SIGNED else 0)
+                if frame_end > end:
+                    break
+                crc = x25_crc(view[start + 1:crc_end])
+                if x25_crc((message.crc_extra,), crc) != CRC.unpack_from(buffer, crc_end)[0]:
+                    self.bad_frames += 1
+                    pos = start + 1
+                    continue
+                decoded.append((msg_id, sysid, compid, message.unpack_from(buffer, payload_start, length)))
+                self.frames += 1
+                # Sıra numarası her gönderici (sysid, compid) için ayrı sayılır
+                last = self._last_seq.get((sysid, compid))
+                if last is not None:
+                    self.lost_frames += (seq - last - 1) & 0xFF
+                self._last_seq[(sysid, compid)] = seq
+                pos = frame_end
+        del buffer[:pos]
+        return decoded
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'bad_frames': self.bad_frames,
+            'unknown_frames': self.unknown_frames,
+            'skipped_bytes': self.skipped_bytes,
+            'lost_frames': self.lost_frames,
+            'buffered': len(self.buffer),
+        }
+
+
+# HEARTBEAT base_mode bayrakları ve otopilot olmayan göndericiler (ör. diğer yer istasyonları)
+MODE_FLAG_MANUAL_INPUT = 0x40
+MODE_FLAG_GUIDED = 0x08
+MODE_FLAG_AUTO = 0x04
+MAV_AUTOPILOT_INVALID = 8
+MAV_TYPE_GCS = 6
+
+
+class MavlinkState:
+    """Latest flight values from the decoded messages, in display units
+
+    update() returns True when a message brought a new position, which is
+    when the ground station records a telemetry sample.
+    """
+
+    def __init__(self):
+        self.lat = None
+        self.lon = None
+        self.alt = None
+        self.speed = 0.0
+        self.battery = 0.0
+        self.mode = 'UNKNOWN'
+        self.attitude = None
+        self.fix_type = 0
+        self._global_position = False
+
+    def update(self, msg_id, message):
+        if msg_id == MSG_GLOBAL_POSITION_INT:
+            self._global_position = True
+            self.lat, self.lon, self.alt = message.lat / 1e7, message.lon / 1e7, message.alt / 1000.0
+            return True
+        if msg_id == MSG_GPS_RAW_INT:
+            self.fix_type = message.fix_type
+            # Konum, GLOBAL_POSITION_INT gelmiyorsa ve fix varsa ham GPS'ten alınır
+            if not self._global_position and message.fix_type >= 2:
+                self.lat, self.lon, self.alt = message.lat / 1e7, message.lon / 1e7, message.alt / 1000.0
+                return True
+        elif msg_id == MSG_VFR_HUD:
+            self.speed = message.groundspeed
+        elif msg_id == MSG_SYS_STATUS:
+            if message.battery_remaining >= 0:  # -1: otopilot bilmiyor
+                self.battery = float(message.battery_remaining)
+        elif msg_id == MSG_HEARTBEAT:
+            if message.autopilot != MAV_AUTOPILOT_INVALID and message.type != MAV_TYPE_GCS:
+                self.mode = self.mode_name(message.base_mode)
+        elif msg_id == MSG_ATTITUDE:
+            self.attitude = (message.roll, message.pitch, message.yaw)
+        return False
+
+    @staticmethod
+    def mode_name(base_mode):
+        """telemetry_store.MODES name of a HEARTBEAT base_mode"""
+        if base_mode & (MODE_FLAG_AUTO | MODE_FLAG_GUIDED):
+            return 'AUTONOMOUS'
+        if base_mode & MODE_FLAG_MANUAL_INPUT:
+            return 'RC'
+        return 'UNKNOWN'
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MAVLink v2 çözücü hız ve bozulma testi")
+    parser.add_argument('--frames', type=int, default=100000)
+    parser.add_argument('--chunk', type=int, default=64, help="Seri porttan bir okumada gelen bayt")
+    parser.add_argument('--corrupt', type=float, default=0.01, help="Bozulan/düşen bayt oranı")
+    args = parser.parse_args()
+
+    import random
+    rng = random.Random(1)
+    samples = [
+        (MSG_HEARTBEAT, (0, 1, 3, MODE_FLAG_AUTO, 4, 3)),
+        (MSG_SYS_STATUS, (0, 0, 0, 500, 12600, 1500, 0, 0, 0, 0, 0, 0, 87)),
+        (MSG_GPS_RAW_INT, (1000000, 399334000, 328597000, 900000, 120, 150, 2500, 9000, 3, 12)),
+        (MSG_ATTITUDE, (1000, 0.1, -0.05, 1.5, 0.0, 0.0, 0.01)),
+        (MSG_GLOBAL_POSITION_INT, (1000, 399334000, 328597000, 900000, 100000, 2500, 0, 0, 9000)),
+        (MSG_VFR_HUD, (25.5, 24.0, 900.0, 0.5, 90, 60)),
+    ]
+    stream = bytearray()
+    for i in range(args.frames):
+        msg_id, values = samples[i % len(samples)]
+        stream += encode_message(msg_id, values, i)
+    for _ in range(int(len(stream) * args.corrupt)):
+        i = rng.randrange(len(stream))
+        if rng.random() < 0.5:
+            del stream[i]
+        else:
+            stream[i] ^= 0xFF
+    decoder = MavlinkDecoder()
+    state = MavlinkState()
+    start = time.perf_counter()
+    count = 0
+    for i in range(0, len(stream), args.chunk):
+        for msg_id, _, _, message in decoder.feed(stream[i:i + args.chunk]):
+            state.update(msg_id, message)
+            count += 1
+    elapsed = time.perf_counter() - start
+    print(f"{count}/{args.frames} mesaj, {count / elapsed:,.0f} mesaj/s; {decoder.stats()}")
+    print(f"Son durum: lat={state.lat}, lon={state.lon}, alt={state.alt}, hız={state.speed}, "
+          f"batarya={state.battery}, mod={state.mode}")
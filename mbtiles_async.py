@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Asyncio MBTiles Server Module
+Event-loop HTTP engine for the tile service in mbtiles_server.py
+"""
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from http import HTTPStatus
+
+from mbtiles_server import (DEFAULT_WORKERS, KEEPALIVE_TIMEOUT, BodyParts, FileRegion, empty_response,
+                            request_body_length)
+
+# Yavaş istemciler için soket yazma tamponu üst sınırı; dolunca drain() bekler
+WRITE_BUFFER_HIGH = 256 * 1024
+MAX_HEADER_BYTES = 16 * 1024
+
+
+class AsyncTileServer:
+    """Serve a TileService from one event loop and a bounded read executor
+
+    Request parsing, cache hits and socket writes run on the event loop. Only
+    lookups that need SQLite go to the executor, and at most max_pending of
+    them may be queued at once; further requests wait on the semaphore, which
+    in turn stops reading from their connections (backpressure).
+    """
+
+    def __init__(self, service, host='127.0.0.1', port=8080, workers=DEFAULT_WORKERS, max_pending=None):
+        self.service = service
+        self.host = host
+        self.port = port
+        self.workers = workers
+        self.max_pending = max_pending or workers * 4
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tile-io')
+        self._pending = None
+        self._server = None
+
+    async def start(self):
+        self._pending = asyncio.Semaphore(self.max_pending)
+        self._server = await asyncio.start_server(self._handle_connection, self.host, self.port,
+                                                  limit=MAX_HEADER_BYTES, backlog=128)
+        return self._server
+
+    async def serve_forever(self):
+        if self._server is None:
+            await self.start()
+        async with self._server:
+            await self._server.serve_forever()
+
+    def close(self):
+        if self._server is not None:
+            self._server.close()
+        self._executor.shutdown(wait=False)
+
+    async def _handle_connection(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=WRITE_BUFFER_HIGH)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                method, path, version, headers = request
+                keep_alive = self._keep_alive(version, headers)
+                if method not in ('GET', 'HEAD', 'POST'):
+                    response = empty_response(405)
+                elif method == 'POST':
+                    length, error = request_body_length(headers.get('Content-Length'))
+                    if error is not None:
+                        keep_alive = False
+                        response = empty_response(error)
+                    else:
+                        # Gövde de zaman aşımına tabi: yavaş/eksik gönderen istemci bağlantıyı tutamaz
+                        body = await asyncio.wait_for(reader.readexactly(length), KEEPALIVE_TIMEOUT)
+                        response = await self._respond(path, headers, method, body)
+                else:
+                    response = await self._respond(path, headers)
+                body = self._write_head(writer, response, keep_alive)
+                if body and method != 'HEAD':
+                    await self._write_body(writer, body)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError):
+            pass
+        finally:
+            writer.close()
+
+    async def _read_request(self, reader):
+        """Read one request head; returns None on EOF, timeout or bad request"""
+        try:
+            head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.IncompleteReadError):
+            return None
+        lines = head.decode('latin-1').split('\r\n')
+        try:
+            method, path, version = lines[0].split(' ', 2)
+        except ValueError:
+            return None
+        headers = {}
+        for line in lines[1:]:
+            name, sep, value = line.partition(':')
+            if sep:
+                headers[name.strip().lower()] = value.strip()
+        return method, path, version, _Headers(headers)
+
+    @staticmethod
+    def _keep_alive(version, headers):
+        connection = headers.get('Connection', '').lower()
+        if version == 'HTTP/1.1':
+            return connection != 'close'
+        return connection == 'keep-alive'
+
+    async def _respond(self, path, headers, method='GET', body=b''):
+        response = self.service.handle(path, headers, blocking=False, method=method, body=body)
+        if response is not None:
+            return response
+        async with self._pending:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(self._executor, self.service.handle, path, headers,
+                                              True, method, body)
+
+    @staticmethod
+    def _write_head(writer, response, keep_alive):
+        """Write status line and headers; returns the body still to be sent"""
+        status, headers, body = response
+        phrase = HTTPStatus(status).phrase
+        lines = [f"HTTP/1.1 {status} {phrase}"]
+        lines.extend(f"{name}: {value}" for name, value in headers)
+        if not keep_alive:
+            lines.append("Connection: close")
+        writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1'))
+        return body
+
+    @staticmethod
+    async def _write_body(writer, body):
+        if isinstance(body, BodyParts):
+            for part in body.parts:
+                await AsyncTileServer._write_body(writer, part)
+        elif isinstance(body, FileRegion):
+            # loop.sendfile önce tamponu boşaltır, sonra os.sendfile kullanır
+            loop = asyncio.get_running_loop()
+            await loop.sendfile(writer.transport, body.file, body.offset, len(body))
+        else:
+            writer.write(body)
+
+
+class _Headers(dict):
+    """Case-insensitive header lookup compatible with http.server's headers"""
+
+    def get(self, name, default=None):
+        return dict.get(self, name.lower(), default)
+
+
+def run_async_server(service, host='127.0.0.1', port=8080, workers=DEFAULT_WORKERS):
+    """Run the asyncio engine until interrupted"""
+    server = AsyncTileServer(service, host, port, workers=workers)
+    try:
+        asyncio.run(server.serve_forever())
+    finally:
+        server.close()
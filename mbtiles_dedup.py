@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+MBTiles Dedup Module
+Rewrites an .mbtiles file into the deduplicated map/images layout
+
+Byte-identical tiles (water, empty terrain, no-data fill) are stored once in
+`images` under a content id; `map` points every (zoom, column, row) at its
+id and a `tiles` view keeps the file readable by any MBTiles client. The id
+is the same blake2b hash mbtiles_server.py uses as the ETag.
+"""
+
+import os
+import sqlite3
+import hashlib
+import argparse
+import time
+from urllib.request import pathname2url
+
+from mbtiles_server import TILE_DIGEST_SIZE
+
+BATCH_SIZE = 5000
+
+SCHEMA = """
+CREATE TABLE metadata (name TEXT, value TEXT);
+CREATE TABLE map (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_id TEXT);
+CREATE TABLE images (tile_data BLOB, tile_id TEXT);
+"""
+INDEXES = """
+CREATE UNIQUE INDEX name ON metadata (name);
+CREATE UNIQUE INDEX map_index ON map (zoom_level, tile_column, tile_row);
+CREATE UNIQUE INDEX images_id ON images (tile_id);
+CREATE VIEW tiles AS
+    SELECT map.zoom_level AS zoom_level, map.tile_column AS tile_column,
+           map.tile_row AS tile_row, images.tile_data AS tile_data
+    FROM map JOIN images ON images.tile_id = map.tile_id;
+"""
+
+
+def content_id(data):
+    return hashlib.blake2b(data, digest_size=TILE_DIGEST_SIZE).hexdigest()
+
+
+def default_output(src_path):
+    """map.mbtiles -> map.dedup.mbtiles"""
+    stem, ext = os.path.splitext(src_path)
+    return f"{stem}.dedup{ext}"
+
+
+def verify_copy(path, count, unique):
+    """Raise ValueError unless the written file is intact and holds every tile"""
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        check = conn.execute("PRAGMA quick_check").fetchone()[0]
+        tiles = conn.execute("SELECT count(*) FROM tiles").fetchone()[0]
+        images = conn.execute("SELECT count(*) FROM images").fetchone()[0]
+    finally:
+        conn.close()
+    if check != 'ok' or tiles != count or images != unique:
+        raise ValueError(f"Deduplicated copy failed verification ({check}, {tiles}/{count} tiles, "
+                         f"{images}/{unique} images)")
+
+
+def dedup_mbtiles(src_path, dst_path):
+    """Write a deduplicated copy of src_path; returns (tiles, unique blobs)
+
+    The copy is built in <dst_path>.tmp and only renamed over dst_path (which
+    may be src_path itself) after it passed verify_copy().
+    """
+    src = sqlite3.connect(f"file:{pathname2url(os.path.abspath(src_path))}?mode=ro", uri=True)
+    tmp_path = dst_path + '.tmp'
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    dst = sqlite3.connect(tmp_path)
+    dst.execute("PRAGMA journal_mode=OFF")
+    dst.execute("PRAGMA synchronous=OFF")
+    dst.executescript(SCHEMA)
+    dst.executemany("INSERT INTO metadata VALUES (?, ?)", src.execute("SELECT name, value FROM metadata"))
+
+    seen = set()
+    count = 0
+    map_rows = []
+    image_rows = []
+    # Tek işlem (transaction) içinde toplu ekleme; indeksler yükleme bittikten sonra kurulur
+    for z, x, y, data in src.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles"):
+        tile_id = content_id(data)
+        if tile_id not in seen:
+            seen.add(tile_id)
+            image_rows.append((data, tile_id))
+        map_rows.append((z, x, y, tile_id))
+        count += 1
+        if len(map_rows) >= BATCH_SIZE:
+            dst.executemany("INSERT INTO images VALUES (?, ?)", image_rows)
+            dst.executemany("INSERT INTO map VALUES (?, ?, ?, ?)", map_rows)
+            image_rows, map_rows = [], []
+    dst.executemany("INSERT INTO images VALUES (?, ?)", image_rows)
+    dst.executemany("INSERT INTO map VALUES (?, ?, ?, ?)", map_rows)
+    dst.commit()
+    dst.executescript(INDEXES)
+    dst.execute("ANALYZE")
+    dst.commit()
+    dst.close()
+    src.close()
+    try:
+        verify_copy(tmp_path, count, len(seen))
+    except (ValueError, sqlite3.DatabaseError):
+        os.remove(tmp_path)
+        raise
+    os.replace(tmp_path, dst_path)
+    return count, len(seen)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MBTiles tekilleştirici (map/images şeması)")
+    parser.add_argument('mbtiles', help="Kaynak .mbtiles dosyası")
+    parser.add_argument('output', nargs='?', help="Hedef dosya (varsayılan: <ad>.dedup.mbtiles)")
+    parser.add_argument('--in-place', action='store_true',
+                        help="Doğrulanmış kopyayı kaynağın yerine koy")
+    args = parser.parse_args()
+    output = args.mbtiles if args.in_place else args.output or default_output(args.mbtiles)
+    before = os.path.getsize(args.mbtiles)
+    start = time.perf_counter()
+    count, unique = dedup_mbtiles(args.mbtiles, output)
+    elapsed = time.perf_counter() - start
+    after = os.path.getsize(output)
+    print(f"{count} tile ({unique} benzersiz, %{100 * (1 - unique / count) if count else 0:.1f} tekrar) "
+          f"{output} dosyasına yazıldı, {before / 2**20:.1f} MB -> {after / 2**20:.1f} MB, {elapsed:.1f} s")
@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+MBTiles Region Extractor
+Copies the tiles covering a bbox or polygon at selected zooms from one or more
+.mbtiles files into a new, lean .mbtiles file for field use
+
+Örnek:
+    python mbtiles_extract.py gorev.mbtiles map/ankara.mbtiles --bbox 32.70,39.85,32.95,40.00 --zooms 12-17
+    python mbtiles_extract.py gorev.mbtiles a.mbtiles b.mbtiles --polygon alan.geojson --zooms 10-18
+"""
+
+import os
+import json
+import math
+import sqlite3
+import argparse
+import time
+from urllib.request import pathname2url
+
+from tile_math import lonlat_to_tile_float
+
+BATCH_SIZE = 10000
+# Sütun başına tek indeks aralığı: (zoom_level, tile_column, tile_row) indeksine birebir uyar
+COLUMN_QUERY = ("SELECT tile_row, tile_data FROM tiles "
+                "WHERE zoom_level=? AND tile_column=? AND tile_row BETWEEN ? AND ?")
+
+
+def parse_bbox(text):
+    """'west,south,east,north' -> polygon ring of (lon, lat)"""
+    west, south, east, north = (float(v) for v in text.split(','))
+    if west >= east or south >= north:
+        raise ValueError(f"Invalid bbox: {text}")
+    return [(west, south), (east, south), (east, north), (west, north)]
+
+
+def load_polygons(path):
+    """Outer rings of every Polygon/MultiPolygon in a GeoJSON file, as lists of (lon, lat)"""
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    geometries = []
+    if data.get('type') == 'FeatureCollection':
+        geometries = [feature['geometry'] for feature in data['features']]
+    elif data.get('type') == 'Feature':
+        geometries = [data['geometry']]
+    else:
+        geometries = [data]
+    rings = []
+    for geometry in geometries:
+        if geometry['type'] == 'Polygon':
+            rings.append(geometry['coordinates'][0])
+        elif geometry['type'] == 'MultiPolygon':
+            rings.extend(polygon[0] for polygon in geometry['coordinates'])
+    if not rings:
+        raise ValueError(f"No polygon in {path}")
+    return [[(float(point[0]), float(point[1])) for point in ring] for ring in rings]
+
+
+def parse_zooms(text):
+    low, _, high = text.partition('-')
+    return range(int(low), int(high or low) + 1)
+
+
+def _clip(points, axis, lo, hi):
+    """Clip a polygon (list of (x, y)) to lo <= coordinate[axis] <= hi (Sutherland-Hodgman)"""
+    for bound, inside in ((lo, lambda p: p[axis] >= lo), (hi, lambda p: p[axis] <= hi)):
+        if not points:
+            break
+        clipped = []
+        prev = points[-1]
+        for point in points:
+            if inside(point) != inside(prev):
+                t = (bound - prev[axis]) / (point[axis] - prev[axis])
+                clipped.append((prev[0] + t * (point[0] - prev[0]), prev[1] + t * (point[1] - prev[1])))
+            if inside(point):
+                clipped.append(point)
+            prev = point
+        points = clipped
+    return points
+
+
+def _has_area(points, axis):
+    """True if a clipped polygon is more than a line along the other axis"""
+    if not points:
+        return False
+    values = [p[axis] for p in points]
+    return max(values) - min(values) > 1e-9
+
+
+def column_runs(rings, z):
+    """Yield (x, y0, y1): runs of slippy tiles in column x that intersect any ring at zoom z"""
+    n = 1 << z
+    columns = {}
+    for ring in rings:
+        projected = [lonlat_to_tile_float(lat, lon, z) for lon, lat in ring]
+        xs = [p[0] for p in projected]
+        for x in range(max(0, math.floor(min(xs))), min(n - 1, math.floor(max(xs))) + 1):
+            band = _clip(projected, 0, x, x + 1)
+            if not _has_area(band, 0):
+                continue
+            ys = [p[1] for p in band]
+            rows = columns.setdefault(x, set())
+            for y in range(max(0, math.floor(min(ys))), min(n - 1, math.floor(max(ys))) + 1):
+                if y not in rows and _has_area(_clip(band, 1, y, y + 1), 1):
+                    rows.add(y)
+    for x in sorted(columns):
+        run_start = prev = None
+        for y in sorted(columns[x]):
+            if run_start is None:
+                run_start = prev = y
+            elif y == prev + 1:
+                prev = y
+            else:
+                yield x, run_start, prev
+                run_start = prev = y
+        if run_start is not None:
+            yield x, run_start, prev
+
+
+def create_output(path):
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE metadata (name TEXT, value TEXT)")
+    conn.execute("CREATE TABLE tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB)")
+    # Birden fazla kaynakta aynı tile varsa ilk kaynaktaki kalır (INSERT OR IGNORE)
+    conn.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    return conn
+
+
+def copy_tiles(src_path, dst, plan):
+    """Copy the planned column runs from one source; returns the number of tiles inserted"""
+    src = sqlite3.connect(f"file:{pathname2url(os.path.abspath(src_path))}?mode=ro", uri=True)
+    before = dst.total_changes
+    batch = []
+    try:
+        for z, runs in plan.items():
+            top = (1 << z) - 1
+            for x, y0, y1 in runs:
+                for tile_row, data in src.execute(COLUMN_QUERY, (z, x, top - y1, top - y0)):
+                    batch.append((z, x, tile_row, data))
+                if len(batch) >= BATCH_SIZE:
+                    dst.executemany("INSERT OR IGNORE INTO tiles VALUES (?, ?, ?, ?)", batch)
+                    batch = []
+        dst.executemany("INSERT OR IGNORE INTO tiles VALUES (?, ?, ?, ?)", batch)
+        dst.commit()
+    finally:
+        src.close()
+    return dst.total_changes - before
+
+
+def write_metadata(dst, sources, output, rings, zooms):
+    src = sqlite3.connect(f"file:{pathname2url(os.path.abspath(sources[0]))}?mode=ro", uri=True)
+    try:
+        metadata = dict(src.execute("SELECT name, value FROM metadata"))
+    except sqlite3.OperationalError:
+        metadata = {}
+    finally:
+        src.close()
+    lons = [lon for ring in rings for lon, _ in ring]
+    lats = [lat for ring in rings for _, lat in ring]
+    metadata.update({
+        'name': os.path.splitext(os.path.basename(output))[0],
+        'minzoom': str(zooms[0]),
+        'maxzoom': str(zooms[-1]),
+        'bounds': f"{min(lons)},{min(lats)},{max(lons)},{max(lats)}",
+        'center': f"{(min(lons) + max(lons)) / 2},{(min(lats) + max(lats)) / 2},{zooms[0]}",
+    })
+    dst.executemany("INSERT INTO metadata VALUES (?, ?)", metadata.items())
+    dst.commit()
+
+
+def extract(output, sources, rings, zooms):
+    """Build output from sources; returns (tile count, [(step, seconds), ...])"""
+    timings = []
+    start = time.perf_counter()
+    plan = {z: list(column_runs(rings, z)) for z in zooms}
+    planned = sum(y1 - y0 + 1 for runs in plan.values() for _, y0, y1 in runs)
+    timings.append((f"plan ({planned} tile konumu)", time.perf_counter() - start))
+
+    tmp_path = output + '.tmp'
+    dst = create_output(tmp_path)
+    total = 0
+    for source in sources:
+        start = time.perf_counter()
+        copied = copy_tiles(source, dst, plan)
+        total += copied
+        timings.append((f"copy {os.path.basename(source)} ({copied} tile)", time.perf_counter() - start))
+    write_metadata(dst, sources, output, rings, zooms)
+    for step in ("ANALYZE", "VACUUM"):
+        start = time.perf_counter()
+        dst.execute(step)
+        timings.append((step, time.perf_counter() - start))
+    dst.close()
+    os.replace(tmp_path, output)
+    return total, timings
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bölge ve zoom aralığına göre .mbtiles çıkarıcı")
+    parser.add_argument('output', help="Oluşturulacak .mbtiles dosyası")
+    parser.add_argument('sources', nargs='+', help="Kaynak .mbtiles dosyaları (öncelik sırasıyla)")
+    area = parser.add_mutually_exclusive_group(required=True)
+    area.add_argument('--bbox', help="batı,güney,doğu,kuzey (derece)")
+    area.add_argument('--polygon', help="Poligon içeren GeoJSON dosyası")
+    parser.add_argument('--zooms', required=True, help="Zoom aralığı, ör. 12-17")
+    args = parser.parse_args()
+
+    rings = [parse_bbox(args.bbox)] if args.bbox else load_polygons(args.polygon)
+    zooms = parse_zooms(args.zooms)
+    started = time.perf_counter()
+    count, timings = extract(args.output, args.sources, rings, zooms)
+    for step, seconds in timings:
+        print(f"  {step:<50} {seconds:8.2f} s")
+    print(f"{count} tile {args.output} dosyasına yazıldı ({os.path.getsize(args.output) / 2**20:.1f} MB), "
+          f"toplam {time.perf_counter() - started:.1f} s")
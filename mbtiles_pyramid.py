@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+MBTiles Pyramid Builder
+Fills missing lower zoom levels by compositing each 2x2 group of child tiles
+into its parent, level by level down from the deepest zoom
+
+Bloklar bir süreç havuzunda işlenir; sonuçlar ana süreçte toplu olarak yazılır.
+Her üretilen tile için çocuklarının özeti `pyramid_sources` tablosunda tutulur:
+yeniden çalıştırıldığında yalnızca çocukları değişen (veya henüz üretilmemiş)
+tile'lar yeniden oluşturulur, bu yüzden yarıda kalan bir işlem kaldığı yerden
+devam eder. Kaynakta zaten bulunan (bu araçla üretilmemiş) tile'lara dokunulmaz.
+
+Sunucu dosyayı immutable açtığı için araç sunucu kapalıyken çalıştırılmalıdır.
+"""
+
+import io
+import os
+import sqlite3
+import hashlib
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.request import pathname2url
+
+from PIL import Image
+
+from mbtiles_dedup import content_id
+
+BLOCK_SIZE = 16
+WRITE_BATCH = 500
+RESAMPLE = Image.BOX
+
+SOURCES_TABLE = """
+CREATE TABLE IF NOT EXISTS pyramid_sources (
+    zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, children_hash TEXT,
+    PRIMARY KEY (zoom_level, tile_column, tile_row)
+)
+"""
+CHILD_QUERY = ("SELECT tile_column, tile_row, tile_data FROM tiles "
+               "WHERE zoom_level=? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?")
+
+_worker_conn = None
+
+
+def _init_worker(path):
+    global _worker_conn
+    _worker_conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+
+
+def composite(children, image_format):
+    """Downsample a {(dx, dy): tile bytes} 2x2 group (dy=0 is north) into one parent tile"""
+    images = {}
+    for key, data in children.items():
+        image = Image.open(io.BytesIO(data))
+        image.load()
+        images[key] = image
+    size = next(iter(images.values())).size[0]
+    opaque = len(images) == 4 and all(image.mode in ('RGB', 'L', 'P') and 'transparency' not in image.info
+                                      for image in images.values())
+    mode = 'RGB' if opaque or image_format == 'JPEG' else 'RGBA'
+    canvas = Image.new(mode, (2 * size, 2 * size), (0, 0, 0) if mode == 'RGB' else (0, 0, 0, 0))
+    for (dx, dy), image in images.items():
+        canvas.paste(image.convert(mode), (dx * size, dy * size))
+    parent = canvas.resize((size, size), RESAMPLE)
+    out = io.BytesIO()
+    if image_format == 'JPEG':
+        parent.save(out, 'JPEG', quality=85)
+    else:
+        parent.save(out, 'PNG', optimize=False)
+    return out.getvalue()
+
+
+def build_block(child_zoom, parents, stored, image_format):
+    """Build the parents (x, tms_row) of one block; returns ([(x, row, data, hash)], skipped)"""
+    xs = [x for x, _ in parents]
+    rows = [row for _, row in parents]
+    children = {}
+    for x, row, data in _worker_conn.execute(CHILD_QUERY, (child_zoom, 2 * min(xs), 2 * max(xs) + 1,
+                                                           2 * min(rows), 2 * max(rows) + 1)):
+        # TMS satırı kuzeye doğru artar: tek satır üst (kuzey) yarıdır
+        children.setdefault((x >> 1, row >> 1), {})[(x & 1, 1 - (row & 1))] = data
+    built = []
+    skipped = 0
+    for parent in parents:
+        group = children.get(parent)
+        if not group:
+            continue
+        digest = hashlib.blake2b(digest_size=16)
+        for key in sorted(group):
+            digest.update(bytes(key) + hashlib.blake2b(group[key], digest_size=16).digest())
+        children_hash = digest.hexdigest()
+        if stored.get(parent) == children_hash:
+            skipped += 1
+            continue
+        built.append((parent[0], parent[1], composite(group, image_format), children_hash))
+    return built, skipped
+
+
+def _build_block_job(args):
+    return build_block(*args)
+
+
+class TileWriter:
+    """Batched writes into either the flat tiles table or the map/images layout
+
+    In the map/images layout, images left without any map row by a
+    replacement or removal are deleted in the same transaction.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+        self.dedup = {'map', 'images'} <= tables
+        self.pending = []
+        self.written = 0
+        self.removed = 0
+
+    def _replaced_ids(self, keys):
+        """Image ids the given map rows point at now (before they are deleted)"""
+        ids = set()
+        for key in keys:
+            ids.update(row[0] for row in self.conn.execute(
+                "SELECT tile_id FROM map WHERE zoom_level=? AND tile_column=? AND tile_row=?", key))
+        return ids
+
+    def _delete_orphans(self, ids):
+        self.conn.executemany("DELETE FROM images WHERE tile_id=? AND NOT EXISTS "
+                              "(SELECT 1 FROM map WHERE map.tile_id=?)", [(i, i) for i in ids])
+
+    def remove(self, keys):
+        """Delete generated tiles [(z, x, row)] whose children are all gone, in one transaction"""
+        if not keys:
+            return
+        if self.dedup:
+            replaced = self._replaced_ids(keys)
+            self.conn.executemany("DELETE FROM map WHERE zoom_level=? AND tile_column=? AND tile_row=?", keys)
+            self._delete_orphans(replaced)
+        else:
+            self.conn.executemany("DELETE FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", keys)
+        self.conn.executemany("DELETE FROM pyramid_sources WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                              keys)
+        self.conn.commit()
+        self.removed += len(keys)
+
+    def add(self, z, x, row, data, children_hash):
+        self.pending.append((z, x, row, data, children_hash))
+        if len(self.pending) >= WRITE_BATCH:
+            self.flush()
+
+    def flush(self):
+        if not self.pending:
+            return
+        keys = [(z, x, row) for z, x, row, _, _ in self.pending]
+        if self.dedup:
+            ids = [content_id(data) for _, _, _, data, _ in self.pending]
+            replaced = self._replaced_ids(keys) - set(ids)
+            self.conn.executemany("INSERT INTO images (tile_data, tile_id) SELECT ?, ? WHERE NOT EXISTS "
+                                  "(SELECT 1 FROM images WHERE tile_id=?)",
+                                  [(p[3], i, i) for p, i in zip(self.pending, ids)])
+            self.conn.executemany("DELETE FROM map WHERE zoom_level=? AND tile_column=? AND tile_row=?", keys)
+            self.conn.executemany("INSERT INTO map VALUES (?, ?, ?, ?)",
+                                  [key + (i,) for key, i in zip(keys, ids)])
+            self._delete_orphans(replaced)
+        else:
+            self.conn.executemany("DELETE FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", keys)
+            self.conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)",
+                                  [(z, x, row, data) for z, x, row, data, _ in self.pending])
+        self.conn.executemany("INSERT OR REPLACE INTO pyramid_sources VALUES (?, ?, ?, ?)",
+                              [(z, x, row, h) for z, x, row, _, h in self.pending])
+        # Her toplu yazım kendi işleminde: kesilen bir çalışma buradan devam eder
+        self.conn.commit()
+        self.written += len(self.pending)
+        self.pending = []
+
+
+def level_keys(conn, z):
+    return {(x, row) for x, row in conn.execute(
+        "SELECT tile_column, tile_row FROM tiles WHERE zoom_level=?", (z,))}
+
+
+def build_pyramid(path, minzoom=0, maxzoom=None, workers=None, block_size=BLOCK_SIZE):
+    """Generate zoom levels maxzoom-1 .. minzoom from the level below; returns per-level stats"""
+    conn = sqlite3.connect(path)
+    conn.execute(SOURCES_TABLE)
+    conn.commit()
+    if maxzoom is None:
+        maxzoom = conn.execute("SELECT MAX(zoom_level) FROM tiles").fetchone()[0]
+    metadata = dict(conn.execute("SELECT name, value FROM metadata"))
+    image_format = 'JPEG' if metadata.get('format', 'png').lower() in ('jpg', 'jpeg') else 'PNG'
+    writer = TileWriter(conn)
+    stats = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(path,)) as pool:
+        for z in range(maxzoom - 1, minzoom - 1, -1):
+            start = time.perf_counter()
+            children = level_keys(conn, z + 1)
+            existing = level_keys(conn, z)
+            stored = {(x, row): h for x, row, h in conn.execute(
+                "SELECT tile_column, tile_row, children_hash FROM pyramid_sources WHERE zoom_level=?", (z,))}
+            # Kaynakta zaten olan gerçek tile'lar korunur; yalnızca eksikler ve daha önce üretilenler
+            parents = {(x >> 1, row >> 1) for x, row in children}
+            parents = {p for p in parents if p not in existing or p in stored}
+            # Daha önce üretilmiş ama artık hiç çocuğu kalmamış tile'lar eskimiştir: silinir
+            stale = [(z, x, row) for x, row in stored if (x, row) not in parents]
+            writer.remove(stale)
+            blocks = {}
+            for x, row in parents:
+                blocks.setdefault((x // block_size, row // block_size), []).append((x, row))
+            jobs = [(z + 1, block, {p: stored[p] for p in block if p in stored}, image_format)
+                    for block in blocks.values()]
+            built = skipped = 0
+            for tiles, block_skipped in pool.map(_build_block_job, jobs):
+                skipped += block_skipped
+                for x, row, data, children_hash in tiles:
+                    writer.add(z, x, row, data, children_hash)
+                    built += 1
+            writer.flush()
+            elapsed = time.perf_counter() - start
+            stats.append({'zoom': z, 'built': built, 'unchanged': skipped, 'removed': len(stale),
+                          'kept': len(existing) - len(existing & set(stored)), 'seconds': elapsed})
+            print(f"  zoom {z:2}: {built} tile üretildi, {skipped} değişmemiş, {len(stale)} eskimiş silindi, "
+                  f"{stats[-1]['kept']} özgün tile korundu ({elapsed:.1f} s)", flush=True)
+    if 'minzoom' in metadata and int(metadata['minzoom']) > minzoom:
+        conn.execute("UPDATE metadata SET value=? WHERE name='minzoom'", (str(minzoom),))
+        conn.commit()
+    conn.close()
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MBTiles alt zoom seviyelerini 2x2 birleştirme ile üret")
+    parser.add_argument('mbtiles', help="Güncellenecek .mbtiles dosyası (yerinde yazılır)")
+    parser.add_argument('--minzoom', type=int, default=0, help="Üretilecek en düşük zoom")
+    parser.add_argument('--maxzoom', type=int, help="Kaynak olarak kullanılacak en yüksek zoom (varsayılan: en derin)")
+    parser.add_argument('--workers', type=int, help="Süreç sayısı (varsayılan: CPU sayısı)")
+    parser.add_argument('--block', type=int, default=BLOCK_SIZE, help="Bir işte üretilecek blok kenarı (tile)")
+    args = parser.parse_args()
+    started = time.perf_counter()
+    stats = build_pyramid(args.mbtiles, args.minzoom, args.maxzoom, args.workers, args.block)
+    print(f"{sum(s['built'] for s in stats)} tile üretildi, toplam {time.perf_counter() - started:.1f} s")
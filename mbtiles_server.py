@@ -6,184 +6,1091 @@ Serves map tiles from .mbtiles files using HTTP server
 
 import sqlite3
 import io
+import gzip
 import os
+import hashlib
+import json
+import argparse
 from http.server import HTTPServer, BaseHTTPRequestHandler
+from concurrent.futures import ThreadPoolExecutor
 import threading
+import queue
 import time
 import sys
-from urllib.parse import urlparse
+import re
+import mimetypes
+from struct import Struct
+from urllib.parse import urlparse, parse_qs
+from urllib.request import pathname2url
+from tile_cache import TileCache, DEFAULT_CACHE_BYTES
+from tile_metrics import ServerMetrics
+from tile_catalog import TileCatalog, TILESET_SUFFIXES
+try:
+    from tile_coverage import load_coverage
+except ImportError:
+    # numpy yoksa kapsama indeksi devre dışı; eksik tile'lar veritabanına sorulur
+    load_coverage = None
 
-class MBTilesHandler(BaseHTTPRequestHandler):
-    def do_GET(self):
-        parsed = urlparse(self.path)
-        parts = parsed.path.strip('/').split('/')
-        if len(parts) == 4 and parts[0] == 'tiles':
+DEFAULT_WORKERS = 16
+DEFAULT_MMAP_SIZE = 256 * 1024 * 1024
+DEFAULT_MAX_AGE = 7 * 24 * 3600
+TILE_DIGEST_SIZE = 12
+# os.sendfile yoksa (ör. Windows) eşlenmiş bellek görünümü doğrudan yazılır
+HAS_SENDFILE = hasattr(os, 'sendfile')
+# Bu süre boyunca istek almayan tile setleri kapatılır (saniye)
+DEFAULT_IDLE_CLOSE = 300
+MAX_REQUEST_BODY = 1024 * 1024
+PREFETCH_QUEUE_SIZE = 8192
+# Boşta kalan keep-alive bağlantısı bu süre sonunda kapanır ve worker serbest kalır
+KEEPALIVE_TIMEOUT = 15
+# Tek bir /batch isteğinde dönebilecek en fazla tile ve sorgulanacak en büyük dikdörtgen
+MAX_BATCH_TILES = 1024
+# İstenen tile'lar sınırlayıcı dikdörtgenin en az bu kadarını dolduruyorsa tek aralık sorgusu kullanılır
+MIN_RANGE_FILL = 0.5
+WARM_BATCH = 64
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+STATIC_IMMUTABLE = 'public, max-age=31536000, immutable'
+# Sürüm numaralı dizinlerin (ör. leaflet-1.7.1/) içeriği hiç değişmez
+VERSIONED_DIR = re.compile(r'-\d+(\.\d+)+$')
+# Tercih sırasıyla önceden sıkıştırılmış varyantlar: leaflet.js.br, leaflet.js.gz
+STATIC_ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+MAP_PAGE = 'map.html'
+
+# Tile bundle: BUNDLE_HEADER (magic, adet), ardından her tile için BUNDLE_ENTRY
+# (z, biçim kodu, x, y, uzunluk) ve tile verisi. Olmayan tile'lar pakete hiç yazılmaz.
+# Biçim kodu BUNDLE_FORMATS içindeki sıradır (istemci Blob türünü buradan alır).
+BUNDLE_MAGIC = b'HTB2'
+BUNDLE_HEADER = Struct('<4sI')
+BUNDLE_ENTRY = Struct('<BBIII')
+BUNDLE_CONTENT_TYPE = 'application/vnd.hayturk.tile-bundle'
+BUNDLE_FORMATS = ('application/octet-stream', 'image/png', 'image/jpeg', 'image/webp', 'image/gif',
+                  'application/x-protobuf')
+# İstek parametrelerinde kabul edilen en büyük zoom (x, y < 2^z u32 alanlarına sığar)
+MAX_ZOOM = 30
+
+# Sabit SQL metni: sqlite3 her bağlantıda bu ifadeyi bir kez hazırlar (prepared
+# statement cache) ve sonraki isteklerde yeniden kullanır.
+TILE_QUERY = "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?"
+# (zoom_level, tile_column, tile_row) indeksi üzerinde aralık taraması
+TILE_RANGE_QUERY = ("SELECT tile_column, tile_row, tile_data FROM tiles "
+                    "WHERE zoom_level=? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?")
+# Tekilleştirilmiş şema (map/images): önce içerik kimliği, veri yalnızca önbellekte yoksa okunur
+MAP_QUERY = "SELECT tile_id FROM map WHERE zoom_level=? AND tile_column=? AND tile_row=?"
+MAP_RANGE_QUERY = ("SELECT tile_column, tile_row, tile_id FROM map "
+                   "WHERE zoom_level=? AND tile_column BETWEEN ? AND ? AND tile_row BETWEEN ? AND ?")
+IMAGE_QUERY = "SELECT tile_data FROM images WHERE tile_id=?"
+IMAGE_BATCH_SIZE = 500
+
+
+class MBTilesReader:
+    """Read-only access to an .mbtiles file with one pooled connection per thread
+
+    Both the flat `tiles` table and the deduplicated `map`/`images` layout
+    (see mbtiles_dedup.py) are supported; with the latter the content id is
+    used as the ETag and blobs already in memory are never read again.
+    """
+
+    def __init__(self, mbtiles_path, mmap_size=DEFAULT_MMAP_SIZE):
+        self.path = os.path.abspath(mbtiles_path)
+        self.name = os.path.splitext(os.path.basename(self.path))[0]
+        self.mmap_size = mmap_size
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+        self.dedup = None
+
+    def _connect(self):
+        """Open a read-only, immutable connection with memory-mapped I/O"""
+        uri = f"file:{pathname2url(self.path)}?mode=ro&immutable=1"
+        conn = sqlite3.connect(uri, uri=True, check_same_thread=False, cached_statements=32)
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA query_only=1")
+        if self.dedup is None:
+            tables = {row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name IN ('map', 'images')")}
+            self.dedup = tables == {'map', 'images'}
+        with self._lock:
+            self._connections.append(conn)
+        return conn
+
+    def connection(self):
+        """Return the calling thread's connection, opening it on first use"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+        return conn
+
+    def get_tile(self, z, x, y):
+        """Get tile data for slippy (XYZ) coordinates, or None if missing"""
+        entry = self.get_tile_entry(z, x, y)
+        return entry[0] if entry else None
+
+    def get_tile_entry(self, z, x, y, cached=None):
+        """Get (tile data, ETag) for slippy (XYZ) coordinates, or None if missing
+
+        cached(etag) may return an entry already in memory for the same
+        content; it is only consulted for deduplicated files.
+        """
+        conn = self.connection()
+        if not self.dedup:
+            row = conn.execute(TILE_QUERY, (z, x, (1 << z) - 1 - y)).fetchone()
+            return (row[0], tile_etag(row[0])) if row else None
+        row = conn.execute(MAP_QUERY, (z, x, (1 << z) - 1 - y)).fetchone()
+        if row is None:
+            return None
+        etag = content_etag(row[0])
+        entry = cached(etag) if cached is not None else None
+        if entry is None:
+            image = conn.execute(IMAGE_QUERY, (row[0],)).fetchone()
+            entry = (image[0], etag) if image else None
+        return entry
+
+    def get_tile_range(self, z, x0, x1, y0, y1, cached=None):
+        """Yield (x, y, (tile data, ETag)) for every stored tile in a slippy rectangle, in one query"""
+        top = (1 << z) - 1
+        conn = self.connection()
+        if not self.dedup:
+            for x, tms_y, data in conn.execute(TILE_RANGE_QUERY, (z, x0, x1, top - y1, top - y0)):
+                yield x, top - tms_y, (data, tile_etag(data))
+            return
+        rows = conn.execute(MAP_RANGE_QUERY, (z, x0, x1, top - y1, top - y0)).fetchall()
+        entries = {}
+        unread = []
+        for tile_id in {row[2] for row in rows}:
+            entry = cached(content_etag(tile_id)) if cached is not None else None
+            if entry is not None:
+                entries[tile_id] = entry
+            else:
+                unread.append(tile_id)
+        # Aynı içerik birden fazla konumda olsa da her blob bir kez okunur
+        for i in range(0, len(unread), IMAGE_BATCH_SIZE):
+            chunk = unread[i:i + IMAGE_BATCH_SIZE]
+            query = f"SELECT tile_id, tile_data FROM images WHERE tile_id IN ({','.join('?' * len(chunk))})"
+            for tile_id, data in conn.execute(query, chunk):
+                entries[tile_id] = (data, content_etag(tile_id))
+        for x, tms_y, tile_id in rows:
+            entry = entries.get(tile_id)
+            if entry is not None:
+                yield x, top - tms_y, entry
+
+    def close(self):
+        """Close every pooled connection"""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+
+
+class FileRegion:
+    """Response body that lives in a file: a mapped view plus its file offset
+
+    Engines send it with sendfile() where available instead of copying the
+    bytes through Python.
+    """
+    __slots__ = ('view', 'file', 'offset')
+
+    def __init__(self, view, file, offset):
+        self.view = view
+        self.file = file
+        self.offset = offset
+
+    def __len__(self):
+        return len(self.view)
+
+
+class BodyParts:
+    """Response body made of several parts (bytes or FileRegion) written in order"""
+    __slots__ = ('parts', 'size')
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.size = sum(len(part) for part in parts)
+
+    def __len__(self):
+        return self.size
+
+
+def tile_bundle(entries):
+    """Pack (z, x, y, (data, ETag)) entries into a length-prefixed tile bundle body
+
+    Consecutive in-memory parts are joined so SQLite tiles go out in one write;
+    archive tiles stay FileRegions and are sent with sendfile().
+    """
+    parts = []
+    pending = bytearray(BUNDLE_HEADER.pack(BUNDLE_MAGIC, len(entries)))
+    for z, x, y, (data, _) in entries:
+        pending += BUNDLE_ENTRY.pack(z, BUNDLE_FORMATS.index(sniff_format(data)), x, y, len(data))
+        if isinstance(data, FileRegion):
+            if pending:
+                parts.append(bytes(pending))
+            parts.append(data)
+            pending = bytearray()
+        else:
+            pending += data
+    if pending:
+        parts.append(bytes(pending))
+    return BodyParts(parts)
+
+def parse_tile_bundle(data):
+    """Decode a tile bundle into a list of (z, x, y, tile bytes, MIME type)"""
+    magic, count = BUNDLE_HEADER.unpack_from(data, 0)
+    if magic != BUNDLE_MAGIC:
+        raise ValueError("Not a tile bundle")
+    tiles = []
+    offset = BUNDLE_HEADER.size
+    for _ in range(count):
+        z, format_code, x, y, length = BUNDLE_ENTRY.unpack_from(data, offset)
+        offset += BUNDLE_ENTRY.size
+        tiles.append((z, x, y, bytes(data[offset:offset + length]), BUNDLE_FORMATS[format_code]))
+        offset += length
+    return tiles
+
+
+def tile_bytes(data):
+    """Tile content as bytes, whether it came from SQLite or a FileRegion"""
+    return bytes(data.view) if isinstance(data, FileRegion) else data
+
+def tile_etag(data):
+    """Strong ETag derived from the tile content hash"""
+    return '"' + hashlib.blake2b(data, digest_size=TILE_DIGEST_SIZE).hexdigest() + '"'
+
+def sniff_format(data):
+    """MIME type of a tile from its leading bytes (stored format, not what the file claims)"""
+    head = bytes(data.view[:12]) if isinstance(data, FileRegion) else bytes(data[:12])
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image/png'
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image/jpeg'
+    if head.startswith(b'RIFF') and head[8:12] == b'WEBP':
+        return 'image/webp'
+    if head.startswith((b'GIF87a', b'GIF89a')):
+        return 'image/gif'
+    if head.startswith(b'\x1f\x8b'):
+        # Sıkıştırılmış vektör tile (pbf)
+        return 'application/x-protobuf'
+    return 'application/octet-stream'
+
+def content_etag(tile_id):
+    """ETag for a deduplicated tile: its content id when that is a plain token"""
+    tile_id = str(tile_id)
+    if tile_id.isalnum():
+        return '"' + tile_id + '"'
+    return tile_etag(tile_id.encode('utf-8'))
+
+def etag_matches(if_none_match, etag):
+    """Check an If-None-Match header value against an ETag"""
+    if not if_none_match:
+        return False
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate == '*' or candidate.removeprefix('W/') == etag:
+            return True
+    return False
+
+
+def valid_tile(z, x, y):
+    """Whether z/x/y is a tile of the XYZ grid (0 <= z <= MAX_ZOOM, 0 <= x, y < 2^z)"""
+    if not 0 <= z <= MAX_ZOOM:
+        return False
+    n = 1 << z
+    return 0 <= x < n and 0 <= y < n
+
+
+def parse_batch_query(query):
+    """Parse z=<z>&x=<x0>-<x1>&y=<y0>-<y1> into a list of (z, x, y), or None if malformed or too large"""
+    params = parse_qs(query)
+    try:
+        z = int(params['z'][0])
+        ranges = []
+        for axis in ('x', 'y'):
+            low, _, high = params[axis][0].partition('-')
+            ranges.append((int(low), int(high or low)))
+    except (KeyError, ValueError):
+        return None
+    (x0, x1), (y0, y1) = ranges
+    if not (x0 <= x1 and y0 <= y1 and valid_tile(z, x0, y0) and valid_tile(z, x1, y1)) \
+            or (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_BATCH_TILES:
+        return None
+    return [(z, x, y) for x in range(x0, x1 + 1) for y in range(y0, y1 + 1)]
+
+
+def parse_tile_path(path):
+    """Parse /tiles/[<name>/]{z}/{x}/{y}.png into (name or None, z, x, y), or None
+
+    Coordinates outside the tile grid give None (404) before any lookup.
+    """
+    parts = urlparse(path).path.strip('/').split('/')
+    if parts[0] != 'tiles' or len(parts) not in (4, 5):
+        return None
+    name = parts[1] if len(parts) == 5 else None
+    try:
+        z, x, y_png = parts[-3:]
+        z, x, y = int(z), int(x), int(y_png.split('.')[0])
+    except ValueError:
+        return None
+    return (name, z, x, y) if valid_tile(z, x, y) else None
+
+
+class TilesetRegistry:
+    """Every tileset in a map directory, opened lazily and closed when idle
+
+    A tileset is named after its file without the extension; when both
+    <name>.tilepack and <name>.mbtiles exist the archive is preferred,
+    unless one of them was mounted explicitly with mount().
+    The directory listing and per-file metadata come from a TileCatalog;
+    when it reports a file as changed its reader and coverage are dropped.
+    """
+
+    def __init__(self, directory, default=None, idle_close=DEFAULT_IDLE_CLOSE, catalog=None):
+        self.directory = os.path.abspath(directory)
+        self.default = default
+        self.idle_close = idle_close
+        self.catalog = catalog if catalog is not None else TileCatalog(self.directory)
+        self.catalog.add_listener(self.forget)
+        self._files = {}
+        self._open = {}
+        self._retired = []
+        self._coverage = {}
+        self._lock = threading.Lock()
+        self._reaper = None
+        self._stopped = threading.Event()
+
+    def names(self):
+        """Names of all tilesets currently present in the directory"""
+        return self.catalog.names()
+
+    def mount(self, path):
+        """Serve exactly this file under its stem, whatever else shares the name; returns the name"""
+        name = os.path.splitext(os.path.basename(path))[0]
+        self._files[name] = os.path.abspath(path)
+        return name
+
+    def find(self, name):
+        """Path of the named tileset file, or None"""
+        if not name or name != os.path.basename(name) or name.startswith('.'):
+            return None
+        path = self._files.get(name)
+        if path is not None:
+            return path if os.path.exists(path) else None
+        for suffix in TILESET_SUFFIXES:
+            path = os.path.join(self.directory, name + suffix)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def entry(self, name):
+        """Catalog entry of a tileset, if it describes the file that is actually served"""
+        entry = self.catalog.get(name)
+        path = self.find(name)
+        if entry is None or path is None or entry['file'] != os.path.basename(path):
+            return None
+        return entry
+
+    def acquire(self, name=None):
+        """Open (if needed) and pin a tileset; returns None if it does not exist"""
+        name = name or self.default
+        with self._lock:
+            slot = self._open.get(name)
+            if slot is None:
+                path = self.find(name)
+                if path is None:
+                    return None
+                slot = self._open[name] = [open_tiles(path), 0, 0.0]
+                print(f"Tileset opened: {name}")
+            slot[1] += 1
+            slot[2] = time.monotonic()
+        self.coverage(name)
+        return slot[0]
+
+    def coverage(self, name=None, wait=False):
+        """Coverage index of a tileset, loaded (or built) in the background
+
+        Returns None while the index is still loading unless wait is set, and
+        always when numpy is unavailable.
+        """
+        name = name or self.default
+        with self._lock:
+            state = self._coverage.get(name)
+            if state is None:
+                path = self.find(name) if load_coverage is not None else None
+                if path is None:
+                    return None
+                state = self._coverage[name] = [None, threading.Event()]
+                threading.Thread(target=self._load_coverage, args=(path, state),
+                                 name=f'coverage-{name}', daemon=True).start()
+        if wait:
+            state[1].wait()
+        return state[0]
+
+    @staticmethod
+    def _load_coverage(path, state):
+        try:
+            state[0] = load_coverage(path)
+        except Exception as e:
+            print(f"Coverage index unavailable for {path}: {e}")
+        finally:
+            state[1].set()
+
+    def release(self, tiles):
+        closing = None
+        with self._lock:
+            slot = self._open.get(tiles.name)
+            if slot is None or slot[0] is not tiles:
+                slot = next((s for s in self._retired if s[0] is tiles), None)
+            if slot is not None:
+                slot[1] -= 1
+                if slot[1] == 0 and slot in self._retired:
+                    self._retired.remove(slot)
+                    closing = tiles
+        if closing is not None:
+            closing.close()
+
+    def forget(self, names):
+        """Drop readers and coverage of changed tilesets; busy readers close on their last release"""
+        closing = []
+        with self._lock:
+            for name in names:
+                self._coverage.pop(name, None)
+                slot = self._open.pop(name, None)
+                if slot is None:
+                    continue
+                if slot[1] == 0:
+                    closing.append(slot[0])
+                else:
+                    self._retired.append(slot)
+        for tiles in closing:
+            tiles.close()
+            print(f"Tileset closed (file changed): {tiles.name}")
+
+    def close_idle(self, now=None):
+        """Close tilesets that have no requests in flight and have been idle"""
+        now = time.monotonic() if now is None else now
+        closing = []
+        with self._lock:
+            for name, (tiles, in_flight, last_used) in list(self._open.items()):
+                if in_flight == 0 and now - last_used > self.idle_close:
+                    closing.append(self._open.pop(name)[0])
+        for tiles in closing:
+            tiles.close()
+            print(f"Tileset closed (idle): {tiles.name}")
+        return len(closing)
+
+    def start_reaper(self):
+        """Start the background thread that closes idle tilesets"""
+        def reap():
+            while not self._stopped.wait(min(60, max(1, self.idle_close / 4))):
+                self.close_idle()
+        self._reaper = threading.Thread(target=reap, name='tileset-reaper', daemon=True)
+        self._reaper.start()
+
+    def close(self):
+        self._stopped.set()
+        self.catalog.close()
+        with self._lock:
+            open_tilesets, self._open = self._open, {}
+            retired, self._retired = self._retired, []
+        for tiles, _, _ in list(open_tilesets.values()) + retired:
+            tiles.close()
+
+
+class TileWarmer:
+    """Single low-priority thread that loads prefetched tiles into the cache
+
+    The queue is bounded; when it is full further tiles are dropped rather
+    than delaying anything, since prefetching is only an optimisation.
+    """
+
+    def __init__(self, service, max_queue=PREFETCH_QUEUE_SIZE):
+        self.service = service
+        self.queue = queue.Queue(max_queue)
+        self.loaded = 0
+        self.dropped = 0
+        self._thread = threading.Thread(target=self._run, name='tile-warmer', daemon=True)
+        self._thread.start()
+
+    def submit(self, name, tiles):
+        """Queue (z, x, y) tiles of a tileset; returns how many were accepted
+
+        Tiles are accepted in order until the queue is full, so the accepted
+        ones are always the first N and the caller can offer the rest again.
+        """
+        accepted = 0
+        for z, x, y in tiles:
             try:
-                _, z, x, y_png = parts
-                y = y_png.split('.')[0]
-                z, x, y = int(z), int(x), int(y)
-                conn = sqlite3.connect(sys.argv[1])
-                cur = conn.cursor()
-                cur.execute("SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?", (z, x, (2**z - 1 - y)))
-                row = cur.fetchone()
-                conn.close()
-                if row:
-                    self.send_response(200)
-                    self.send_header('Content-type', 'image/png')
-                    self.end_headers()
-                    self.wfile.write(row[0])
+                self.queue.put_nowait((name, z, x, y))
+            except queue.Full:
+                self.dropped += len(tiles) - accepted
+                break
+            accepted += 1
+        return accepted
+
+    def _run(self):
+        while True:
+            # Kuyruktaki tile'ları gruplar halinde al; aynı bölgedekiler tek sorguda okunur
+            batch = [self.queue.get()]
+            while len(batch) < WARM_BATCH:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            by_name = {}
+            for name, z, x, y in batch:
+                if self.service.get_cached_entry(name, z, x, y) is None:
+                    by_name.setdefault(name, []).append((z, x, y))
+            for name, tiles in by_name.items():
+                try:
+                    self.loaded += len(self.service.get_tile_batch(name, tiles))
+                except Exception as e:
+                    print(f"Prefetch error for {name} ({len(tiles)} tiles): {e}")
+            # Ön plandaki isteklere GIL'i bırak
+            time.sleep(0)
+
+
+def parse_prefetch_body(body):
+    """Decode a JSON list of [z, x, y] triples, or None if malformed or not on the tile grid"""
+    try:
+        tiles = [(int(z), int(x), int(y)) for z, x, y in json.loads(body)]
+    except (ValueError, TypeError):
+        return None
+    if not all(valid_tile(*tile) for tile in tiles):
+        return None
+    return tiles
+
+
+class TileService:
+    """Tile lookup and URL routing shared by every serving engine
+
+    handle() turns a request path and headers into (status, headers, body), so
+    the threaded and asyncio engines expose exactly the same URL layout:
+    /tiles/<name>/{z}/{x}/{y}.png for any tileset in the registry,
+    /tiles/{z}/{x}/{y}.png for the default one and /tilesets.json.
+    POST /prefetch[/<name>] queues tiles for background cache warming.
+    With an Overzoomer, missing tiles are synthesized from ancestor tiles.
+    With a Transcoder, PNG tiles are re-encoded to a format the client's
+    Accept header allows (responses then carry Vary: Accept).
+    /metrics (Prometheus text) and /metrics.json report request metrics.
+    GET /batch[/<name>]?z=&x=<x0>-<x1>&y=<y0>-<y1> and POST /batch[/<name>]
+    (JSON [[z, x, y], ...]) return many tiles as one bundle; /static/<path>
+    serves the vendored Leaflet and browser-side helpers, / the map page.
+    """
+
+    def __init__(self, tilesets, cache=None, max_age=DEFAULT_MAX_AGE, overzoom=None, transcoder=None):
+        self.tilesets = tilesets
+        self.cache = cache
+        self.overzoom = overzoom
+        self.transcoder = transcoder
+        self.cache_control = f"public, max-age={int(max_age)}"
+        self.warmer = TileWarmer(self) if cache is not None else None
+        self.metrics = ServerMetrics()
+        self.static = StaticFiles()
+
+    def get_cached_entry(self, name, z, x, y, lookups=None):
+        """Get (tile data, ETag) from the in-memory caches only (see TileCache.get for lookups)"""
+        name = name or self.tilesets.default
+        entry = self.cache.get((name, z, x, y), lookups) if self.cache is not None else None
+        if entry is None and self.overzoom is not None:
+            entry = self.overzoom.get_cached(name, z, x, y, lookups)
+        return entry
+
+    def get_tile_entry(self, name, z, x, y):
+        """Get (tile data, ETag), answering from the in-memory cache when possible"""
+        name = name or self.tilesets.default
+        entry = self.get_cached_entry(name, z, x, y) or self.load_tile_entry(name, z, x, y)
+        if entry is None:
+            entry = self.overzoom_entry(name, z, x, y)
+        return entry
+
+    def overzoom_entry(self, name, z, x, y):
+        """Synthesize a missing tile from an ancestor, or None"""
+        if self.overzoom is None or self.tilesets.find(name) is None:
+            return None
+        coverage = self.tilesets.coverage(name)
+        if coverage is None or (coverage.minzoom is not None and z > coverage.minzoom):
+            return self.overzoom.get(name, z, x, y, lambda az, ax, ay: self.read_tile_bytes(name, az, ax, ay))
+        return None
+
+    def get_tile_batch(self, name, tiles):
+        """Get (z, x, y, entry) for every requested tile that exists
+
+        Tiles not in the cache are read with one range query per zoom level
+        (see load_tile_range); missing ones fall back to overzoom.
+        """
+        name = name or self.tilesets.default
+        found = []
+        wanted_by_zoom = {}
+        unresolved = []
+        for z, x, y in tiles:
+            entry = self.get_cached_entry(name, z, x, y)
+            if entry is not None:
+                found.append((z, x, y, entry))
+            elif self.is_known_missing(name, z, x, y):
+                unresolved.append((z, x, y))
+            else:
+                wanted_by_zoom.setdefault(z, set()).add((x, y))
+        for z, wanted in wanted_by_zoom.items():
+            loaded = self.load_tile_range(name, z, wanted)
+            for x, y in wanted:
+                entry = loaded.get((x, y))
+                if entry is not None:
+                    found.append((z, x, y, entry))
                 else:
-                    self.send_response(404)
-                    self.end_headers()
-            except Exception as e:
-                self.send_response(500)
-                self.end_headers()
-                self.wfile.write(str(e).encode())
-        else:
-            self.send_response(404)
-            self.end_headers()
-    
-    def get_tile(self, z, x, y):
-        """Get tile data from MBTiles database"""
+                    unresolved.append((z, x, y))
+        if self.overzoom is not None:
+            for z, x, y in unresolved:
+                entry = self.overzoom_entry(name, z, x, y)
+                if entry is not None:
+                    found.append((z, x, y, entry))
+        return found
+
+    def load_tile_range(self, name, z, wanted):
+        """Read a set of (x, y) tiles at one zoom level into {(x, y): entry}
+
+        Dense sets use a single range scan over their bounding box; sparse ones
+        (e.g. along a flight track) are read one by one.
+        """
+        xs = [x for x, _ in wanted]
+        ys = [y for _, y in wanted]
+        x0, x1, y0, y1 = min(xs), max(xs), min(ys), max(ys)
+        area = (x1 - x0 + 1) * (y1 - y0 + 1)
+        if area > MAX_BATCH_TILES or len(wanted) < area * MIN_RANGE_FILL:
+            entries = {(x, y): self.load_tile_entry(name, z, x, y) for x, y in wanted}
+            return {key: entry for key, entry in entries.items() if entry is not None}
+        tiles = self.tilesets.acquire(name)
+        if tiles is None:
+            return {}
+        loaded = {}
+        start = time.perf_counter()
+        try:
+            if isinstance(tiles, MBTilesReader):
+                rows = tiles.get_tile_range(z, x0, x1, y0, y1, cached=self.cached_content)
+            else:
+                rows = tiles.get_tile_range(z, x0, x1, y0, y1)
+            for x, y, entry in rows:
+                if (x, y) in wanted:
+                    loaded[(x, y)] = entry
+        finally:
+            self.metrics.add_sqlite_time(time.perf_counter() - start)
+            self.tilesets.release(tiles)
+        if isinstance(tiles, MBTilesReader):
+            for (x, y), entry in loaded.items():
+                self.cache_entry(tiles.name, z, x, y, entry)
+        return loaded
+
+    def read_tile_bytes(self, name, z, x, y):
+        entry = self.read_tile_entry(name, z, x, y)
+        return tile_bytes(entry[0]) if entry is not None else None
+
+    def read_tile_entry(self, name, z, x, y):
+        """Get a real (stored) tile as (tile data, ETag), using the cache when possible"""
+        entry = self.cache.get((name, z, x, y)) if self.cache is not None else None
+        return entry or self.load_tile_entry(name, z, x, y)
+
+    def load_tile_entry(self, name, z, x, y):
+        """Read a stored tile from its tileset and add it to the cache"""
+        if self.is_known_missing(name, z, x, y):
+            return None
+        tiles = self.tilesets.acquire(name)
+        if tiles is None:
+            return None
+        start = time.perf_counter()
+        try:
+            if isinstance(tiles, MBTilesReader):
+                entry = tiles.get_tile_entry(z, x, y, cached=self.cached_content)
+            else:
+                entry = tiles.get_tile_entry(z, x, y)
+        finally:
+            self.metrics.add_sqlite_time(time.perf_counter() - start)
+            self.tilesets.release(tiles)
+        # .tilepack zaten bellek eşlemeli; ayrı bir kopya tutmaya gerek yok
+        if entry is not None and isinstance(tiles, MBTilesReader):
+            self.cache_entry(tiles.name, z, x, y, entry)
+        return entry
+
+    def cached_content(self, etag):
+        """Entry for any cached tile with this content hash, or None"""
+        return self.cache.get_content(etag) if self.cache is not None else None
+
+    def cache_entry(self, name, z, x, y, entry):
+        """Cache a tile keyed by position; identical tiles share one buffer via their ETag"""
+        if self.cache is not None:
+            self.cache.put((name, z, x, y), entry, len(entry[0]), content_key=entry[1])
+
+    def is_known_missing(self, name, z, x, y):
+        """True when the coverage index proves the tile does not exist"""
+        coverage = self.tilesets.coverage(name)
+        return coverage is not None and not coverage.contains(z, x, y)
+
+    def tileset_info(self, name):
+        """Zoom range, bounds and center of a tileset
+
+        Answered from the catalog; the coverage index (real extents, per-zoom
+        counts) is added once it is loaded, and waited for only when the
+        catalog does not know the tileset yet.
+        """
+        name = name or self.tilesets.default
+        path = self.tilesets.find(name)
+        if path is None:
+            return None
+        info = {'name': name, 'file': os.path.basename(path), 'minzoom': None, 'maxzoom': None, 'bounds': None, 'center': None}
+        entry = self.tilesets.entry(name)
+        if entry is not None:
+            info.update({key: entry[key] for key in ('minzoom', 'maxzoom', 'bounds', 'center', 'format')})
+        coverage = self.tilesets.coverage(name, wait=entry is None)
+        if coverage is not None:
+            info.update(coverage.info())
+        if self.overzoom is not None and info['maxzoom'] is not None:
+            info['overzoom_maxzoom'] = info['maxzoom'] + self.overzoom.max_levels
+        return info
+
+    def handle(self, path, headers, blocking=True, method='GET', body=b''):
+        """Route a request and return (status, headers, body)
+
+        With blocking=False only the in-memory cache is consulted and None is
+        returned when the answer needs a database read.
+        """
+        start = time.perf_counter()
+        url = urlparse(path)
+        route = url.path
+        coords = parse_tile_path(route)
+        self.metrics.begin()
         try:
-            if not os.path.exists(sys.argv[1]):
-                print(f"MBTiles file not found: {sys.argv[1]}")
+            response = self.route(route, coords, headers, blocking, method, body, url.query)
+        finally:
+            self.metrics.end()
+        if response is not None:
+            self.metrics.record(coords[1] if coords else None, response[0], len(response[2]),
+                                time.perf_counter() - start)
+        return response
+
+    def route(self, route, coords, headers, blocking, method, body, query=''):
+        if route == '/batch' or route.startswith('/batch/'):
+            if not blocking:
                 return None
-            
-            conn = sqlite3.connect(sys.argv[1])
-            cursor = conn.cursor()
-            
-            # Query tile data
-            cursor.execute(
-                "SELECT tile_data FROM tiles WHERE zoom_level = ? AND tile_column = ? AND tile_row = ?",
-                (z, x, y)
-            )
-            
-            result = cursor.fetchone()
-            conn.close()
-            
-            if result:
-                return result[0]
+            if method == 'POST':
+                tiles = parse_prefetch_body(body)
+                if tiles is not None and len(tiles) > MAX_BATCH_TILES:
+                    tiles = None
             else:
+                tiles = parse_batch_query(query)
+            return self.handle_batch(route[len('/batch/'):] or None, tiles)
+        if method == 'POST':
+            if route == '/prefetch' or route.startswith('/prefetch/'):
+                return self.handle_prefetch(route[len('/prefetch/'):] or None, body)
+            return empty_response(405)
+        if route.startswith('/static/'):
+            if not blocking:
+                return None
+            return self.static.response(route[len('/static/'):], headers)
+        if route in ('/', '/' + MAP_PAGE):
+            if not blocking:
+                return None
+            return self.static.response(MAP_PAGE, headers)
+        if route == '/tilesets.json':
+            if not blocking:
                 return None
-                
+            return json_response({'default': self.tilesets.default, 'tilesets': self.tilesets.names(),
+                                  'catalog': self.tilesets.catalog.entries()})
+        if route.startswith('/tiles/') and route.endswith('/info.json'):
+            if not blocking:
+                return None
+            info = self.tileset_info(route[len('/tiles/'):-len('/info.json')])
+            return json_response(info) if info is not None else empty_response(404)
+        if route == '/metrics':
+            text = self.metrics.prometheus(self.cache_stats()).encode('utf-8')
+            return 200, [('Content-Type', 'text/plain; version=0.0.4; charset=utf-8'),
+                         ('Content-Length', str(len(text))),
+                         ('Cache-Control', 'no-cache')], text
+        if route == '/metrics.json':
+            return json_response(self.metrics.snapshot(self.cache_stats()))
+        if coords is None:
+            return empty_response(404)
+        # Engellemeyen yoklamanın önbellek sayaçları yalnızca yanıt buradan verilirse sayılır;
+        # None dönerse aynı istek engelleyen çağrıda bir kez sayılır
+        lookups = None if blocking else []
+        response = self.tile_route(route, coords, headers, blocking, lookups)
+        if response is not None:
+            for cache, hit in lookups or ():
+                cache.count(hit)
+        return response
+
+    def tile_route(self, route, coords, headers, blocking, lookups):
+        try:
+            if blocking:
+                entry = self.get_tile_entry(*coords)
+            else:
+                entry = self.get_cached_entry(*coords, lookups=lookups)
+                if entry is None and (self.overzoom is not None or not self.is_known_missing(*coords)):
+                    return None
+        except Exception as e:
+            body = str(e).encode()
+            return 500, [('Content-Type', 'text/plain; charset=utf-8'),
+                         ('Content-Length', str(len(body)))], body
+        if entry is None:
+            return empty_response(404)
+        if self.transcoder is not None:
+            target = self.transcoder.negotiate(headers.get('Accept'), entry[0])
+            if target is not None:
+                # Dönüştürülmüş ETag istemcide varsa yeniden kodlamaya gerek yok
+                etag = self.transcoder.etag(entry[1], target)
+                if etag_matches(headers.get('If-None-Match'), etag):
+                    return 304, [('ETag', etag), ('Cache-Control', self.cache_control), ('Vary', 'Accept')], b''
+                transcoded = self.transcoder.get_cached(entry, target, lookups)
+                if transcoded is None:
+                    if not blocking:
+                        return None
+                    try:
+                        transcoded = self.transcoder.get(entry, target)
+                    except Exception as e:
+                        print(f"Transcode failed for {route}: {e}")
+                        transcoded = entry
+                entry = transcoded
+        return self.tile_response(entry, headers)
+
+    def cache_stats(self):
+        return self.cache.stats() if self.cache is not None else None
+
+    def handle_prefetch(self, name, body):
+        """Queue tiles for background loading into the cache"""
+        tiles = parse_prefetch_body(body)
+        if tiles is None:
+            return empty_response(400)
+        if self.warmer is None:
+            return json_response({'queued': 0}, status=202)
+        name = name or self.tilesets.default
+        if self.tilesets.find(name) is None:
+            return empty_response(404)
+        return json_response({'queued': self.warmer.submit(name, tiles)}, status=202)
+
+    def handle_batch(self, name, tiles):
+        """Return the requested tiles as one bundle (missing tiles are left out)"""
+        if tiles is None:
+            return empty_response(400)
+        name = name or self.tilesets.default
+        if self.tilesets.find(name) is None:
+            return empty_response(404)
+        try:
+            body = tile_bundle(self.get_tile_batch(name, tiles))
         except Exception as e:
-            print(f"Error reading tile from MBTiles: {e}")
+            body = str(e).encode()
+            return 500, [('Content-Type', 'text/plain; charset=utf-8'),
+                         ('Content-Length', str(len(body)))], body
+        return 200, [('Content-Type', BUNDLE_CONTENT_TYPE),
+                     ('Content-Length', str(len(body))),
+                     ('Access-Control-Allow-Origin', '*'),
+                     ('Cache-Control', self.cache_control)], body
+
+    def tile_response(self, entry, headers):
+        """Build a 200 response with validators, or 304 if the client copy is current"""
+        data, etag = entry
+        vary = [('Vary', 'Accept')] if self.transcoder is not None else []
+        if etag_matches(headers.get('If-None-Match'), etag):
+            return 304, [('ETag', etag), ('Cache-Control', self.cache_control)] + vary, b''
+        return 200, [('Content-Type', sniff_format(data)),
+                     ('Content-Length', str(len(data))),
+                     ('ETag', etag),
+                     ('Cache-Control', self.cache_control)] + vary, data
+
+    def close(self):
+        if self.overzoom is not None:
+            self.overzoom.close()
+        if self.transcoder is not None:
+            self.transcoder.close()
+        self.tilesets.close()
+
+
+def empty_response(status):
+    """Bodyless response that keeps the connection reusable"""
+    return status, [('Content-Length', '0')], b''
+
+def request_body_length(value):
+    """(length, None) from a Content-Length header, or (None, 400/413) if it is unusable
+
+    After an error the body was not read, so the connection must be closed.
+    """
+    try:
+        length = int(value or 0)
+    except ValueError:
+        return None, 400
+    if length < 0:
+        return None, 400
+    if length > MAX_REQUEST_BODY:
+        return None, 413
+    return length, None
+
+def json_response(payload, status=200):
+    body = json.dumps(payload).encode('utf-8')
+    return status, [('Content-Type', 'application/json'),
+                    ('Content-Length', str(len(body))),
+                    ('Access-Control-Allow-Origin', '*'),
+                    ('Cache-Control', 'no-cache')], body
+
+def accepted_values(header):
+    """Values (lower case) an Accept or Accept-Encoding header allows: q <= 0 or a malformed q excludes"""
+    allowed = set()
+    for item in (header or '').split(','):
+        value, *params = item.split(';')
+        value = value.strip().lower()
+        if not value:
+            continue
+        try:
+            q = next((float(p.split('=', 1)[1]) for p in params if p.strip().lower().startswith('q=')), 1.0)
+        except ValueError:
+            continue
+        if q > 0:
+            allowed.add(value)
+    return allowed
+
+def accepted_encodings(header):
+    """Content codings an Accept-Encoding header value allows"""
+    return accepted_values(header)
+
+
+def decompress(data, coding):
+    """Decode a 'gzip' or 'br' body, or None if it is corrupt or brotli is not installed"""
+    try:
+        if coding == 'gzip':
+            return gzip.decompress(data)
+        import brotli
+        return brotli.decompress(data)
+    except Exception:
+        return None
+
+
+class StaticFiles:
+    """Files under the static directory, served from memory
+
+    A file is read once and again only when its mtime changes. Precompressed
+    variants (name.br, name.gz, see static_precompress.py) are checked against
+    the file once per load (git does not keep mtimes) and sent to clients that
+    accept them. Files inside versioned
+    directories are cached as immutable; the rest are revalidated by ETag.
+    """
+
+    def __init__(self, directory=STATIC_DIR):
+        self.directory = directory
+        self._files = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, name):
+        """Filesystem path for a static name, or None if it leaves the directory"""
+        parts = name.split('/')
+        if any(not part or part.startswith('.') for part in parts):
             return None
-    
-    def serve_map_page(self):
-        """Serve HTML page with interactive map"""
-        html_content = """
-<!DOCTYPE html>
-<html>
-<head>
-    <title>HAYTÜRK Ground Control Station - Map</title>
-    <meta charset="utf-8">
-    <style>
-        body { margin: 0; padding: 0; }
-        #map { width: 100%; height: 100vh; }
-        .aircraft-marker {
-            background-color: red;
-            border: 2px solid white;
-            border-radius: 50%;
-            width: 20px;
-            height: 20px;
-            position: absolute;
-            transform: translate(-50%, -50%);
-            z-index: 1000;
-        }
-    </style>
-    <script src="https://unpkg.com/leaflet@1.7.1/dist/leaflet.js"></script>
-    <link rel="stylesheet" href="https://unpkg.com/leaflet@1.7.1/dist/leaflet.css" />
-</head>
-<body>
-    <div id="map"></div>
-    <div id="aircraft" class="aircraft-marker" style="display: none;"></div>
-    
-    <script>
-        // Initialize map
-        var map = L.map('map').setView([39.9334, 32.8597], 13); // Ankara center
-        
-        // Add MBTiles layer
-        L.tileLayer('http://localhost:8080/{z}/{x}/{y}.png', {
-            attribution: 'HAYTÜRK Offline Map',
-            maxZoom: 18,
-            minZoom: 10
-        }).addTo(map);
-        
-        // Aircraft marker
-        var aircraftMarker = null;
-        
-        // Function to update aircraft position
-        window.updateAircraftPosition = function(lat, lon) {
-            if (aircraftMarker) {
-                aircraftMarker.setLatLng([lat, lon]);
-            } else {
-                aircraftMarker = L.marker([lat, lon], {
-                    icon: L.divIcon({
-                        className: 'aircraft-icon',
-                        html: '<div style="background-color: red; border: 2px solid white; border-radius: 50%; width: 20px; height: 20px;"></div>',
-                        iconSize: [20, 20],
-                        iconAnchor: [10, 10]
-                    })
-                }).addTo(map);
-            }
-            
-            // Center map on aircraft if it's the first position
-            if (!window.aircraftInitialized) {
-                map.setView([lat, lon], 15);
-                window.aircraftInitialized = true;
-            }
-        };
-        
-        // Add some sample waypoints for Ankara
-        var waypoints = [
-            {lat: 39.9334, lon: 32.8597, name: "Kızılay"},
-            {lat: 39.9454, lon: 32.8597, name: "Ulus"},
-            {lat: 39.9204, lon: 32.8597, name: "Çankaya"},
-            {lat: 39.9254, lon: 32.8367, name: "Anıtkabir"}
-        ];
-        
-        waypoints.forEach(function(wp) {
-            L.marker([wp.lat, wp.lon])
-                .bindPopup(wp.name)
-                .addTo(map);
-        });
-        
-        // Add flight path
-        var flightPath = L.polyline([
-            [39.9334, 32.8597],
-            [39.9454, 32.8597],
-            [39.9204, 32.8597],
-            [39.9254, 32.8367]
-        ], {color: 'blue', weight: 3}).addTo(map);
-        
-        // Add HSS (Hazardous Areas)
-        var hss1 = L.circle([39.9334, 32.8597], {
-            color: 'red',
-            fillColor: '#f03',
-            fillOpacity: 0.3,
-            radius: 500
-        }).addTo(map).bindPopup("HSS Zone 1");
-        
-        var hss2 = L.circle([39.9454, 32.8597], {
-            color: 'red',
-            fillColor: '#f03',
-            fillOpacity: 0.3,
-            radius: 300
-        }).addTo(map).bindPopup("HSS Zone 2");
-        
-        console.log("HAYTÜRK Map initialized");
-    </script>
-</body>
-</html>
-        """
-        
-        self.send_response(200)
-        self.send_header('Content-Type', 'text/html')
-        self.send_header('Content-Length', str(len(html_content)))
+        return os.path.join(self.directory, *parts)
+
+    def load(self, name):
+        """(content type, {coding: body}) for a static file, '' being the identity coding"""
+        path = self.resolve(name)
+        if path is None:
+            return None
+        try:
+            mtime = os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._files.get(name)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        try:
+            with open(path, 'rb') as f:
+                bodies = {'': f.read()}
+        except OSError:
+            return None
+        for coding, suffix in STATIC_ENCODINGS:
+            try:
+                with open(path + suffix, 'rb') as f:
+                    variant = f.read()
+            except OSError:
+                continue
+            if decompress(variant, coding) == bodies['']:
+                bodies[coding] = variant
+        content_type = mimetypes.guess_type(name)[0] or 'application/octet-stream'
+        if content_type.startswith('text/') or content_type.endswith('javascript'):
+            content_type += '; charset=utf-8'
+        asset = (content_type, bodies)
+        with self._lock:
+            self._files[name] = (mtime, asset)
+        return asset
+
+    def response(self, name, headers):
+        asset = self.load(name)
+        if asset is None:
+            return empty_response(404)
+        content_type, bodies = asset
+        coding = ''
+        if len(bodies) > 1:
+            allowed = accepted_encodings(headers.get('Accept-Encoding'))
+            coding = next((c for c, _ in STATIC_ENCODINGS if c in bodies and c in allowed), '')
+        body = bodies[coding]
+        etag = tile_etag(bodies[''])
+        if coding:
+            etag = etag[:-1] + '.' + coding + '"'
+        directory = name.split('/')[0] if '/' in name else ''
+        validators = [('ETag', etag),
+                      ('Cache-Control', STATIC_IMMUTABLE if VERSIONED_DIR.search(directory) else 'no-cache'),
+                      ('Access-Control-Allow-Origin', '*')]
+        if len(bodies) > 1:
+            validators.append(('Vary', 'Accept-Encoding'))
+        if etag_matches(headers.get('If-None-Match'), etag):
+            return 304, validators, b''
+        encoding = [('Content-Encoding', coding)] if coding else []
+        return 200, [('Content-Type', content_type),
+                     ('Content-Length', str(len(body)))] + encoding + validators, body
+
+
+class MBTilesHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    timeout = KEEPALIVE_TIMEOUT
+    # Başlık ve gövde ayrı yazılıyor; Nagle + gecikmeli ACK keep-alive'da ~40 ms ekliyordu
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.send_service_response(send_body=True)
+
+    def do_HEAD(self):
+        self.send_service_response(send_body=False)
+
+    def do_POST(self):
+        length, error = request_body_length(self.headers.get('Content-Length'))
+        if error is not None:
+            self.close_connection = True
+            self.send_body(error, b'', 'text/plain')
+            return
+        self.send_service_response(send_body=True, method='POST', request_body=self.rfile.read(length))
+
+    def send_service_response(self, send_body, method='GET', request_body=b''):
+        """Answer the request through the shared TileService"""
+        status, headers, body = self.server.service.handle(self.path, self.headers, method=method,
+                                                           body=request_body)
+        self.send_response(status)
+        for name, value in headers:
+            self.send_header(name, value)
         self.end_headers()
-        self.wfile.write(html_content.encode('utf-8'))
+        if body and send_body:
+            self.write_body(body)
+
+    def write_body(self, body):
+        """Write a response body, using sendfile() for file-backed tiles"""
+        if isinstance(body, BodyParts):
+            for part in body.parts:
+                self.write_body(part)
+        elif isinstance(body, FileRegion):
+            if HAS_SENDFILE:
+                self.connection.sendfile(body.file, body.offset, len(body))
+            else:
+                self.wfile.write(body.view)
+        else:
+            self.wfile.write(body)
+
+    def send_body(self, code, body, content_type):
+        """Send a complete response with Content-Length"""
+        self.send_response(code)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
     
     def log_message(self, format, *args):
         """Override to reduce logging noise"""
@@ -191,22 +1098,100 @@ class MBTilesHandler(BaseHTTPRequestHandler):
         if '404' in format or '500' in format:
             super().log_message(format, *args)
 
-def create_mbtiles_server(mbtiles_path, port=8080):
+class PooledHTTPServer(HTTPServer):
+    """HTTPServer that hands connections to a fixed pool of worker threads
+
+    Worker threads live for the lifetime of the server, so each keeps its own
+    SQLite connection open in MBTilesReader instead of reconnecting per tile.
+    """
+    request_queue_size = 128
+
+    def __init__(self, server_address, RequestHandlerClass, service, workers=DEFAULT_WORKERS):
+        self.service = service
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tile-worker')
+        super().__init__(server_address, RequestHandlerClass)
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process_request_worker, request, client_address)
+
+    def _process_request_worker(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+        self.service.close()
+
+def open_tiles(path):
+    """Open an .mbtiles file or a .tilepack archive with the matching reader"""
+    from tile_archive import ARCHIVE_SUFFIX, TileArchive
+    if path.endswith(ARCHIVE_SUFFIX):
+        return TileArchive(path)
+    return MBTilesReader(path)
+
+def create_tile_service(mbtiles_path, default=None, cache_bytes=DEFAULT_CACHE_BYTES,
+                        max_age=DEFAULT_MAX_AGE, idle_close=DEFAULT_IDLE_CLOSE, overzoom_levels=0,
+                        transcode=None, transcode_dir=None, transcode_disk_bytes=None, catalog=None):
+    """Create the engine-independent tile service
+
+    mbtiles_path may be a map directory (every tileset in it is mounted) or a
+    single file, in which case its directory is mounted, that exact file is
+    served under its name (even if a same-named .tilepack sits next to it)
+    and it is the default.
+    transcode is a list of target formats in preference order (e.g. ['webp']).
+    A TileCatalog of the same directory may be shared with the caller.
+    """
+    if os.path.isdir(mbtiles_path):
+        directory = mbtiles_path
+    else:
+        directory = os.path.dirname(mbtiles_path) or '.'
+    tilesets = TilesetRegistry(directory, default=default, idle_close=idle_close, catalog=catalog)
+    if catalog is None:
+        # Bağımsız sunucu: varsayılan tile seti seçilmeden önce dizin bir kez taranır
+        tilesets.catalog.refresh()
+    if not os.path.isdir(mbtiles_path):
+        name = tilesets.mount(mbtiles_path)
+        tilesets.default = default or name
+    tilesets.catalog.start_watching()
+    if tilesets.default is None:
+        names = tilesets.names()
+        tilesets.default = names[0] if names else None
+    tilesets.start_reaper()
+    cache = TileCache(cache_bytes) if cache_bytes > 0 else None
+    overzoom = None
+    if overzoom_levels > 0:
+        try:
+            from tile_overzoom import Overzoomer
+            overzoom = Overzoomer(max_levels=overzoom_levels)
+        except ImportError as e:
+            print(f"Overzoom disabled (Pillow not available): {e}")
+    transcoder = None
+    if transcode:
+        try:
+            from tile_transcode import Transcoder, TRANSCODE_DIR, DEFAULT_DISK_BYTES
+            transcoder = Transcoder(transcode, disk_dir=transcode_dir or os.path.join(directory, TRANSCODE_DIR),
+                                    disk_bytes=DEFAULT_DISK_BYTES if transcode_disk_bytes is None
+                                    else transcode_disk_bytes)
+        except ImportError as e:
+            print(f"Transcoding disabled (Pillow not available): {e}")
+    return TileService(tilesets, cache=cache, max_age=max_age, overzoom=overzoom, transcoder=transcoder)
+
+def create_mbtiles_server(mbtiles_path, port=8080, workers=DEFAULT_WORKERS, host='localhost',
+                          cache_bytes=DEFAULT_CACHE_BYTES, max_age=DEFAULT_MAX_AGE, default=None,
+                          overzoom_levels=0, transcode=None, transcode_dir=None, transcode_disk_bytes=None):
     """Create and return an MBTiles HTTP server"""
+    service = create_tile_service(mbtiles_path, default=default, cache_bytes=cache_bytes, max_age=max_age,
+                                  overzoom_levels=overzoom_levels, transcode=transcode,
+                                  transcode_dir=transcode_dir, transcode_disk_bytes=transcode_disk_bytes)
+    server = PooledHTTPServer((host, port), MBTilesHandler, service, workers=workers)
     
-    class MBTilesServer(HTTPServer):
-        def __init__(self, server_address, RequestHandlerClass, mbtiles_path):
-            self.mbtiles_path = mbtiles_path
-            super().__init__(server_address, RequestHandlerClass)
-        
-        def finish_request(self, request, client_address):
-            """Override to pass mbtiles_path to handler"""
-            self.RequestHandlerClass(self.mbtiles_path, request, client_address, self)
-    
-    # Create server
-    server = MBTilesServer(('localhost', port), MBTilesHandler, mbtiles_path)
-    
-    print(f"MBTiles server created for {mbtiles_path} on port {port}")
+    print(f"MBTiles server created for {mbtiles_path} on port {port} ({workers} workers)")
     return server
 
 def start_mbtiles_server(mbtiles_path, port=8080):
@@ -237,12 +1222,63 @@ def start_mbtiles_server(mbtiles_path, port=8080):
     
     return server
 
-if __name__ == "__main__":
-    if len(sys.argv) < 3:
-        print("Kullanım: python mbtiles_server.py map.mbtiles 8080")
+def main():
+    """Command-line entry point"""
+    parser = argparse.ArgumentParser(description="Kullanım: python mbtiles_server.py map.mbtiles 8080")
+    parser.add_argument('mbtiles', help="Harita dizini, .mbtiles dosyası veya .tilepack arşivi")
+    parser.add_argument('port', nargs='?', type=int, default=8080)
+    parser.add_argument('--default', help="/tiles/{z}/{x}/{y}.png için varsayılan tile seti adı")
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--engine', choices=['threaded', 'asyncio'], default='threaded',
+                        help="Sunucu motoru: iş parçacığı havuzu veya asyncio")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS,
+                        help="Tile isteklerini karşılayan iş parçacığı sayısı")
+    parser.add_argument('--cache-bytes', type=int, default=DEFAULT_CACHE_BYTES,
+                        help="Bellek içi tile önbelleği sınırı (byte, 0 = kapalı)")
+    parser.add_argument('--max-age', type=int, default=DEFAULT_MAX_AGE,
+                        help="Tile yanıtlarındaki Cache-Control max-age değeri (saniye)")
+    parser.add_argument('--overzoom', type=int, default=0, metavar='LEVELS',
+                        help="Eksik tile'ları en fazla bu kadar üst seviyedeki atadan büyüterek üret (Pillow gerekir)")
+    parser.add_argument('--transcode', metavar='FORMATS',
+                        help="PNG tile'ları istemcinin kabul ettiği biçime çevir, tercih sırasıyla ör. webp,jpeg (Pillow gerekir)")
+    parser.add_argument('--transcode-dir', help="Dönüştürülmüş tile disk önbelleği (varsayılan: <harita dizini>/.transcode)")
+    parser.add_argument('--transcode-disk-bytes', type=int, help="Disk önbelleği sınırı (byte, 0 = kapalı)")
+    args = parser.parse_args()
+    transcode = [t.strip() for t in args.transcode.split(',') if t.strip()] if args.transcode else None
+    if not os.path.exists(args.mbtiles):
+        print(f"MBTiles file not found: {args.mbtiles}")
         sys.exit(1)
-    mbtiles = sys.argv[1]
-    port = int(sys.argv[2])
-    server = HTTPServer(('127.0.0.1', port), MBTilesHandler)
-    print(f"Serving {mbtiles} at http://127.0.0.1:{port}/tiles/{{z}}/{{x}}/{{y}}.png")
-    server.serve_forever() 
\ No newline at end of file
+    print(f"Serving {args.mbtiles} at http://{args.host}:{args.port}/tiles/<name>/{{z}}/{{x}}/{{y}}.png ({args.engine})")
+    if args.engine == 'asyncio':
+        from mbtiles_async import run_async_server
+        service = create_tile_service(args.mbtiles, default=args.default, cache_bytes=args.cache_bytes,
+                                      max_age=args.max_age, overzoom_levels=args.overzoom, transcode=transcode,
+                                      transcode_dir=args.transcode_dir,
+                                      transcode_disk_bytes=args.transcode_disk_bytes)
+        try:
+            run_async_server(service, args.host, args.port, workers=args.workers)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if service.cache is not None:
+                print(f"Tile cache: {service.cache.stats()}")
+            service.close()
+        return
+    server = create_mbtiles_server(args.mbtiles, args.port, workers=args.workers, host=args.host,
+                                   cache_bytes=args.cache_bytes, max_age=args.max_age, default=args.default,
+                                   overzoom_levels=args.overzoom, transcode=transcode,
+                                   transcode_dir=args.transcode_dir, transcode_disk_bytes=args.transcode_disk_bytes)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        if server.service.cache is not None:
+            print(f"Tile cache: {server.service.cache.stats()}")
+        server.server_close()
+
+if __name__ == "__main__":
+    # tile_archive ve mbtiles_async bu modülü 'mbtiles_server' adıyla içe aktarır;
+    # sınıfların tek kopyası olması için CLI o modül üzerinden çalıştırılır
+    import mbtiles_server
+    mbtiles_server.main()
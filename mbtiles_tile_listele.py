@@ -1,40 +1,175 @@
-import sqlite3
+#!/usr/bin/env python3
+"""
+MBTiles Tile Inventory
+Per-zoom tile counts, size distribution, bounds and coverage of an .mbtiles file
+
+Her zoom seviyesi ayrı bir süreçte SQL ile taranır; tile listesinin tamamı
+istenirse --export ile CSV/NDJSON olarak akış halinde yazılır.
+"""
+
+import os
 import sys
+import csv
+import json
+import sqlite3
+import argparse
+import time
+from concurrent.futures import ProcessPoolExecutor
+from urllib.request import pathname2url
+
+import numpy as np
+
+from tile_math import tile_bounds
+
+MAX_ZOOM = 30
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def connect(mbtiles_path):
+    uri = f"file:{pathname2url(os.path.abspath(mbtiles_path))}?mode=ro"
+    return sqlite3.connect(uri, uri=True)
+
+
+def zoom_levels(mbtiles_path):
+    """Zoom levels present in the file (one index probe per level, no full scan)"""
+    conn = connect(mbtiles_path)
+    try:
+        return [z for z in range(MAX_ZOOM + 1)
+                if conn.execute("SELECT 1 FROM tiles WHERE zoom_level=? LIMIT 1", (z,)).fetchone()]
+    finally:
+        conn.close()
 
-def main(mbtiles_path):
-    conn = sqlite3.connect(mbtiles_path)
-    cur = conn.cursor()
-    report_lines = []
-    report_lines.append("Zoom | X | Y (Slippy) | Y (MBTiles) | Boyut (byte)")
-    report_lines.append("-" * 50)
+
+def zoom_stats(mbtiles_path, z):
+    """Count, slippy extent, missing ratio and size distribution of one zoom level"""
+    conn = connect(mbtiles_path)
+    try:
+        count, xmin, xmax, rmin, rmax = conn.execute(
+            "SELECT COUNT(*), MIN(tile_column), MAX(tile_column), MIN(tile_row), MAX(tile_row) "
+            "FROM tiles WHERE zoom_level=?", (z,)).fetchone()
+        # length() blob içeriğini okumadan kayıt başlığından boyutu verir
+        cursor = conn.execute("SELECT length(tile_data) FROM tiles WHERE zoom_level=?", (z,))
+        sizes = np.fromiter((row[0] for row in cursor), dtype=np.int64, count=count)
+    finally:
+        conn.close()
+    top = (1 << z) - 1
+    ymin, ymax = top - rmax, top - rmin
+    west, _, _, north = tile_bounds(xmin, ymin, z)
+    _, south, east, _ = tile_bounds(xmax, ymax, z)
+    area = (xmax - xmin + 1) * (ymax - ymin + 1)
+    p50, p95 = np.percentile(sizes, [50, 95])
+    return {
+        'zoom': z,
+        'count': count,
+        'xmin': xmin, 'xmax': xmax, 'ymin': ymin, 'ymax': ymax,
+        'bounds': [west, south, east, north],
+        'missing_ratio': 1 - count / area,
+        'bytes': int(sizes.sum()),
+        'size_min': int(sizes.min()),
+        'size_mean': float(sizes.mean()),
+        'size_p50': float(p50),
+        'size_p95': float(p95),
+        'size_max': int(sizes.max()),
+    }
+
+
+def _zoom_stats_job(args):
+    return zoom_stats(*args)
+
+
+def export_tiles(mbtiles_path, out, export_format):
+    """Stream every tile as (z, x, slippy y, mbtiles row, size) to a CSV or NDJSON file object"""
+    conn = connect(mbtiles_path)
+    writer = csv.writer(out) if export_format == 'csv' else None
+    if writer:
+        writer.writerow(['zoom', 'x', 'y', 'tile_row', 'size'])
     count = 0
-    for row in cur.execute("SELECT zoom_level, tile_column, tile_row, length(tile_data) FROM tiles ORDER BY zoom_level, tile_column, tile_row"):
-        z, x, y_mbtiles, size = row
-        y_slippy = (2 ** z - 1) - y_mbtiles
-        line = f"{z:4} | {x:5} | {y_slippy:8} | {y_mbtiles:9} | {size:10}"
-        print(line)
-        report_lines.append(line)
-        count += 1
-    report_lines.append("-" * 50)
-    report_lines.append(f"Toplam tile sayısı: {count}")
-    print("-" * 50)
-    print(f"Toplam tile sayısı: {count}")
-    # Örnek bir tile'ı kaydetmek için:
-    cur.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles LIMIT 1")
-    z, x, y_mbtiles, data = cur.fetchone()
-    y_slippy = (2 ** z - 1) - y_mbtiles
-    tile_msg = f"Örnek tile kaydedildi: tile_z{z}_x{x}_y{y_slippy}.png"
-    with open(f"tile_z{z}_x{x}_y{y_slippy}.png", "wb") as f:
+    try:
+        for z, x, tile_row, size in conn.execute(
+                "SELECT zoom_level, tile_column, tile_row, length(tile_data) FROM tiles"):
+            y = (1 << z) - 1 - tile_row
+            if writer:
+                writer.writerow((z, x, y, tile_row, size))
+            else:
+                out.write(json.dumps({'zoom': z, 'x': x, 'y': y, 'tile_row': tile_row, 'size': size}) + '\n')
+            count += 1
+    finally:
+        conn.close()
+    return count
+
+
+def save_sample_tile(mbtiles_path):
+    conn = connect(mbtiles_path)
+    try:
+        row = conn.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles LIMIT 1").fetchone()
+    finally:
+        conn.close()
+    if row is None:
+        return None
+    z, x, tile_row, data = row
+    path = f"tile_z{z}_x{x}_y{(1 << z) - 1 - tile_row}.png"
+    with open(path, "wb") as f:
         f.write(data)
-    print(tile_msg)
-    report_lines.append(tile_msg)
-    with open("tiles_report.txt", "w", encoding="utf-8") as f:
-        for line in report_lines:
-            f.write(line + "\n")
-    conn.close()
+    return path
+
+
+def main(mbtiles_path, workers=None, export=None, export_format=None, report=None, sample=False):
+    start = time.perf_counter()
+    zooms = zoom_levels(mbtiles_path)
+    print(f"{mbtiles_path}: {len(zooms)} zoom seviyesi, {os.path.getsize(mbtiles_path) / 2**20:.1f} MB")
+    print("Zoom |     Tile | Eksik % |   Toplam MB |  Ort. KB |  p50 KB |  p95 KB |  Maks KB | X aralığı | Y aralığı")
+    print("-" * 108)
+    stats = []
+    with ProcessPoolExecutor(max_workers=workers or min(len(zooms), os.cpu_count() or 1) or 1) as pool:
+        # Sonuçlar zoom sırasıyla geldikçe yazdırılır
+        for s in pool.map(_zoom_stats_job, [(mbtiles_path, z) for z in zooms]):
+            stats.append(s)
+            print(f"{s['zoom']:4} | {s['count']:8} | {100 * s['missing_ratio']:7.2f} | {s['bytes'] / 2**20:11.1f} | "
+                  f"{s['size_mean'] / 1024:8.1f} | {s['size_p50'] / 1024:7.1f} | {s['size_p95'] / 1024:7.1f} | "
+                  f"{s['size_max'] / 1024:8.1f} | {s['xmin']}-{s['xmax']} | {s['ymin']}-{s['ymax']}", flush=True)
+    print("-" * 108)
+    total = sum(s['count'] for s in stats)
+    total_bytes = sum(s['bytes'] for s in stats)
+    print(f"Toplam tile sayısı: {total}, tile verisi {total_bytes / 2**20:.1f} MB")
+    if stats:
+        deepest = stats[-1]
+        print(f"Zoom {stats[0]['zoom']}-{deepest['zoom']}, sınırlar (B, G, D, K): "
+              f"{', '.join(f'{v:.5f}' for v in deepest['bounds'])}")
+    conn = connect(mbtiles_path)
+    try:
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='images'").fetchone():
+            unique = conn.execute("SELECT COUNT(*) FROM images").fetchone()[0]
+            print(f"Tekilleştirilmiş şema: {unique} benzersiz tile verisi")
+    finally:
+        conn.close()
+    print(f"Süre: {time.perf_counter() - start:.1f} s")
+
+    if report:
+        with open(report, "w", encoding="utf-8") as f:
+            json.dump({'path': mbtiles_path, 'tiles': total, 'bytes': total_bytes, 'zooms': stats}, f, indent=2)
+        print(f"Özet rapor kaydedildi: {report}")
+    if export:
+        export_format = export_format or ('ndjson' if export.endswith(('.ndjson', '.jsonl')) else 'csv')
+        if export == '-':
+            count = export_tiles(mbtiles_path, sys.stdout, export_format)
+        else:
+            with open(export, "w", encoding="utf-8", newline='') as out:
+                count = export_tiles(mbtiles_path, out, export_format)
+            print(f"{count} tile {export} dosyasına yazıldı")
+    if sample:
+        path = save_sample_tile(mbtiles_path)
+        if path:
+            print(f"Örnek tile kaydedildi: {path}")
+
 
 if __name__ == "__main__":
-    if len(sys.argv) < 2:
-        print("Kullanım: python mbtiles_tile_listele.py map.mbtiles")
-        sys.exit(1)
-    main(sys.argv[1]) 
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Kullanım: python mbtiles_tile_listele.py map.mbtiles")
+    parser.add_argument('mbtiles', help="İncelenecek .mbtiles dosyası")
+    parser.add_argument('--workers', type=int, help="Zoom seviyelerini tarayan süreç sayısı")
+    parser.add_argument('--export', help="Tüm tile listesini bu dosyaya yaz ('-' = standart çıktı)")
+    parser.add_argument('--format', choices=EXPORT_FORMATS, help="Dışa aktarma biçimi (varsayılan: uzantıdan)")
+    parser.add_argument('--report', help="Zoom istatistiklerini JSON olarak kaydet")
+    parser.add_argument('--sample', action='store_true', help="Örnek bir tile'ı PNG olarak kaydet")
+    args = parser.parse_args()
+    main(args.mbtiles, workers=args.workers, export=args.export, export_format=args.format,
+         report=args.report, sample=args.sample)
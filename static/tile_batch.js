@@ -0,0 +1,147 @@
+/*
+ * HAYTÜRK batch tile layer for Leaflet
+ *
+ * Tiles created in the same frame (a pan, zoom change or redraw) are grouped
+ * per zoom level and fetched from mbtiles_server.py's /batch endpoint in one
+ * request. Bundle layout (little-endian): 'HTB2', u32 count, then per tile
+ * u8 z, u8 format code (index into FORMATS), u32 x, u32 y, u32 length and
+ * the tile bytes. Tiles missing from the bundle do not exist; if the batch
+ * request fails the layer falls back to the normal per-tile URLs.
+ *
+ * Batches are loaded with XMLHttpRequest rather than fetch(): QtWebEngine 5
+ * does not support fetch() on custom schemes such as mbtiles://.
+ *
+ *     L.tileLayer.batch('http://127.0.0.1:8080/tiles/map/{z}/{x}/{y}.png',
+ *                       'http://127.0.0.1:8080/batch/map', {maxZoom: 18}).addTo(map);
+ */
+(function () {
+    var BUNDLE_MAGIC = 'HTB2';
+    var HEADER_SIZE = 8;
+    var ENTRY_SIZE = 14;
+    // Sunucudaki BUNDLE_FORMATS ile aynı sırada
+    var FORMATS = ['application/octet-stream', 'image/png', 'image/jpeg', 'image/webp', 'image/gif',
+                   'application/x-protobuf'];
+    // Sunucudaki MAX_BATCH_TILES ile aynı
+    var MAX_BATCH_TILES = 1024;
+
+    function parseBundle(buffer) {
+        var view = new DataView(buffer);
+        var magic = String.fromCharCode(view.getUint8(0), view.getUint8(1), view.getUint8(2), view.getUint8(3));
+        if (magic !== BUNDLE_MAGIC) {
+            throw new Error('Not a tile bundle');
+        }
+        var count = view.getUint32(4, true);
+        var tiles = {};
+        var offset = HEADER_SIZE;
+        for (var i = 0; i < count; i++) {
+            var type = FORMATS[view.getUint8(offset + 1)] || FORMATS[0];
+            var x = view.getUint32(offset + 2, true);
+            var y = view.getUint32(offset + 6, true);
+            var length = view.getUint32(offset + 10, true);
+            offset += ENTRY_SIZE;
+            tiles[x + ':' + y] = new Blob([new Uint8Array(buffer, offset, length)], {type: type});
+            offset += length;
+        }
+        return tiles;
+    }
+
+    L.TileLayer.Batch = L.TileLayer.extend({
+        initialize: function (url, batchUrl, options) {
+            L.TileLayer.prototype.initialize.call(this, url, options);
+            this._batchUrl = batchUrl;
+            this._queue = [];
+            this._flushTimer = null;
+        },
+
+        // Harita değişimi: tek tek tile URL'si ve batch adresi birlikte değişir
+        setUrls: function (url, batchUrl, noRedraw) {
+            this._batchUrl = batchUrl;
+            return this.setUrl(url, noRedraw);
+        },
+
+        createTile: function (coords, done) {
+            var tile = document.createElement('img');
+            L.DomEvent.on(tile, 'load', L.Util.bind(this._tileOnLoad, this, done, tile));
+            L.DomEvent.on(tile, 'error', L.Util.bind(this._tileOnError, this, done, tile));
+            tile.alt = '';
+            tile.setAttribute('role', 'presentation');
+            this._queue.push({coords: coords, z: this._getZoomForUrl(), tile: tile, done: done});
+            // GridLayer aynı karede oluşturduğu bütün tile'lar için createTile çağırır
+            if (!this._flushTimer) {
+                this._flushTimer = setTimeout(L.Util.bind(this._flush, this), 0);
+            }
+            return tile;
+        },
+
+        _flush: function () {
+            var queue = this._queue;
+            this._queue = [];
+            this._flushTimer = null;
+            var groups = {};
+            for (var i = 0; i < queue.length; i++) {
+                (groups[queue[i].z] = groups[queue[i].z] || []).push(queue[i]);
+            }
+            for (var z in groups) {
+                this._fetchGroup(+z, groups[z]);
+            }
+        },
+
+        _fetchGroup: function (z, items) {
+            var x0 = Infinity, x1 = -Infinity, y0 = Infinity, y1 = -Infinity;
+            for (var i = 0; i < items.length; i++) {
+                var c = items[i].coords;
+                x0 = Math.min(x0, c.x); x1 = Math.max(x1, c.x);
+                y0 = Math.min(y0, c.y); y1 = Math.max(y1, c.y);
+            }
+            var n = 1 << z;
+            if (!this._batchUrl || x0 < 0 || y0 < 0 || x1 >= n || y1 >= n ||
+                    (x1 - x0 + 1) * (y1 - y0 + 1) > MAX_BATCH_TILES) {
+                this._loadSingly(items);
+                return;
+            }
+            var self = this;
+            var url = this._batchUrl + '?z=' + z + '&x=' + x0 + '-' + x1 + '&y=' + y0 + '-' + y1;
+            var xhr = new XMLHttpRequest();
+            xhr.open('GET', url);
+            xhr.responseType = 'arraybuffer';
+            xhr.onload = function () {
+                // Özel şemalarda durum kodu 0 olabilir; paket başlığı yine de doğrulanır
+                var tiles;
+                try {
+                    if (xhr.status && xhr.status !== 200) {
+                        throw new Error('Batch request failed: ' + xhr.status);
+                    }
+                    tiles = parseBundle(xhr.response);
+                } catch (e) {
+                    self._loadSingly(items);
+                    return;
+                }
+                items.forEach(function (item) {
+                    var blob = tiles[item.coords.x + ':' + item.coords.y];
+                    if (!blob) {
+                        self._tileOnError(item.done, item.tile, new Error('Tile not found'));
+                        return;
+                    }
+                    var src = URL.createObjectURL(blob);
+                    var revoke = function () { URL.revokeObjectURL(src); };
+                    L.DomEvent.on(item.tile, 'load error', revoke);
+                    item.tile.src = src;
+                });
+            };
+            xhr.onerror = function () {
+                self._loadSingly(items);
+            };
+            xhr.send();
+        },
+
+        _loadSingly: function (items) {
+            for (var i = 0; i < items.length; i++) {
+                items[i].tile.src = this.getTileUrl(items[i].coords);
+            }
+        }
+    });
+
+    L.tileLayer.batch = function (url, batchUrl, options) {
+        return new L.TileLayer.Batch(url, batchUrl, options);
+    };
+})();
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Static Precompress
+Writes .gz and .br variants next to the compressible files under static/ so
+the tile server can send them without compressing per request
+
+Statik dosyalar değiştiğinde yeniden çalıştırılmalıdır (eskimiş varyantlar
+sunucu tarafından zaten yok sayılır):
+    python static_precompress.py
+"""
+
+import os
+import gzip
+import argparse
+import mimetypes
+
+from mbtiles_server import STATIC_DIR, STATIC_ENCODINGS, decompress
+
+COMPRESSIBLE_TYPES = ('text/', 'application/javascript', 'application/json', 'image/svg+xml')
+# Bu boyutun altındaki dosyalarda sıkıştırma kazancı başlık maliyetini karşılamaz
+MIN_SIZE = 1024
+
+
+def compress(data, coding):
+    """Compressed bytes for 'gzip' or 'br', or None when the codec is unavailable"""
+    if coding == 'gzip':
+        # mtime=0: aynı girdi her seferinde aynı dosyayı üretir
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    try:
+        import brotli
+    except ImportError:
+        return None
+    return brotli.compress(data, quality=11)
+
+
+def precompress(directory=STATIC_DIR):
+    """Write missing or outdated variants; returns [(path, coding, size, compressed size)]"""
+    suffixes = tuple(suffix for _, suffix in STATIC_ENCODINGS)
+    written = []
+    for root, _, files in os.walk(directory):
+        for name in sorted(files):
+            if name.endswith(suffixes) or name.startswith('.'):
+                continue
+            content_type = mimetypes.guess_type(name)[0] or ''
+            path = os.path.join(root, name)
+            if not content_type.startswith(COMPRESSIBLE_TYPES) or os.path.getsize(path) < MIN_SIZE:
+                continue
+            with open(path, 'rb') as f:
+                data = f.read()
+            for coding, suffix in STATIC_ENCODINGS:
+                target = path + suffix
+                if os.path.exists(target):
+                    with open(target, 'rb') as f:
+                        if decompress(f.read(), coding) == data:
+                            continue
+                out = compress(data, coding)
+                if out is None or len(out) >= len(data):
+                    continue
+                with open(target, 'wb') as f:
+                    f.write(out)
+                written.append((path, coding, len(data), len(out)))
+    return written
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="static/ altındaki dosyaların gzip/br varyantlarını üret")
+    parser.add_argument('directory', nargs='?', default=STATIC_DIR, help="Statik dosya dizini")
+    args = parser.parse_args()
+    try:
+        import brotli
+    except ImportError:
+        print("brotli modülü yok, yalnızca .gz üretilecek (pip install brotli)")
+    for path, coding, size, out in precompress(args.directory):
+        print(f"  {os.path.relpath(path, args.directory)} ({coding}): {size / 1024:.1f} KB -> {out / 1024:.1f} KB")
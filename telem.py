@@ -1,8 +1,9 @@
 import serial
-import struct
 import threading
 import time
 
+from telemetry_protocol import FrameDecoder, encode_position, MSG_POSITION
+
 com_port = 'COM10'
 baudrate = 57600
 
@@ -10,14 +11,19 @@ ser = serial.Serial(com_port, baudrate, timeout=1)
 print(f"{com_port} portu dinleniyor...")
 
 def oku():
+    decoder = FrameDecoder()
+    reported = (0, 0)
     while True:
         try:
-            data = ser.read(24)  # 3 x double = 24 byte bekliyoruz
-            if len(data) == 24:
-                vals = struct.unpack('<3d', data)  # Little-endian 3 double
-                print(f"Gelen dizi: lat={vals[0]}, lon={vals[1]}, alt={vals[2]}")
-            elif len(data) > 0:
-                print(f"Beklenmeyen uzunluk: {len(data)} byte")
+            # Ne kadar bayt varsa oku; çözücü tüm tam çerçeveleri ayıklar ve kaymadan kurtulur
+            data = ser.read(ser.in_waiting or 1)
+            for msg_id, seq, vals in decoder.feed(data):
+                if msg_id == MSG_POSITION:
+                    print(f"Gelen dizi #{seq}: lat={vals[0]}, lon={vals[1]}, alt={vals[2]}")
+            errors = (decoder.bad_frames, decoder.skipped_bytes)
+            if errors != reported:
+                reported = errors
+                print(f"Bozuk çerçeve: {errors[0]}, atlanan bayt: {errors[1]}, kayıp: {decoder.lost_frames}")
         except Exception as e:
             print(f"Okuma hatası: {e}")
             break
@@ -26,11 +32,12 @@ def yaz():
     lat = 39.9208
     lon = 32.8541
     alt = 890.0
+    seq = 0
     while True:
         try:
-            data = struct.pack('<3d', lat, lon, alt)
-            ser.write(data)
-            print(f"Gönderilen: lat={lat}, lon={lon}, alt={alt}")
+            ser.write(encode_position(lat, lon, alt, seq))
+            print(f"Gönderilen #{seq & 0xFF}: lat={lat}, lon={lon}, alt={alt}")
+            seq += 1
             time.sleep(1)
         except KeyboardInterrupt:
             break
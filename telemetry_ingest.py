@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Telemetry Ingest Module
+Decouples line-rate serial ingest from the display cadence
+
+Seri okuyucu portu sürekli boşaltır ve her örneği offer() ile verir;
+arayüz yalnızca poll() ile görüntüleme hızında en son örneği alır. Arada
+üzerine yazılan örnekler kuyruğa alınmaz, sadece sayılır. Toplu modda
+(SampleBatcher) örneklerin tamamı sabit aralıklarla tek dizi halinde gider.
+"""
+
+import time
+
+import numpy as np
+
+from telemetry_store import SAMPLE_DTYPE
+
+# Seri okuma zaman aşımı: okuyucu en geç bu sürede bir yayın zamanını kontrol eder
+READ_TIMEOUT = 0.05
+# Toplu teslim: arayüze en fazla bu aralıkla ya da bu kadar örnek birikince bir sinyal
+BATCH_INTERVAL = 0.2
+BATCH_SIZE = 256
+
+
+class LatestSampleCoalescer:
+    """Holds only the newest sample and releases it at most rate times per second
+
+    Samples superseded before they were published are counted as stale.
+    """
+
+    def __init__(self, rate=1.0):
+        self.period = 1.0 / rate
+        self.latest = None
+        self.received = 0
+        self.published = 0
+        self.stale = 0
+        self._next_publish = 0.0
+
+    def offer(self, sample):
+        if self.latest is not None:
+            self.stale += 1
+        self.latest = sample
+        self.received += 1
+
+    def poll(self, now=None):
+        """The newest unpublished sample if a display tick is due, else None"""
+        if self.latest is None:
+            return None
+        now = time.monotonic() if now is None else now
+        if now < self._next_publish:
+            return None
+        sample, self.latest = self.latest, None
+        self._next_publish += self.period
+        if self._next_publish <= now:
+            # Kaçırılan tikler biriktirilmez; bir sonraki yayın şimdiden bir periyot sonra
+            self._next_publish = now + self.period
+        self.published += 1
+        return sample
+
+    def stats(self):
+        return {'received': self.received, 'published': self.published, 'stale': self.stale}
+
+
+class SampleBatcher:
+    """Collects sample rows into a preallocated array and hands out one batch
+    per tick, or as soon as the array is full
+
+    Rows are tuples in SAMPLE_DTYPE field order; a batch is a compact
+    SAMPLE_DTYPE array (oldest first) that is safe to pass to another thread.
+    """
+
+    def __init__(self, interval=BATCH_INTERVAL, size=BATCH_SIZE):
+        self.interval = interval
+        self.batches = 0
+        self._buffer = np.zeros(size, dtype=SAMPLE_DTYPE)
+        self._count = 0
+        self._next_flush = 0.0
+
+    def add(self, row):
+        """Add one sample; returns a batch if this filled the buffer, else None"""
+        self._buffer[self._count] = row
+        self._count += 1
+        if self._count == len(self._buffer):
+            return self._flush(time.monotonic())
+        return None
+
+    def poll(self, now=None):
+        """The pending samples as a batch if the tick is due, else None"""
+        if not self._count:
+            return None
+        now = time.monotonic() if now is None else now
+        if now < self._next_flush:
+            return None
+        return self._flush(now)
+
+    def _flush(self, now):
+        batch = self._buffer[:self._count].copy()
+        self._count = 0
+        self._next_flush = now + self.interval
+        self.batches += 1
+        return batch
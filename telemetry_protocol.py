@@ -0,0 +1,151 @@
+#!/usr/bin/env python3
+"""
+Telemetry Protocol Module
+Framed binary telemetry over the radio link, and an incremental decoder that
+resynchronizes after dropped or corrupted bytes
+
+Çerçeve (little-endian):
+    A5 5A | uzunluk (u8) | sıra no (u8) | mesaj id (u8) | veri | CRC-16 (u16)
+CRC, binascii.crc_hqx (CRC-16/CCITT, başlangıç 0xFFFF) ile uzunluk
+alanından verinin sonuna kadar hesaplanır.
+"""
+
+import argparse
+import time
+from binascii import crc_hqx
+from struct import Struct
+
+SYNC = b'\xa5\x5a'
+HEADER = Struct('<2sBBB')
+CRC = Struct('<H')
+CRC_INIT = 0xFFFF
+MAX_PAYLOAD = 255
+MAX_FRAME = HEADER.size + MAX_PAYLOAD + CRC.size
+
+MSG_POSITION = 1
+MESSAGES = {
+    MSG_POSITION: Struct('<3d'),  # lat, lon, alt
+}
+
+
+def encode_frame(msg_id, payload, seq):
+    """One complete frame carrying payload bytes"""
+    if len(payload) > MAX_PAYLOAD:
+        raise ValueError(f"Payload too large: {len(payload)} bytes")
+    frame = bytearray(HEADER.pack(SYNC, len(payload), seq & 0xFF, msg_id))
+    frame += payload
+    frame += CRC.pack(crc_hqx(memoryview(frame)[len(SYNC):], CRC_INIT))
+    return bytes(frame)
+
+
+def encode_position(lat, lon, alt, seq):
+    return encode_frame(MSG_POSITION, MESSAGES[MSG_POSITION].pack(lat, lon, alt), seq)
+
+
+class FrameDecoder:
+    """Pulls every complete frame out of a byte stream fed in arbitrary chunks
+
+    Bytes are appended to one reusable bytearray and frames are parsed in
+    place (sync search, CRC and struct unpacking all work on the buffer), so
+    nothing is allocated per byte. A frame with a bad length or CRC costs one
+    byte of resync: the search restarts right after its sync word, so a real
+    frame hidden behind a false sync is not lost.
+    """
+
+    def __init__(self, messages=MESSAGES):
+        self.messages = messages
+        self.buffer = bytearray()
+        self.frames = 0
+        self.bad_frames = 0
+        self.skipped_bytes = 0
+        self.lost_frames = 0
+        self._last_seq = None
+
+    def feed(self, data):
+        """Add received bytes; returns [(msg_id, seq, values)] for every complete frame
+
+        values is the unpacked tuple for known messages and the raw payload
+        bytes for unknown ones.
+        """
+        buffer = self.buffer
+        buffer += data
+        decoded = []
+        pos = 0
+        end = len(buffer)
+        with memoryview(buffer) as view:
+            while True:
+                start = buffer.find(SYNC, pos)
+                if start < 0:
+                    # Son bayt bir sonraki parçada tamamlanacak senkron kelimesinin başı olabilir
+                    keep = end - 1 if end > pos and buffer[-1] == SYNC[0] else end
+                    self.skipped_bytes += keep - pos
+                    pos = keep
+                    break
+                self.skipped_bytes += start - pos
+                pos = start
+                if end - start < HEADER.size:
+                    break
+                _, length, seq, msg_id = HEADER.unpack_from(buffer, start)
+                layout = self.messages.get(msg_id)
+                if layout is not None and layout.size != length:
+                    self.bad_frames += 1
+                    pos = start + 1
+                    continue
+                frame_end = start + HEADER.size + length + CRC.size
+                if frame_end > end:
+                    break
+                crc_end = frame_end - CRC.size
+                if crc_hqx(view[start + len(SYNC):crc_end], CRC_INIT) != CRC.unpack_from(buffer, crc_end)[0]:
+                    self.bad_frames += 1
+                    pos = start + 1
+                    continue
+                payload_start = start + HEADER.size
+                if layout is not None:
+                    values = layout.unpack_from(buffer, payload_start)
+                else:
+                    values = bytes(view[payload_start:crc_end])
+                decoded.append((msg_id, seq, values))
+                self.frames += 1
+                if self._last_seq is not None:
+                    self.lost_frames += (seq - self._last_seq - 1) & 0xFF
+                self._last_seq = seq
+                pos = frame_end
+        # Tek kaydırma: işlenen baytlar parça başına bir kez atılır
+        del buffer[:pos]
+        return decoded
+
+    def stats(self):
+        return {
+            'frames': self.frames,
+            'bad_frames': self.bad_frames,
+            'skipped_bytes': self.skipped_bytes,
+            'lost_frames': self.lost_frames,
+            'buffered': len(self.buffer),
+        }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Çerçeve çözücü hız ve bozulma testi")
+    parser.add_argument('--frames', type=int, default=100000)
+    parser.add_argument('--chunk', type=int, default=64, help="Seri porttan bir okumada gelen bayt")
+    parser.add_argument('--corrupt', type=float, default=0.01, help="Bozulan/düşen bayt oranı")
+    args = parser.parse_args()
+
+    import random
+    rng = random.Random(1)
+    stream = bytearray()
+    for i in range(args.frames):
+        stream += encode_position(39.9 + i * 1e-6, 32.8, 900.0, i)
+    for _ in range(int(len(stream) * args.corrupt)):
+        i = rng.randrange(len(stream))
+        if rng.random() < 0.5:
+            del stream[i]
+        else:
+            stream[i] ^= 0xFF
+    decoder = FrameDecoder()
+    start = time.perf_counter()
+    count = 0
+    for i in range(0, len(stream), args.chunk):
+        count += len(decoder.feed(stream[i:i + args.chunk]))
+    elapsed = time.perf_counter() - start
+    print(f"{count}/{args.frames} çerçeve, {count / elapsed:,.0f} çerçeve/s; {decoder.stats()}")
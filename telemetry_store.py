@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Telemetry Store Module
+Columnar telemetry history in a preallocated NumPy ring, with time-range
+slicing and windowed min/max/mean aggregates
+
+Her örnek sütunlarda toplam 38 bayt tutar: 50 Hz'de 4 saatlik geçmiş ~26 MB.
+Kapasite dolunca en eski örneklerin üzerine yazılır.
+"""
+
+import argparse
+import threading
+import time
+
+import numpy as np
+
+SAMPLE_DTYPE = np.dtype([
+    ('t', 'f8'),        # time.monotonic() saniye
+    ('lat', 'f8'),
+    ('lon', 'f8'),
+    ('alt', 'f4'),
+    ('speed', 'f4'),
+    ('battery', 'f4'),
+    ('mode', 'u1'),
+    ('status', 'u1'),
+])
+# Kodlar yalnızca sona eklenerek genişletilir; eski kayıtların anlamı değişmez
+MODES = ('UNKNOWN', 'AUTONOMOUS', 'RC')
+STATUSES = ('UNKNOWN', 'CONNECTED', 'SIMULATION', 'DISCONNECTED')
+DEFAULT_CAPACITY = 4 * 3600 * 50
+INITIAL_CAPACITY = 4096
+
+
+def code(names, name):
+    """Index of name in a code table, 0 (UNKNOWN) if it is not listed"""
+    try:
+        return names.index(name)
+    except ValueError:
+        return 0
+
+
+def code_name(names, value):
+    """Name of a stored code, UNKNOWN for codes this table does not have"""
+    return names[value] if 0 <= value < len(names) else names[0]
+
+
+class TelemetryStore:
+    """Time-ordered telemetry samples in a columnar ring that grows up to capacity
+
+    Each field is its own contiguous array, so binary search on time and
+    per-field aggregates never touch the other columns. Storage starts small
+    and doubles until it reaches capacity; after that the oldest samples are
+    overwritten. Timestamps must not decrease, which keeps both ring segments
+    sorted so time ranges are found by binary search. One thread may write
+    while others query.
+    """
+
+    def __init__(self, capacity=DEFAULT_CAPACITY, initial_capacity=INITIAL_CAPACITY):
+        self.capacity = capacity
+        size = min(initial_capacity, capacity)
+        self._columns = {name: np.zeros(size, dtype=SAMPLE_DTYPE[name]) for name in SAMPLE_DTYPE.names}
+        self._length = size
+        self._head = 0  # Bir sonraki yazılacak konum
+        self._size = 0
+        self.dropped = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self._columns.values())
+
+    def _grow(self, needed):
+        if self._size + needed <= self._length or self._length >= self.capacity:
+            return
+        new_size = min(self.capacity, max(self._length * 2, self._size + needed))
+        spans = self._spans()
+        for name, column in self._columns.items():
+            grown = np.zeros(new_size, dtype=column.dtype)
+            pos = 0
+            for i, j in spans:
+                grown[pos:pos + j - i] = column[i:j]
+                pos += j - i
+            self._columns[name] = grown
+        self._length = new_size
+        self._head = self._size % new_size
+
+    def append(self, t, lat, lon, alt, speed=0.0, battery=0.0, mode=0, status=0):
+        with self._lock:
+            self._grow(1)
+            i = self._head
+            columns = self._columns
+            columns['t'][i] = t
+            columns['lat'][i] = lat
+            columns['lon'][i] = lon
+            columns['alt'][i] = alt
+            columns['speed'][i] = speed
+            columns['battery'][i] = battery
+            columns['mode'][i] = mode
+            columns['status'][i] = status
+            self._advance(1)
+
+    def extend(self, samples):
+        """Append a SAMPLE_DTYPE array (or anything convertible to one), one copy per column"""
+        samples = np.asarray(samples, dtype=SAMPLE_DTYPE)
+        overflow = max(0, len(samples) - self.capacity)
+        if overflow:
+            samples = samples[-self.capacity:]
+        with self._lock:
+            # Sayaçlar halka ile aynı kilit altında: okuyucular tutarlı bir görüntü alır
+            self.dropped += overflow
+            self._grow(len(samples))
+            first = min(len(samples), self._length - self._head)
+            for name, column in self._columns.items():
+                values = samples[name]
+                column[self._head:self._head + first] = values[:first]
+                column[:len(samples) - first] = values[first:]
+            self._advance(len(samples))
+
+    def _advance(self, count):
+        self.dropped += max(0, self._size + count - self._length)
+        self._size = min(self._length, self._size + count)
+        self._head = (self._head + count) % self._length
+
+    def _spans(self, t0=None, t1=None):
+        """Storage index ranges [(i, j), ...] oldest first, optionally limited to t0 <= t < t1
+
+        Either bound may be None for a range that is open on that side.
+        """
+        start = (self._head - self._size) % self._length
+        if start + self._size <= self._length:
+            spans = [(start, start + self._size)]
+        else:
+            spans = [(start, self._length), (0, self._head)]
+        if t0 is None and t1 is None:
+            return [(i, j) for i, j in spans if j > i]
+        times = self._columns['t']
+        limited = []
+        for i, j in spans:
+            # Her bölüm kendi içinde sıralı: sınır başına bir ikili arama
+            segment = times[i:j]
+            lo = int(np.searchsorted(segment, t0)) if t0 is not None else 0
+            hi = int(np.searchsorted(segment, t1)) if t1 is not None else j - i
+            if hi > lo:
+                limited.append((i + lo, i + hi))
+        return limited
+
+    def _gather(self, spans):
+        samples = np.zeros(sum(j - i for i, j in spans), dtype=SAMPLE_DTYPE)
+        for name, column in self._columns.items():
+            if spans:
+                samples[name] = np.concatenate([column[i:j] for i, j in spans])
+        return samples
+
+    def column(self, field, t0=None, t1=None):
+        """One field oldest first, optionally over [t0, t1) with either bound open (always a copy)"""
+        with self._lock:
+            column = self._columns[field]
+            spans = self._spans(t0, t1)
+            return np.concatenate([column[i:j] for i, j in spans]) if spans else column[:0].copy()
+
+    def ordered(self):
+        """All samples oldest first as a SAMPLE_DTYPE array"""
+        with self._lock:
+            return self._gather(self._spans())
+
+    def latest(self, count=1):
+        """The newest count samples, oldest first"""
+        with self._lock:
+            spans = []
+            for i, j in reversed(self._spans()):
+                if count <= 0:
+                    break
+                spans.insert(0, (max(i, j - count), j))
+                count -= j - spans[0][0]
+            return self._gather(spans)
+
+    def range(self, t0, t1=None):
+        """Samples with t0 <= t < t1 (t1=None: up to the newest) in O(log n) plus the copy of the result"""
+        with self._lock:
+            return self._gather(self._spans(t0, t1))
+
+    def aggregate(self, field, t0, t1=None):
+        """{'count', 'min', 'max', 'mean'} of one field over [t0, t1) (t1=None: up to the newest)"""
+        values = self.column(field, t0, t1)
+        if not len(values):
+            return {'count': 0, 'min': None, 'max': None, 'mean': None}
+        return {'count': len(values), 'min': float(values.min()), 'max': float(values.max()),
+                'mean': float(values.mean(dtype=np.float64))}
+
+    def window_aggregates(self, field, t0, t1, window):
+        """Per window of `window` seconds in [t0, t1): (start times, count, min, max, mean) arrays
+
+        Empty windows are left out; t1=None runs up to the newest sample.
+        """
+        with self._lock:
+            spans = self._spans(t0, t1)
+            times = np.concatenate([self._columns['t'][i:j] for i, j in spans]) if spans else np.zeros(0)
+            values = np.concatenate([self._columns[field][i:j] for i, j in spans]) if spans else np.zeros(0)
+        if not len(times):
+            empty = np.zeros(0)
+            return empty, empty.astype(np.int64), empty, empty, empty
+        index = ((times - t0) // window).astype(np.int64)
+        # Örnekler zaman sıralı: her pencerenin ilk örneği bir kez bulunur, reduceat tek geçişte toplar
+        starts = np.flatnonzero(np.diff(index, prepend=-1))
+        values = values.astype(np.float64)
+        counts = np.diff(np.append(starts, len(values)))
+        return (t0 + index[starts] * window, counts, np.minimum.reduceat(values, starts),
+                np.maximum.reduceat(values, starts), np.add.reduceat(values, starts) / counts)
+
+
+def self_check(rounds=200, seed=1):
+    """Compare range queries (closed and open-ended) with a brute-force filter on wrapped rings"""
+    rng = np.random.default_rng(seed)
+    for _ in range(rounds):
+        store = TelemetryStore(capacity=int(rng.integers(1, 64)), initial_capacity=int(rng.integers(1, 16)))
+        count = int(rng.integers(0, 200))
+        samples = np.zeros(count, dtype=SAMPLE_DTYPE)
+        samples['t'] = np.cumsum(rng.integers(0, 3, count))  # Eşit zaman damgaları da olur
+        samples['alt'] = rng.random(count)
+        for i in range(0, count, 7):
+            store.extend(samples[i:i + 7])
+        kept = samples[-store.capacity:] if count else samples
+        assert len(store) == len(kept) and store.dropped == count - len(kept)
+        for t0, t1 in ((None, None), (None, 50.0), (20.0, None), (10.0, 40.0), (30.0, 30.0)):
+            expected = kept[((t0 is None) | (kept['t'] >= (t0 or 0))) & ((t1 is None) | (kept['t'] < (t1 or 0)))]
+            assert np.array_equal(store.column('t', t0, t1), expected['t']), (t0, t1)
+            if t0 is not None:
+                assert np.array_equal(store.range(t0, t1), expected), (t0, t1)
+    return rounds
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Telemetri deposu bellek ve sorgu hızı testi")
+    parser.add_argument('--hours', type=float, default=4.0)
+    parser.add_argument('--rate', type=float, default=50.0, help="Örnek/s")
+    parser.add_argument('--check', action='store_true', help="Yalnızca aralık sorgularının doğruluk testini çalıştır")
+    args = parser.parse_args()
+    if args.check:
+        print(f"Doğruluk testi: {self_check()} rastgele halka, tüm aralıklar doğru")
+        raise SystemExit(0)
+    count = int(args.hours * 3600 * args.rate)
+    store = TelemetryStore(capacity=count)
+    t = np.arange(count) / args.rate
+    samples = np.zeros(count, dtype=SAMPLE_DTYPE)
+    samples['t'] = t
+    samples['lat'] = 39.93 + 0.001 * np.sin(t / 60)
+    samples['lon'] = 32.86 + 0.001 * np.cos(t / 60)
+    samples['alt'] = 100 + 20 * np.sin(t / 30)
+    samples['speed'] = 25 + np.sin(t)
+    start = time.perf_counter()
+    for i in range(0, count, 1000):
+        store.extend(samples[i:i + 1000])
+    print(f"{len(store)} örnek, {store.nbytes / 2**20:.1f} MB, yazma {time.perf_counter() - start:.2f} s")
+    start = time.perf_counter()
+    for i in range(1000):
+        store.range(i * 10.0, i * 10.0 + 60)
+    print(f"60 s aralık sorgusu: {(time.perf_counter() - start) * 1000:.1f} µs")
+    start = time.perf_counter()
+    result = store.window_aggregates('alt', 0, args.hours * 3600, 60)
+    print(f"{len(result[0])} dakikalık pencere (min/max/ort): {(time.perf_counter() - start) * 1000:.1f} ms")
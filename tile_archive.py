@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+"""
+Tile Archive Module
+Converts .mbtiles files into a flat, memory-mappable tile archive and reads it
+
+Layout (little-endian):
+    header      '<4sHHQQQ'  magic, version, reserved, count, directory offset, data offset
+    keys        count x u64  (z << 58) | (x << 29) | y, sorted ascending (slippy y)
+    offsets     count x u64  absolute file offset of the tile blob
+    lengths     count x u32  blob length in bytes
+    digests     count x 12 bytes  blake2b content hash (used as the ETag)
+    data        tile blobs; byte-identical tiles share a single blob
+"""
+
+import os
+import sys
+import mmap
+import sqlite3
+import hashlib
+import argparse
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from struct import Struct
+
+from mbtiles_server import FileRegion, TILE_DIGEST_SIZE
+
+ARCHIVE_SUFFIX = '.tilepack'
+MAGIC = b'HTPK'
+VERSION = 1
+HEADER = Struct('<4sHHQQQ')
+ENTRY_SIZE = 8 + 8 + 4 + TILE_DIGEST_SIZE
+
+
+def tile_key(z, x, y):
+    """Sortable 64-bit directory key for slippy (z, x, y)"""
+    return (z << 58) | (x << 29) | y
+
+
+def _aligned(offset, alignment=8):
+    return (offset + alignment - 1) & ~(alignment - 1)
+
+
+def _column(mm, offset, count, typecode):
+    """Directory column as a zero-copy view (or a byte-swapped copy on big-endian hosts)"""
+    itemsize = array(typecode).itemsize
+    view = memoryview(mm)[offset:offset + count * itemsize]
+    if sys.byteorder == 'little':
+        return view.cast(typecode)
+    column = array(typecode, view)
+    column.byteswap()
+    view.release()
+    return column
+
+
+class TileArchive:
+    """Memory-mapped reader for .tilepack archives (same interface as MBTilesReader)"""
+
+    def __init__(self, archive_path):
+        self.path = os.path.abspath(archive_path)
+        self.name = os.path.splitext(os.path.basename(self.path))[0]
+        self.file = open(self.path, 'rb')
+        self.mm = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, dir_offset, _ = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"Not a tile archive: {archive_path}")
+        self.count = count
+        self.keys = _column(self.mm, dir_offset, count, 'Q')
+        self.offsets = _column(self.mm, dir_offset + 8 * count, count, 'Q')
+        self.lengths = _column(self.mm, dir_offset + 16 * count, count, 'I')
+        self.digest_offset = dir_offset + 20 * count
+
+    def _find(self, z, x, y):
+        key = tile_key(z, x, y)
+        i = bisect_left(self.keys, key)
+        if i < self.count and self.keys[i] == key:
+            return i
+        return None
+
+    def get_tile(self, z, x, y):
+        """Get a zero-copy view of the tile bytes for slippy (z, x, y), or None"""
+        entry = self.get_tile_entry(z, x, y)
+        return entry[0].view if entry else None
+
+    def get_tile_entry(self, z, x, y):
+        """Get (FileRegion, ETag) for slippy (z, x, y), or None"""
+        i = self._find(z, x, y)
+        if i is None:
+            return None
+        return self._entry(i)
+
+    def get_tile_range(self, z, x0, x1, y0, y1):
+        """Yield (x, y, (FileRegion, ETag)) for every tile in a slippy rectangle
+
+        Keys are sorted by (z, x, y), so each column is one contiguous slice.
+        """
+        mask = (1 << 29) - 1
+        for x in range(x0, x1 + 1):
+            lo = bisect_left(self.keys, tile_key(z, x, y0))
+            hi = bisect_right(self.keys, tile_key(z, x, y1), lo)
+            for i in range(lo, hi):
+                yield x, self.keys[i] & mask, self._entry(i)
+
+    def _entry(self, i):
+        offset = self.offsets[i]
+        view = memoryview(self.mm)[offset:offset + self.lengths[i]]
+        start = self.digest_offset + i * TILE_DIGEST_SIZE
+        etag = '"' + self.mm[start:start + TILE_DIGEST_SIZE].hex() + '"'
+        return FileRegion(view, self.file, offset), etag
+
+    def close(self):
+        for name in ('keys', 'offsets', 'lengths'):
+            column = getattr(self, name, None)
+            if isinstance(column, memoryview):
+                column.release()
+        try:
+            self.mm.close()
+        except BufferError:
+            # Hâlâ gönderilmekte olan tile görünümleri var; eşleme GC ile kapanır
+            pass
+        self.file.close()
+
+
+def convert_mbtiles(mbtiles_path, archive_path):
+    """Convert an .mbtiles file into a .tilepack archive; returns (tiles, unique blobs)"""
+    conn = sqlite3.connect(mbtiles_path)
+    count = conn.execute("SELECT COUNT(*) FROM tiles").fetchone()[0]
+    dir_offset = _aligned(HEADER.size)
+    data_offset = _aligned(dir_offset + ENTRY_SIZE * count)
+
+    keys = array('Q')
+    offsets = array('Q')
+    lengths = array('I')
+    digests = bytearray()
+    blobs = {}
+    tmp_path = archive_path + '.tmp'
+    with open(tmp_path, 'wb') as out:
+        out.seek(data_offset)
+        position = data_offset
+        # TMS satırını ters sırada okuyunca slippy (z, x, y) sırası elde edilir
+        rows = conn.execute("SELECT zoom_level, tile_column, tile_row, tile_data FROM tiles "
+                            "ORDER BY zoom_level, tile_column, tile_row DESC")
+        for z, x, tms_y, data in rows:
+            digest = hashlib.blake2b(data, digest_size=TILE_DIGEST_SIZE).digest()
+            offset = blobs.get(digest)
+            if offset is None:
+                offset = position
+                blobs[digest] = offset
+                out.write(data)
+                position += len(data)
+            keys.append(tile_key(z, x, (1 << z) - 1 - tms_y))
+            offsets.append(offset)
+            lengths.append(len(data))
+            digests += digest
+
+        if sys.byteorder != 'little':
+            for column in (keys, offsets, lengths):
+                column.byteswap()
+        out.seek(0)
+        out.write(HEADER.pack(MAGIC, VERSION, 0, count, dir_offset, data_offset))
+        out.seek(dir_offset)
+        keys.tofile(out)
+        offsets.tofile(out)
+        lengths.tofile(out)
+        out.write(digests)
+    conn.close()
+    os.replace(tmp_path, archive_path)
+    return count, len(blobs)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="MBTiles -> .tilepack dönüştürücü")
+    parser.add_argument('mbtiles', help="Kaynak .mbtiles dosyası")
+    parser.add_argument('output', nargs='?', help=f"Hedef dosya (varsayılan: <kaynak>{ARCHIVE_SUFFIX})")
+    args = parser.parse_args()
+    output = args.output or os.path.splitext(args.mbtiles)[0] + ARCHIVE_SUFFIX
+    start = time.perf_counter()
+    count, unique = convert_mbtiles(args.mbtiles, output)
+    elapsed = time.perf_counter() - start
+    print(f"{count} tile ({unique} benzersiz) {output} dosyasına yazıldı, {elapsed:.1f} s")
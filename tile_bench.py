@@ -0,0 +1,428 @@
+#!/usr/bin/env python3
+"""
+Tile Server Benchmark
+Builds a synthetic .mbtiles file, starts mbtiles_server.py in each serving mode
+and replays Leaflet-like access patterns from concurrent clients
+
+Örnek:
+    python tile_bench.py --tiles 2000000 --clients 16 --duration 30 --modes threaded asyncio
+    python tile_bench.py --mbtiles map/map.mbtiles --compare bench_results/onceki.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import sqlite3
+import struct
+import zlib
+import socket
+import argparse
+import platform
+import tempfile
+import subprocess
+import http.client
+from multiprocessing import Pool
+
+from tile_math import lonlat_to_tile
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'mbtiles_server.py')
+DEFAULT_CENTER = (39.9334, 32.8597)  # Ankara
+DEFAULT_MODES = ('threaded', 'asyncio', 'threaded+tilepack', 'asyncio+tilepack')
+TILE_SIZE = 256
+PNG_VARIANTS = 256
+# Leaflet 1280x800 görünüm ~ 6x4 tile; tarayıcı host başına 6 bağlantı açar
+VIEW_COLS, VIEW_ROWS = 6, 4
+PATTERN_WEIGHTS = {'pan': 0.5, 'zoom': 0.2, 'hot': 0.3}
+
+
+# ---------------------------------------------------------------- veri üretimi
+
+def synthetic_png(target_size, rng):
+    """Valid 256x256 RGB PNG whose compressed size is roughly target_size"""
+    row_bytes = TILE_SIZE * 3
+    noisy = max(1, min(row_bytes, int(target_size / TILE_SIZE)))
+    raw = bytearray()
+    for _ in range(TILE_SIZE):
+        raw += b'\x00' + rng.randbytes(noisy) + bytes(row_bytes - noisy)
+
+    def chunk(tag, data):
+        return struct.pack('>I', len(data)) + tag + data + struct.pack('>I', zlib.crc32(tag + data))
+    header = struct.pack('>IIBBBBB', TILE_SIZE, TILE_SIZE, 8, 2, 0, 0, 0)
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(bytes(raw), 6))
+            + chunk(b'IEND', b''))
+
+
+def build_synthetic_mbtiles(path, tiles, minzoom, maxzoom, center=DEFAULT_CENTER, median_size=25000, seed=1):
+    """Write a square tile pyramid of about `tiles` tiles around center"""
+    rng = random.Random(seed)
+    # Ortofoto PNG boyutları kabaca log-normal dağılır
+    variants = [synthetic_png(int(rng.lognormvariate(math.log(median_size), 0.5)), rng)
+                for _ in range(PNG_VARIANTS)]
+    levels = maxzoom - minzoom + 1
+    # Her üst seviye 1/4 tile içerir: toplam ~ side^2 * 4/3
+    side = max(1, int(math.sqrt(tiles * 3 / 4)))
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.execute("CREATE TABLE metadata (name text, value text)")
+    conn.execute("CREATE TABLE tiles (zoom_level integer, tile_column integer, tile_row integer, tile_data blob)")
+    conn.executemany("INSERT INTO metadata VALUES (?, ?)", [
+        ('name', 'synthetic'), ('format', 'png'), ('minzoom', str(minzoom)), ('maxzoom', str(maxzoom)),
+    ])
+    written = 0
+    for level in range(levels):
+        z = maxzoom - level
+        n = 1 << z
+        level_side = max(1, side >> level)
+        cx, cy = lonlat_to_tile(center[0], center[1], z)
+        x0, y0 = max(0, cx - level_side // 2), max(0, cy - level_side // 2)
+        batch = []
+        for x in range(x0, min(n, x0 + level_side)):
+            for y in range(y0, min(n, y0 + level_side)):
+                batch.append((z, x, n - 1 - y, variants[rng.randrange(PNG_VARIANTS)]))
+                if len(batch) >= 10000:
+                    conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", batch)
+                    written += len(batch)
+                    batch = []
+        conn.executemany("INSERT INTO tiles VALUES (?, ?, ?, ?)", batch)
+        written += len(batch)
+        conn.commit()
+    conn.execute("CREATE UNIQUE INDEX tile_index ON tiles (zoom_level, tile_column, tile_row)")
+    conn.commit()
+    conn.close()
+    return written
+
+
+def tile_extents(path):
+    """{z: (xmin, xmax, ymin, ymax)} in slippy coordinates"""
+    conn = sqlite3.connect(path)
+    extents = {}
+    for z, xmin, xmax, rmin, rmax in conn.execute(
+            "SELECT zoom_level, MIN(tile_column), MAX(tile_column), MIN(tile_row), MAX(tile_row) "
+            "FROM tiles GROUP BY zoom_level"):
+        n = 1 << z
+        extents[z] = (xmin, xmax, n - 1 - rmax, n - 1 - rmin)
+    conn.close()
+    return extents
+
+
+# ---------------------------------------------------------------- iş yükü
+
+def viewport(z, cx, cy):
+    return [(z, x, y) for x in range(cx - VIEW_COLS // 2, cx + (VIEW_COLS + 1) // 2)
+            for y in range(cy - VIEW_ROWS // 2, cy + (VIEW_ROWS + 1) // 2)]
+
+
+class Workload:
+    """Generates request batches: viewport pans, zoom bursts and Zipf-hot tiles"""
+
+    def __init__(self, extents, seed, hot_tiles=500, zipf_s=1.1):
+        self.rng = random.Random(seed)
+        self.extents = extents
+        self.zooms = sorted(extents)
+        self.z = self.zooms[len(self.zooms) // 2]
+        self.cx, self.cy = self._center(self.z)
+        deepest = self.zooms[-1]
+        xmin, xmax, ymin, ymax = extents[deepest]
+        self.hot = [(deepest, self.rng.randint(xmin, xmax), self.rng.randint(ymin, ymax)) for _ in range(hot_tiles)]
+        weights = [1.0 / (rank + 1) ** zipf_s for rank in range(hot_tiles)]
+        total = sum(weights)
+        self.hot_cdf = []
+        acc = 0.0
+        for w in weights:
+            acc += w / total
+            self.hot_cdf.append(acc)
+
+    def _center(self, z):
+        xmin, xmax, ymin, ymax = self.extents[z]
+        return (xmin + xmax) // 2, (ymin + ymax) // 2
+
+    def _clamp(self):
+        xmin, xmax, ymin, ymax = self.extents[self.z]
+        self.cx = min(max(self.cx, xmin), xmax)
+        self.cy = min(max(self.cy, ymin), ymax)
+
+    def next_batch(self):
+        """(pattern name, list of (z, x, y)) for one user action"""
+        r = self.rng.random()
+        if r < PATTERN_WEIGHTS['pan']:
+            self.cx += self.rng.choice((-2, -1, 1, 2))
+            self.cy += self.rng.choice((-1, 0, 1))
+            self._clamp()
+            return 'pan', viewport(self.z, self.cx, self.cy)
+        if r < PATTERN_WEIGHTS['pan'] + PATTERN_WEIGHTS['zoom']:
+            i = self.zooms.index(self.z) + self.rng.choice((-1, 1))
+            i = min(max(i, 0), len(self.zooms) - 1)
+            factor = 2 ** (self.zooms[i] - self.z)
+            self.z = self.zooms[i]
+            self.cx, self.cy = int(self.cx * factor), int(self.cy * factor)
+            self._clamp()
+            return 'zoom', viewport(self.z, self.cx, self.cy)
+        batch = []
+        for _ in range(VIEW_COLS * VIEW_ROWS):
+            u = self.rng.random()
+            lo, hi = 0, len(self.hot_cdf) - 1
+            while lo < hi:
+                mid = (lo + hi) // 2
+                if self.hot_cdf[mid] < u:
+                    lo = mid + 1
+                else:
+                    hi = mid
+            batch.append(self.hot[lo])
+        return 'hot', batch
+
+
+def run_client(args):
+    """One simulated map client on a single keep-alive connection"""
+    client_id, port, tileset, extents, duration, seed = args
+    workload = Workload(extents, seed + client_id)
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+    latencies = []
+    statuses = {}
+    patterns = {}
+    nbytes = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        pattern, batch = workload.next_batch()
+        patterns[pattern] = patterns.get(pattern, 0) + 1
+        for z, x, y in batch:
+            start = time.perf_counter()
+            try:
+                conn.request('GET', f'/tiles/{tileset}/{z}/{x}/{y}.png')
+                response = conn.getresponse()
+                body = response.read()
+                status = response.status
+            except (OSError, http.client.HTTPException):
+                conn.close()
+                conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+                status = 'error'
+                body = b''
+            latencies.append(time.perf_counter() - start)
+            statuses[status] = statuses.get(status, 0) + 1
+            nbytes += len(body)
+    conn.close()
+    return latencies, statuses, patterns, nbytes
+
+
+# ---------------------------------------------------------------- sunucu
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def process_usage(pid):
+    """(cpu seconds, rss bytes, peak rss bytes) of a process, or Nones if unavailable"""
+    try:
+        import psutil
+        proc = psutil.Process(pid)
+        cpu = proc.cpu_times()
+        mem = proc.memory_info()
+        return cpu.user + cpu.system, mem.rss, getattr(mem, 'peak_wset', None)
+    except ImportError:
+        pass
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu = (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+        rss = peak = None
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    rss = int(line.split()[1]) * 1024
+                elif line.startswith('VmHWM:'):
+                    peak = int(line.split()[1]) * 1024
+        return cpu, rss, peak
+    except (OSError, ValueError):
+        return None, None, None
+
+
+def start_server(source, mode, port, workers, extra_args):
+    engine = mode.split('+')[0]
+    cmd = [sys.executable, SERVER_SCRIPT, source, str(port), '--engine', engine, '--workers', str(workers)]
+    proc = subprocess.Popen(cmd + list(extra_args), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            conn = http.client.HTTPConnection('127.0.0.1', port, timeout=1)
+            conn.request('GET', '/tilesets.json')
+            if conn.getresponse().status == 200:
+                return proc
+        except OSError:
+            time.sleep(0.1)
+    proc.kill()
+    raise RuntimeError(f"Server did not start for mode {mode}")
+
+
+def percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+def served_file(port, tileset):
+    """File name the server actually reads the tileset from (info.json)"""
+    conn = http.client.HTTPConnection('127.0.0.1', port, timeout=5)
+    conn.request('GET', f'/tiles/{tileset}/info.json')
+    response = conn.getresponse()
+    body = response.read()
+    conn.close()
+    return json.loads(body).get('file') if response.status == 200 else None
+
+
+def run_mode(mode, sources, tileset, extents, args):
+    source = sources['tilepack'] if mode.endswith('+tilepack') else sources['mbtiles']
+    port = free_port()
+    proc = start_server(source, mode, port, args.workers, args.server_arg)
+    try:
+        # Karşılaştırma ancak her mod gerçekten kendi dosyasını sunuyorsa geçerli
+        served = served_file(port, tileset)
+        if served != os.path.basename(source):
+            raise RuntimeError(f"Mode {mode} serves {served}, expected {os.path.basename(source)}")
+        cpu_before, _, _ = process_usage(proc.pid)
+        started = time.perf_counter()
+        jobs = [(i, port, tileset, extents, args.duration, args.seed) for i in range(args.clients)]
+        with Pool(args.clients) as pool:
+            results = pool.map(run_client, jobs)
+        elapsed = time.perf_counter() - started
+        cpu_after, rss, peak_rss = process_usage(proc.pid)
+    finally:
+        proc.terminate()
+        proc.wait()
+    latencies = sorted(l for r in results for l in r[0])
+    statuses, patterns = {}, {}
+    for _, client_statuses, client_patterns, _ in results:
+        for key, count in client_statuses.items():
+            statuses[str(key)] = statuses.get(str(key), 0) + count
+        for key, count in client_patterns.items():
+            patterns[key] = patterns.get(key, 0) + count
+    total_bytes = sum(r[3] for r in results)
+    cpu = cpu_after - cpu_before if cpu_before is not None and cpu_after is not None else None
+    return {
+        'mode': mode,
+        'requests': len(latencies),
+        'seconds': elapsed,
+        'throughput_rps': len(latencies) / elapsed,
+        'throughput_mbps': total_bytes / elapsed / 1e6,
+        'latency_ms': {
+            'mean': 1000 * sum(latencies) / len(latencies) if latencies else 0.0,
+            'p50': 1000 * percentile(latencies, 0.50),
+            'p95': 1000 * percentile(latencies, 0.95),
+            'p99': 1000 * percentile(latencies, 0.99),
+            'max': 1000 * latencies[-1] if latencies else 0.0,
+        },
+        'statuses': statuses,
+        'patterns': patterns,
+        'server_cpu_seconds': cpu,
+        'server_cpu_percent': 100 * cpu / elapsed if cpu is not None else None,
+        'server_rss_bytes': rss,
+        'server_peak_rss_bytes': peak_rss,
+    }
+
+
+# ---------------------------------------------------------------- rapor
+
+def git_revision():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(SERVER_SCRIPT)).stdout.strip() or None
+    except OSError:
+        return None
+
+
+def print_result(result, previous=None):
+    lat = result['latency_ms']
+    line = (f"{result['mode']:<20} {result['throughput_rps']:9.0f} req/s {result['throughput_mbps']:7.1f} MB/s  "
+            f"p50 {lat['p50']:6.2f}  p95 {lat['p95']:6.2f}  p99 {lat['p99']:7.2f} ms")
+    if result['server_cpu_percent'] is not None:
+        line += f"  cpu {result['server_cpu_percent']:5.0f}%"
+    if result['server_peak_rss_bytes']:
+        line += f"  rss {result['server_peak_rss_bytes'] / 2**20:6.1f} MB"
+    print(line)
+    if previous:
+        change = lambda new, old: f"{100 * (new - old) / old:+.1f}%" if old else "n/a"
+        print(f"{'':<20} vs önceki: throughput {change(result['throughput_rps'], previous['throughput_rps'])}, "
+              f"p95 {change(lat['p95'], previous['latency_ms']['p95'])}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="mbtiles_server.py yük testi")
+    parser.add_argument('--mbtiles', help="Sentetik dosya yerine bu .mbtiles dosyasını kullan")
+    parser.add_argument('--tiles', type=int, default=200000, help="Sentetik dosyadaki yaklaşık tile sayısı")
+    parser.add_argument('--minzoom', type=int, default=10)
+    parser.add_argument('--maxzoom', type=int, default=17)
+    parser.add_argument('--median-size', type=int, default=25000, help="Sentetik PNG medyan boyutu (byte)")
+    parser.add_argument('--workdir', default=os.path.join(tempfile.gettempdir(), 'hayturk_tile_bench'),
+                        help="Sentetik dosyaların tutulduğu dizin (aynı parametrelerle tekrar kullanılır)")
+    parser.add_argument('--modes', nargs='+', default=list(DEFAULT_MODES), choices=DEFAULT_MODES)
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=20.0, help="Her mod için saniye")
+    parser.add_argument('--workers', type=int, default=16)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--server-arg', action='append', default=[],
+                        help="Sunucuya aynen iletilecek ek argüman (tekrarlanabilir)")
+    parser.add_argument('--output', help="JSON sonuç dosyası (varsayılan: bench_results/<zaman>.json)")
+    parser.add_argument('--compare', help="Karşılaştırılacak önceki JSON sonuç dosyası")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    if args.mbtiles:
+        mbtiles = os.path.abspath(args.mbtiles)
+    else:
+        name = f"synthetic_{args.tiles}_{args.minzoom}-{args.maxzoom}_{args.median_size}_{args.seed}"
+        mbtiles = os.path.join(args.workdir, name + '.mbtiles')
+        if not os.path.exists(mbtiles):
+            start = time.perf_counter()
+            count = build_synthetic_mbtiles(mbtiles, args.tiles, args.minzoom, args.maxzoom,
+                                            median_size=args.median_size, seed=args.seed)
+            print(f"Sentetik dosya: {mbtiles} ({count} tile, {time.perf_counter() - start:.1f} s)")
+    sources = {'mbtiles': mbtiles}
+    if any(mode.endswith('+tilepack') for mode in args.modes):
+        from tile_archive import convert_mbtiles
+        # Ayrı dizin: .mbtiles ile yan yana duran aynı adlı arşiv, dizin sunulurken onun yerine seçilirdi
+        tilepack_dir = os.path.join(args.workdir, 'tilepack')
+        os.makedirs(tilepack_dir, exist_ok=True)
+        tilepack = os.path.join(tilepack_dir, os.path.splitext(os.path.basename(mbtiles))[0] + '.tilepack')
+        if not os.path.exists(tilepack) or os.path.getmtime(tilepack) < os.path.getmtime(mbtiles):
+            convert_mbtiles(mbtiles, tilepack)
+        sources['tilepack'] = tilepack
+    tileset = os.path.splitext(os.path.basename(mbtiles))[0]
+    extents = tile_extents(mbtiles)
+
+    previous = {}
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            previous = {r['mode']: r for r in json.load(f)['results']}
+
+    results = []
+    for mode in args.modes:
+        result = run_mode(mode, sources, tileset, extents, args)
+        print_result(result, previous.get(mode))
+        results.append(result)
+
+    report = {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'revision': git_revision(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('output', 'compare')},
+        'dataset': {'path': mbtiles, 'size_bytes': os.path.getsize(mbtiles),
+                    'zooms': {z: list(e) for z, e in extents.items()}},
+        'results': results,
+    }
+    output = args.output or os.path.join('bench_results', time.strftime('%Y%m%d_%H%M%S') + '.json')
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"Sonuçlar kaydedildi: {output}")
+
+
+if __name__ == "__main__":
+    main()
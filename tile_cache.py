@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Tile Cache Module
+Byte-budgeted, thread-safe LRU cache for tile data
+"""
+
+import threading
+from collections import OrderedDict
+
+DEFAULT_CACHE_BYTES = 64 * 1024 * 1024
+# Anahtar, OrderedDict düğümü ve bytes nesnesi için yaklaşık sabit maliyet
+ENTRY_OVERHEAD = 128
+
+
+class TileCache:
+    """LRU cache keyed by (tileset, z, x, y) with a memory limit in bytes
+
+    Values stored with a content_key (the tile's content hash) are shared:
+    every key holding the same content points at one stored value, whose
+    bytes are counted once and released when its last key is evicted.
+    """
+
+    def __init__(self, max_bytes=DEFAULT_CACHE_BYTES):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.content_hits = 0
+        # key -> (value, cost, content_key); content_key -> [value, nbytes, refcount]
+        self._entries = OrderedDict()
+        self._blobs = {}
+        self._lock = threading.Lock()
+
+    def get(self, key, lookups=None):
+        """Return the cached value for key (marking it recently used) or None
+
+        With a lookups list the hit/miss is not counted but appended as
+        (cache, hit) for count() later: a probe that may be retried by a
+        blocking lookup is then counted once, by whichever answers.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            hit = entry is not None
+            if lookups is not None:
+                lookups.append((self, hit))
+            elif hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            if not hit:
+                return None
+            self._entries.move_to_end(key)
+            return entry[0]
+
+    def count(self, hit):
+        """Count a lookup recorded by get(..., lookups)"""
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def get_content(self, content_key):
+        """Return a stored value by content key (shared by any key) or None"""
+        with self._lock:
+            blob = self._blobs.get(content_key)
+            if blob is None:
+                return None
+            self.content_hits += 1
+            return blob[0]
+
+    def put(self, key, value, nbytes=None, content_key=None):
+        """Store value under key, evicting least recently used entries to fit
+
+        With a content_key, an already stored value with the same content is
+        reused and only the per-key overhead is charged.
+        """
+        if nbytes is None:
+            nbytes = len(value)
+        if nbytes + ENTRY_OVERHEAD > self.max_bytes:
+            return False
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._drop(old)
+            cost = ENTRY_OVERHEAD
+            if content_key is None:
+                cost += nbytes
+            else:
+                blob = self._blobs.get(content_key)
+                if blob is None:
+                    blob = self._blobs[content_key] = [value, nbytes, 0]
+                    self.current_bytes += nbytes
+                blob[2] += 1
+                value = blob[0]
+            self._entries[key] = (value, cost, content_key)
+            self.current_bytes += cost
+            while self.current_bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._drop(evicted)
+                self.evictions += 1
+        return True
+
+    def _drop(self, entry):
+        """Release the bytes of a removed entry (lock held)"""
+        _, cost, content_key = entry
+        self.current_bytes -= cost
+        if content_key is not None:
+            blob = self._blobs[content_key]
+            blob[2] -= 1
+            if blob[2] == 0:
+                del self._blobs[content_key]
+                self.current_bytes -= blob[1]
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def clear(self):
+        """Drop every entry (counters are kept)"""
+        with self._lock:
+            self._entries.clear()
+            self._blobs.clear()
+            self.current_bytes = 0
+
+    def stats(self):
+        """Return a snapshot of cache counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'unique_blobs': len(self._blobs),
+                'bytes': self.current_bytes,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'content_hits': self.content_hits,
+                'hit_ratio': self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Tile Catalog Module
+Tilesets of a map directory with their zoom range, bounds and center, kept in
+a small index file and refreshed by polling the directory
+
+Her dosyanın bilgisi .mbtiles metadata tablosundan okunur; eksikse kapsama
+indeksine (tile_coverage.py) düşülür. Sonuçlar dizindeki .catalog.json
+dosyasında mtime/boyut damgasıyla saklanır, bu yüzden büyük dosyalar yalnızca
+değiştiklerinde yeniden okunur.
+"""
+
+import os
+import json
+import sqlite3
+import argparse
+import threading
+from urllib.request import pathname2url
+
+TILESET_SUFFIXES = ('.tilepack', '.mbtiles')
+CATALOG_FILE = '.catalog.json'
+CATALOG_VERSION = 1
+DEFAULT_POLL_INTERVAL = 2.0
+
+
+def read_metadata(path):
+    """name -> value pairs of an .mbtiles metadata table ({} if there is none)"""
+    if not path.endswith('.mbtiles'):
+        return {}
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        return dict(conn.execute("SELECT name, value FROM metadata"))
+    except sqlite3.DatabaseError:
+        return {}
+    finally:
+        conn.close()
+
+
+def _numbers(text, count):
+    """Comma separated floats from a metadata value, or None if absent or malformed"""
+    try:
+        values = [float(v) for v in str(text).split(',')]
+    except ValueError:
+        return None
+    return values if len(values) == count else None
+
+
+def _zoom(text):
+    values = _numbers(text, 1)
+    return int(values[0]) if values else None
+
+
+def describe(path):
+    """Catalog entry of one tileset file: zoom range, bounds, center and where they came from"""
+    st = os.stat(path)
+    name = os.path.splitext(os.path.basename(path))[0]
+    metadata = read_metadata(path)
+    entry = {
+        'name': name,
+        'file': os.path.basename(path),
+        'mtime': st.st_mtime_ns,
+        'size': st.st_size,
+        'format': metadata.get('format', 'png'),
+        'description': metadata.get('description') or metadata.get('name') or name,
+        'minzoom': _zoom(metadata.get('minzoom')),
+        'maxzoom': _zoom(metadata.get('maxzoom')),
+        'bounds': _numbers(metadata.get('bounds'), 4),
+        'center': _numbers(metadata.get('center'), 3),
+        'source': 'metadata',
+    }
+    if entry['minzoom'] is None or entry['maxzoom'] is None or entry['bounds'] is None:
+        # Metadata eksik: gerçek kapsamayı indeksten al (gerekirse oluşturulur ve sunucuyla paylaşılır)
+        try:
+            from tile_coverage import load_coverage
+            coverage = load_coverage(path)
+        except ImportError:
+            coverage = None
+        except Exception as e:
+            print(f"Coverage unavailable for {path}: {e}")
+            coverage = None
+        if coverage is not None and coverage.levels:
+            entry.update(minzoom=coverage.minzoom, maxzoom=coverage.maxzoom,
+                         bounds=list(coverage.bounds()), source='coverage')
+    if entry['center'] is None and entry['bounds'] is not None:
+        west, south, east, north = entry['bounds']
+        zoom = entry['minzoom'] if entry['minzoom'] is not None else 0
+        entry['center'] = [(west + east) / 2, (south + north) / 2, zoom]
+    if entry['center'] is not None:
+        entry['center'][2] = int(entry['center'][2])
+    return entry
+
+
+class TileCatalog:
+    """Tilesets of one directory, described once and re-read only when their file changes
+
+    When both <name>.tilepack and <name>.mbtiles exist the archive is listed,
+    like the tile server does. Listeners are called with the set of changed
+    (added, modified or removed) names from whichever thread refreshed.
+    """
+
+    def __init__(self, directory, poll_interval=DEFAULT_POLL_INTERVAL):
+        self.directory = os.path.abspath(directory)
+        self.index_path = os.path.join(self.directory, CATALOG_FILE)
+        self.poll_interval = poll_interval
+        self._entries = {}
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._wake = threading.Event()
+        self._watcher = None
+        self._load_index()
+
+    def _load_index(self):
+        try:
+            with open(self.index_path, encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get('version') == CATALOG_VERSION:
+                self._entries = {entry['name']: entry for entry in data['tilesets']}
+        except (OSError, ValueError, KeyError, TypeError):
+            self._entries = {}
+
+    def _save_index(self, entries):
+        tmp_path = f"{self.index_path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'version': CATALOG_VERSION, 'tilesets': entries}, f, indent=1)
+            os.replace(tmp_path, self.index_path)
+        except OSError as e:
+            print(f"Catalog index could not be saved ({self.index_path}): {e}")
+
+    def scan(self):
+        """name -> file name of every tileset currently in the directory"""
+        files = {}
+        try:
+            listing = os.listdir(self.directory)
+        except OSError:
+            return files
+        for file in listing:
+            stem, ext = os.path.splitext(file)
+            if ext not in TILESET_SUFFIXES or stem.startswith('.'):
+                continue
+            current = files.get(stem)
+            if current is None or TILESET_SUFFIXES.index(ext) < TILESET_SUFFIXES.index(os.path.splitext(current)[1]):
+                files[stem] = file
+        return files
+
+    def refresh(self):
+        """Pick up new, changed and removed files; returns the set of changed names"""
+        with self._refresh_lock:
+            with self._lock:
+                old = dict(self._entries)
+            entries = {}
+            for name, file in self.scan().items():
+                path = os.path.join(self.directory, file)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entry = old.get(name)
+                if entry is not None and (entry['file'], entry['mtime'], entry['size']) == \
+                        (file, st.st_mtime_ns, st.st_size):
+                    entries[name] = entry
+                    continue
+                try:
+                    entries[name] = describe(path)
+                except (OSError, sqlite3.DatabaseError) as e:
+                    # Henüz kopyalanmakta olan dosya: bir sonraki taramada tekrar denenir
+                    print(f"Catalog skipped {file}: {e}")
+            changed = {name for name in old.keys() | entries.keys() if old.get(name) != entries.get(name)}
+            if changed:
+                with self._lock:
+                    self._entries = entries
+                self._save_index([entries[name] for name in sorted(entries)])
+        if changed:
+            for listener in list(self._listeners):
+                listener(changed)
+        return changed
+
+    def names(self):
+        with self._lock:
+            return sorted(self._entries)
+
+    def entries(self):
+        """All catalog entries sorted by name"""
+        with self._lock:
+            return [self._entries[name] for name in sorted(self._entries)]
+
+    def get(self, name):
+        with self._lock:
+            return self._entries.get(name)
+
+    def path(self, name):
+        entry = self.get(name)
+        return os.path.join(self.directory, entry['file']) if entry is not None else None
+
+    def add_listener(self, callback):
+        self._listeners.append(callback)
+
+    def start_watching(self):
+        """Refresh at once and then every poll_interval seconds, all on a background thread
+
+        The first refresh may have to build coverage indexes for files without
+        bounds metadata, so it is not run on the caller's (GUI) thread; until it
+        finishes the entries saved in the index file are served.
+        """
+        if self._watcher is not None:
+            return
+
+        def watch():
+            while not self._stopped.is_set():
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"Catalog refresh failed: {e}")
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+        self._watcher = threading.Thread(target=watch, name='tile-catalog', daemon=True)
+        self._watcher.start()
+
+    def request_refresh(self):
+        """Make the watcher refresh now instead of at its next poll"""
+        self._wake.set()
+
+    def close(self):
+        self._stopped.set()
+        self._wake.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Harita dizinindeki tile setlerini listele (katalog indeksini günceller)")
+    parser.add_argument('directory', nargs='?', default='map', help="Harita dizini")
+    args = parser.parse_args()
+    catalog = TileCatalog(args.directory)
+    catalog.refresh()
+    for entry in catalog.entries():
+        bounds = ', '.join(f'{v:.4f}' for v in entry['bounds']) if entry['bounds'] else '-'
+        print(f"{entry['name']:<24} {entry['file']:<30} zoom {entry['minzoom']}-{entry['maxzoom']}  "
+              f"[{bounds}]  ({entry['source']}, {entry['size'] / 2**20:.1f} MB)")
@@ -0,0 +1,216 @@
+#!/usr/bin/env python3
+"""
+Tile Coverage Module
+Per-zoom coverage index (packed bitmaps or run ranges) saved next to a tileset
+
+The index answers "does tile z/x/y exist?" without touching the database and
+reports the real zoom range and bounds of the tileset.
+"""
+
+import os
+import sqlite3
+import argparse
+import time
+from bisect import bisect_right
+from urllib.request import pathname2url
+
+import numpy as np
+
+from tile_math import tile_bounds
+
+COVERAGE_SUFFIX = '.coverage.npz'
+FORMAT_VERSION = 1
+# Kapsama dikdörtgeni bundan büyükse bitmap yerine ardışık aralıklar saklanır
+MAX_BITMAP_BITS = 1 << 27
+
+
+class ZoomCoverage:
+    """Coverage of one zoom level: extent plus a packed bitmap or sorted runs"""
+    __slots__ = ('z', 'xmin', 'xmax', 'ymin', 'ymax', 'count', 'bits', 'run_starts', 'run_ends')
+
+    def __init__(self, z, xmin, xmax, ymin, ymax, count, bits=None, run_starts=None, run_ends=None):
+        self.z = z
+        self.xmin, self.xmax, self.ymin, self.ymax = xmin, xmax, ymin, ymax
+        self.count = count
+        # Tek tek sorgular numpy skalerlerinden çok daha hızlı olduğu için bytes/list
+        self.bits = bytes(bits) if bits is not None else None
+        self.run_starts = run_starts.tolist() if run_starts is not None else None
+        self.run_ends = run_ends.tolist() if run_ends is not None else None
+
+    @property
+    def width(self):
+        return self.xmax - self.xmin + 1
+
+    def contains(self, x, y):
+        if not (self.xmin <= x <= self.xmax and self.ymin <= y <= self.ymax):
+            return False
+        if self.bits is not None:
+            i = (y - self.ymin) * self.width + (x - self.xmin)
+            return bool(self.bits[i >> 3] & (0x80 >> (i & 7)))
+        i = (y << self.z) + x
+        j = bisect_right(self.run_starts, i) - 1
+        return j >= 0 and i <= self.run_ends[j]
+
+    @classmethod
+    def build(cls, z, xs, ys):
+        """Build from numpy arrays of slippy x/y at zoom z"""
+        xmin, xmax = int(xs.min()), int(xs.max())
+        ymin, ymax = int(ys.min()), int(ys.max())
+        width, height = xmax - xmin + 1, ymax - ymin + 1
+        if width * height <= MAX_BITMAP_BITS:
+            grid = np.zeros(width * height, dtype=bool)
+            grid[(ys - ymin) * width + (xs - xmin)] = True
+            return cls(z, xmin, xmax, ymin, ymax, len(xs), bits=np.packbits(grid))
+        linear = np.unique((ys.astype(np.uint64) << np.uint64(z)) + xs.astype(np.uint64))
+        breaks = np.flatnonzero(np.diff(linear) != 1)
+        starts = np.concatenate(([linear[0]], linear[breaks + 1]))
+        ends = np.concatenate((linear[breaks], [linear[-1]]))
+        return cls(z, xmin, xmax, ymin, ymax, len(xs), run_starts=starts, run_ends=ends)
+
+
+class TileCoverage:
+    """Coverage index of a whole tileset"""
+
+    def __init__(self, levels, source_mtime=0, source_size=0):
+        self.levels = {level.z: level for level in levels}
+        self.source_mtime = source_mtime
+        self.source_size = source_size
+
+    def contains(self, z, x, y):
+        level = self.levels.get(z)
+        return level is not None and level.contains(x, y)
+
+    @property
+    def minzoom(self):
+        return min(self.levels) if self.levels else None
+
+    @property
+    def maxzoom(self):
+        return max(self.levels) if self.levels else None
+
+    def bounds(self):
+        """(west, south, east, north) of the deepest zoom level, or None"""
+        if not self.levels:
+            return None
+        level = self.levels[self.maxzoom]
+        west, _, _, north = tile_bounds(level.xmin, level.ymin, level.z)
+        _, south, east, _ = tile_bounds(level.xmax, level.ymax, level.z)
+        return west, south, east, north
+
+    def info(self):
+        return {
+            'minzoom': self.minzoom,
+            'maxzoom': self.maxzoom,
+            'bounds': self.bounds(),
+            'zooms': {z: {'xmin': l.xmin, 'xmax': l.xmax, 'ymin': l.ymin, 'ymax': l.ymax, 'count': l.count}
+                      for z, l in sorted(self.levels.items())},
+        }
+
+    def save(self, path):
+        arrays = {'meta': np.array([FORMAT_VERSION, self.source_mtime, self.source_size], dtype=np.int64)}
+        for z, level in self.levels.items():
+            arrays[f'extent_{z}'] = np.array([level.xmin, level.xmax, level.ymin, level.ymax, level.count],
+                                             dtype=np.int64)
+            if level.bits is not None:
+                arrays[f'bits_{z}'] = np.frombuffer(level.bits, dtype=np.uint8)
+            else:
+                arrays[f'starts_{z}'] = np.array(level.run_starts, dtype=np.uint64)
+                arrays[f'ends_{z}'] = np.array(level.run_ends, dtype=np.uint64)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, **arrays)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            version, mtime, size = (int(v) for v in data['meta'])
+            if version != FORMAT_VERSION:
+                raise ValueError(f"Unsupported coverage index version {version}")
+            levels = []
+            for key in data.files:
+                if not key.startswith('extent_'):
+                    continue
+                z = int(key[len('extent_'):])
+                xmin, xmax, ymin, ymax, count = (int(v) for v in data[key])
+                if f'bits_{z}' in data.files:
+                    levels.append(ZoomCoverage(z, xmin, xmax, ymin, ymax, count, bits=data[f'bits_{z}']))
+                else:
+                    levels.append(ZoomCoverage(z, xmin, xmax, ymin, ymax, count,
+                                               run_starts=data[f'starts_{z}'], run_ends=data[f'ends_{z}']))
+        return cls(levels, mtime, size)
+
+
+def _source_stamp(path):
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+def _tile_columns(path):
+    """Yield (z, xs, ys) numpy arrays of slippy coordinates per zoom level"""
+    if path.endswith('.tilepack'):
+        from tile_archive import TileArchive
+        archive = TileArchive(path)
+        try:
+            keys = np.array(archive.keys, dtype=np.uint64)
+        finally:
+            archive.close()
+        zs = (keys >> np.uint64(58)).astype(np.int64)
+        xs = ((keys >> np.uint64(29)) & np.uint64((1 << 29) - 1)).astype(np.int64)
+        ys = (keys & np.uint64((1 << 29) - 1)).astype(np.int64)
+        for z in np.unique(zs):
+            mask = zs == z
+            yield int(z), xs[mask], ys[mask]
+        return
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(path))}?mode=ro", uri=True)
+    try:
+        zooms = [row[0] for row in conn.execute("SELECT DISTINCT zoom_level FROM tiles ORDER BY zoom_level")]
+        for z in zooms:
+            rows = conn.execute("SELECT tile_column, tile_row FROM tiles WHERE zoom_level=?", (z,)).fetchall()
+            coords = np.array(rows, dtype=np.int64).reshape(-1, 2)
+            yield z, coords[:, 0], ((1 << z) - 1) - coords[:, 1]
+    finally:
+        conn.close()
+
+
+def build_coverage(path):
+    """Scan a .mbtiles or .tilepack file and build its coverage index"""
+    mtime, size = _source_stamp(path)
+    levels = [ZoomCoverage.build(z, xs, ys) for z, xs, ys in _tile_columns(path) if len(xs)]
+    return TileCoverage(levels, mtime, size)
+
+
+def coverage_path(path):
+    return path + COVERAGE_SUFFIX
+
+
+def load_coverage(path, build=True):
+    """Load the saved index if it matches the file's mtime/size, otherwise rebuild it"""
+    index_path = coverage_path(path)
+    if os.path.exists(index_path):
+        try:
+            coverage = TileCoverage.load(index_path)
+            if (coverage.source_mtime, coverage.source_size) == _source_stamp(path):
+                return coverage
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Coverage index ignored ({index_path}): {e}")
+    if not build:
+        return None
+    coverage = build_coverage(path)
+    try:
+        coverage.save(index_path)
+    except OSError as e:
+        print(f"Coverage index could not be saved ({index_path}): {e}")
+    return coverage
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tile seti kapsama indeksi oluşturucu")
+    parser.add_argument('tilesets', nargs='+', help=".mbtiles veya .tilepack dosyaları")
+    args = parser.parse_args()
+    for tileset in args.tilesets:
+        start = time.perf_counter()
+        coverage = build_coverage(tileset)
+        coverage.save(coverage_path(tileset))
+        info = coverage.info()
+        print(f"{tileset}: zoom {info['minzoom']}-{info['maxzoom']}, bounds {info['bounds']}, "
+              f"{time.perf_counter() - start:.1f} s")
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Tile Math Module
+Web Mercator (slippy map) tile coordinate helpers
+"""
+
+import math
+
+EARTH_RADIUS = 6378137.0
+MAX_LATITUDE = 85.0511287798
+
+
+def lonlat_to_tile_float(lat, lon, z):
+    """Fractional slippy tile coordinates (x, y) of a WGS84 position at zoom z"""
+    lat = max(-MAX_LATITUDE, min(MAX_LATITUDE, lat))
+    n = 1 << z
+    x = (lon + 180.0) / 360.0 * n
+    y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+    return x, y
+
+
+def lonlat_to_tile(lat, lon, z):
+    """Slippy tile (x, y) containing a WGS84 position at zoom z"""
+    n = 1 << z
+    x, y = lonlat_to_tile_float(lat, lon, z)
+    return min(n - 1, max(0, int(x))), min(n - 1, max(0, int(y)))
+
+
+def tile_to_lonlat(x, y, z):
+    """WGS84 (lat, lon) of the north-west corner of slippy tile (x, y, z)"""
+    n = 1 << z
+    lon = x / n * 360.0 - 180.0
+    lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+    return lat, lon
+
+
+def tile_bounds(x, y, z):
+    """(west, south, east, north) of slippy tile (x, y, z) in degrees"""
+    north, west = tile_to_lonlat(x, y, z)
+    south, east = tile_to_lonlat(x + 1, y + 1, z)
+    return west, south, east, north
+
+
+def offset_position(lat, lon, north_m, east_m):
+    """Move a position by metres north/east (equirectangular, fine for short hops)"""
+    dlat = math.degrees(north_m / EARTH_RADIUS)
+    dlon = math.degrees(east_m / (EARTH_RADIUS * math.cos(math.radians(lat))))
+    return lat + dlat, lon + dlon
+
+
+def displacement(lat1, lon1, lat2, lon2):
+    """Metres (north, east) from the first position to the second"""
+    north = math.radians(lat2 - lat1) * EARTH_RADIUS
+    east = math.radians(lon2 - lon1) * EARTH_RADIUS * math.cos(math.radians((lat1 + lat2) / 2))
+    return north, east
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+"""
+Tile Metrics Module
+Low-overhead request counters and per-zoom latency histograms for the tile server
+"""
+
+import threading
+from bisect import bisect_left
+
+# 50 µs ile ~30 s arası geometrik kova sınırları (saniye)
+LATENCY_BUCKETS = tuple(0.00005 * 1.5 ** i for i in range(34))
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class LatencyHistogram:
+    """Fixed-bucket histogram; quantiles are estimated from the bucket bounds"""
+    __slots__ = ('counts', 'total', 'count')
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q):
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                lower = LATENCY_BUCKETS[i - 1] if i > 0 else 0.0
+                upper = LATENCY_BUCKETS[i] if i < len(LATENCY_BUCKETS) else LATENCY_BUCKETS[-1]
+                # Kova içinde doğrusal ara değer
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return LATENCY_BUCKETS[-1]
+
+
+class ServerMetrics:
+    """Counters shared by every request thread; each update is one short lock hold
+
+    SQLite time is split by thread: reads made while the thread is inside
+    begin()/end() count towards sqlite_seconds (and sqlite_ratio against
+    handler_seconds); reads by the prefetch warmer or the overzoom pool are
+    background_sqlite_seconds.
+    """
+
+    def __init__(self):
+        self.status_counts = {}
+        self.zoom_latency = {}
+        self.bytes_served = 0
+        self.handler_seconds = 0.0
+        self.sqlite_seconds = 0.0
+        self.background_sqlite_seconds = 0.0
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def begin(self):
+        self._local.depth = getattr(self._local, 'depth', 0) + 1
+        with self._lock:
+            self.in_flight += 1
+
+    def end(self):
+        self._local.depth -= 1
+        with self._lock:
+            self.in_flight -= 1
+
+    def add_sqlite_time(self, seconds):
+        foreground = getattr(self._local, 'depth', 0) > 0
+        with self._lock:
+            if foreground:
+                self.sqlite_seconds += seconds
+            else:
+                self.background_sqlite_seconds += seconds
+
+    def record(self, zoom, status, nbytes, seconds):
+        with self._lock:
+            self.status_counts[status] = self.status_counts.get(status, 0) + 1
+            self.bytes_served += nbytes
+            self.handler_seconds += seconds
+            if zoom is not None:
+                histogram = self.zoom_latency.get(zoom)
+                if histogram is None:
+                    histogram = self.zoom_latency[zoom] = LatencyHistogram()
+                histogram.observe(seconds)
+
+    def snapshot(self, cache_stats=None):
+        """Plain-dict view of all metrics (served as /metrics.json)"""
+        with self._lock:
+            zooms = {}
+            for zoom, histogram in sorted(self.zoom_latency.items()):
+                zooms[zoom] = {
+                    'count': histogram.count,
+                    'mean': histogram.total / histogram.count if histogram.count else 0.0,
+                    **{f'p{int(q * 100)}': histogram.quantile(q) for q in QUANTILES},
+                }
+            return {
+                'requests': dict(sorted(self.status_counts.items())),
+                'in_flight': self.in_flight,
+                'bytes_served': self.bytes_served,
+                'handler_seconds': self.handler_seconds,
+                'sqlite_seconds': self.sqlite_seconds,
+                'sqlite_ratio': self.sqlite_seconds / self.handler_seconds if self.handler_seconds else 0.0,
+                'background_sqlite_seconds': self.background_sqlite_seconds,
+                'cache': cache_stats,
+                'zooms': zooms,
+            }
+
+    def prometheus(self, cache_stats=None):
+        """Metrics in the Prometheus text exposition format"""
+        lines = ['# TYPE tile_requests_total counter']
+        with self._lock:
+            for status, count in sorted(self.status_counts.items()):
+                lines.append(f'tile_requests_total{{status="{status}"}} {count}')
+            lines += [
+                '# TYPE tile_requests_in_flight gauge',
+                f'tile_requests_in_flight {self.in_flight}',
+                '# TYPE tile_bytes_served_total counter',
+                f'tile_bytes_served_total {self.bytes_served}',
+                '# TYPE tile_handler_seconds_total counter',
+                f'tile_handler_seconds_total {self.handler_seconds:.6f}',
+                '# TYPE tile_sqlite_seconds_total counter',
+                f'tile_sqlite_seconds_total {self.sqlite_seconds:.6f}',
+                '# TYPE tile_background_sqlite_seconds_total counter',
+                f'tile_background_sqlite_seconds_total {self.background_sqlite_seconds:.6f}',
+                '# TYPE tile_request_seconds histogram',
+            ]
+            quantile_lines = ['# TYPE tile_request_seconds_quantile gauge']
+            for zoom, histogram in sorted(self.zoom_latency.items()):
+                cumulative = 0
+                for bound, count in zip(LATENCY_BUCKETS, histogram.counts):
+                    cumulative += count
+                    lines.append(f'tile_request_seconds_bucket{{zoom="{zoom}",le="{bound:.6g}"}} {cumulative}')
+                lines.append(f'tile_request_seconds_bucket{{zoom="{zoom}",le="+Inf"}} {histogram.count}')
+                lines.append(f'tile_request_seconds_sum{{zoom="{zoom}"}} {histogram.total:.6f}')
+                lines.append(f'tile_request_seconds_count{{zoom="{zoom}"}} {histogram.count}')
+                for q in QUANTILES:
+                    quantile_lines.append(f'tile_request_seconds_quantile{{zoom="{zoom}",quantile="{q}"}} '
+                                          f'{histogram.quantile(q):.6f}')
+            lines += quantile_lines
+        if cache_stats:
+            lines += [
+                '# TYPE tile_cache_hits_total counter',
+                f'tile_cache_hits_total {cache_stats["hits"]}',
+                '# TYPE tile_cache_misses_total counter',
+                f'tile_cache_misses_total {cache_stats["misses"]}',
+                '# TYPE tile_cache_evictions_total counter',
+                f'tile_cache_evictions_total {cache_stats["evictions"]}',
+                '# TYPE tile_cache_content_hits_total counter',
+                f'tile_cache_content_hits_total {cache_stats["content_hits"]}',
+                '# TYPE tile_cache_unique_blobs gauge',
+                f'tile_cache_unique_blobs {cache_stats["unique_blobs"]}',
+                '# TYPE tile_cache_bytes gauge',
+                f'tile_cache_bytes {cache_stats["bytes"]}',
+                '# TYPE tile_cache_hit_ratio gauge',
+                f'tile_cache_hit_ratio {cache_stats["hit_ratio"]:.6f}',
+            ]
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Tile Overzoom Module
+Synthesizes missing high-zoom tiles by cropping and upscaling an ancestor tile
+"""
+
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from PIL import Image
+
+from tile_cache import TileCache
+from mbtiles_server import tile_etag
+
+DEFAULT_OVERZOOM_LEVELS = 4
+DEFAULT_OVERZOOM_CACHE_BYTES = 32 * 1024 * 1024
+DEFAULT_OVERZOOM_WORKERS = 2
+RESAMPLE = Image.BICUBIC
+
+
+def upscale_tile(data, dz, x, y):
+    """Crop the part of an ancestor tile covering descendant (x, y) dz levels down and upscale it"""
+    with Image.open(io.BytesIO(data)) as image:
+        image_format = image.format
+        image.load()
+        width, height = image.size
+        scale = 1 << dz
+        part_w, part_h = width / scale, height / scale
+        col, row = x & (scale - 1), y & (scale - 1)
+        box = (col * part_w, row * part_h, (col + 1) * part_w, (row + 1) * part_h)
+        # resize(box=...) örneklemeyi alt bölgeden yapar; ayrı crop kopyası gerekmez
+        tile = image.resize((width, height), RESAMPLE, box=box)
+    out = io.BytesIO()
+    if image_format == 'JPEG':
+        tile.convert('RGB').save(out, 'JPEG', quality=85)
+    else:
+        tile.save(out, 'PNG')
+    return out.getvalue()
+
+
+class Overzoomer:
+    """Builds overzoomed tiles on a small worker pool and keeps them in a bounded cache
+
+    Concurrent requests for the same tile share one job. Tiles without an
+    ancestor are remembered too (as (None, None)), so they are not searched again.
+    """
+
+    def __init__(self, max_levels=DEFAULT_OVERZOOM_LEVELS, cache_bytes=DEFAULT_OVERZOOM_CACHE_BYTES,
+                 workers=DEFAULT_OVERZOOM_WORKERS):
+        self.max_levels = max_levels
+        self.cache = TileCache(cache_bytes)
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='overzoom')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def get_cached(self, name, z, x, y, lookups=None):
+        """Synthesized (tile data, ETag) from memory, or None if unknown or without an ancestor"""
+        entry = self.cache.get((name, z, x, y), lookups)
+        return entry if entry is not None and entry[0] is not None else None
+
+    def get(self, name, z, x, y, lookup):
+        """Synthesized (tile data, ETag) for a missing tile, or None if no ancestor exists
+
+        lookup(z, x, y) returns the bytes of a real tile or None.
+        """
+        key = (name, z, x, y)
+        entry = self.cache.get(key)
+        if entry is not None:
+            return entry if entry[0] is not None else None
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is None:
+                future = self._executor.submit(self._build, key, lookup)
+                self._jobs[key] = future
+        return future.result()
+
+    def _build(self, key, lookup):
+        name, z, x, y = key
+        try:
+            for dz in range(1, min(self.max_levels, z) + 1):
+                ancestor = lookup(z - dz, x >> dz, y >> dz)
+                if ancestor is None:
+                    continue
+                data = upscale_tile(ancestor, dz, x, y)
+                entry = (data, tile_etag(data))
+                self.cache.put(key, entry, len(data))
+                return entry
+            # Atası olmayan tile da hatırlanır; sonraki istekler atalarını yeniden sorgulamaz
+            self.cache.put(key, (None, None), 0)
+            return None
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,227 @@
+#!/usr/bin/env python3
+"""
+Tile Prefetch Module
+Predicts the tiles under and ahead of the aircraft and warms the tile server cache
+"""
+
+import json
+import threading
+import time
+import http.client
+from collections import deque, OrderedDict
+
+from tile_math import lonlat_to_tile, offset_position, displacement
+
+# Harita zoom'unu bildirene kadar (set_zooms) kullanılan seviyeler
+DEFAULT_ZOOMS = (14, 15, 16)
+# Uçağın etrafında önceden yüklenecek tile yarıçapı (tile cinsinden)
+VIEW_RADIUS = 2
+PATH_RADIUS = 1
+HORIZON_SECONDS = 60.0
+MAX_SENT_MEMORY = 20000
+
+
+class TrackPredictor:
+    """Estimates ground velocity from the last few fixes and lists upcoming tiles"""
+
+    def __init__(self, history=5, zooms=DEFAULT_ZOOMS, view_radius=VIEW_RADIUS,
+                 path_radius=PATH_RADIUS, horizon=HORIZON_SECONDS):
+        self.fixes = deque(maxlen=history)
+        self.zooms = tuple(zooms)
+        self.view_radius = view_radius
+        self.path_radius = path_radius
+        self.horizon = horizon
+
+    def add_fix(self, lat, lon, t=None):
+        self.fixes.append((time.monotonic() if t is None else t, lat, lon))
+
+    def velocity(self):
+        """Ground velocity (north m/s, east m/s) over the fix history"""
+        if len(self.fixes) < 2:
+            return 0.0, 0.0
+        t0, lat0, lon0 = self.fixes[0]
+        t1, lat1, lon1 = self.fixes[-1]
+        dt = t1 - t0
+        if dt <= 0:
+            return 0.0, 0.0
+        north, east = displacement(lat0, lon0, lat1, lon1)
+        return north / dt, east / dt
+
+    def projected_path(self):
+        """Positions along the projected track, spaced so no tile is skipped"""
+        if not self.fixes:
+            return []
+        _, lat, lon = self.fixes[-1]
+        v_north, v_east = self.velocity()
+        speed = (v_north ** 2 + v_east ** 2) ** 0.5
+        points = [(lat, lon)]
+        if speed < 0.5:
+            return points
+        # En yüksek zoom'daki tile boyunun yarısı kadar adım
+        tile_metres = 40075016.0 / (1 << max(self.zooms)) / 2
+        steps = int(min(speed * self.horizon / tile_metres, 200))
+        for i in range(1, steps + 1):
+            t = self.horizon * i / steps
+            points.append(offset_position(lat, lon, v_north * t, v_east * t))
+        return points
+
+    def tiles(self):
+        """Tiles for the current view and the projected path, nearest first"""
+        path = self.projected_path()
+        if not path:
+            return []
+        ordered = OrderedDict()
+        for z in self.zooms:
+            cx, cy = lonlat_to_tile(path[0][0], path[0][1], z)
+            self._add_square(ordered, z, cx, cy, self.view_radius)
+        for lat, lon in path[1:]:
+            for z in self.zooms:
+                x, y = lonlat_to_tile(lat, lon, z)
+                self._add_square(ordered, z, x, y, self.path_radius)
+        return list(ordered)
+
+    @staticmethod
+    def _add_square(ordered, z, cx, cy, radius):
+        n = 1 << z
+        for x in range(cx - radius, cx + radius + 1):
+            for y in range(cy - radius, cy + radius + 1):
+                if 0 <= y < n:
+                    ordered[(z, x % n, y)] = None
+
+
+class HttpPrefetchSink:
+    """Sends tile lists to the /prefetch endpoint of mbtiles_server.py
+
+    Returns how many tiles the server queued (the first N of the list).
+    """
+
+    def __init__(self, host='127.0.0.1', port=8080, timeout=2.0):
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+        self._conn = None
+
+    def __call__(self, tileset, tiles):
+        body = json.dumps(tiles).encode('utf-8')
+        path = f"/prefetch/{tileset}" if tileset else "/prefetch"
+        for attempt in range(2):
+            if self._conn is None:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            try:
+                self._conn.request('POST', path, body, {'Content-Type': 'application/json'})
+                response = self._conn.getresponse()
+                reply = response.read()
+            except (OSError, http.client.HTTPException):
+                # Keep-alive bağlantısı sunucu tarafında kapanmış olabilir; bir kez yeniden dene
+                self._conn.close()
+                self._conn = None
+                continue
+            if response.status != 202:
+                return 0
+            try:
+                return int(json.loads(reply)['queued'])
+            except (ValueError, KeyError, TypeError):
+                return 0
+        return 0
+
+
+class ServicePrefetchSink:
+    """Hands tile lists straight to an in-process TileService's cache warmer"""
+
+    def __init__(self, service):
+        self.service = service
+
+    def __call__(self, tileset, tiles):
+        """Returns how many tiles the warmer queued (the first N of the list)"""
+        warmer = self.service.warmer
+        if warmer is None or self.service.tilesets.find(tileset or self.service.tilesets.default) is None:
+            return 0
+        return warmer.submit(tileset or self.service.tilesets.default, [tuple(tile) for tile in tiles])
+
+
+class TilePrefetcher:
+    """Background stage: GPS fixes in, predicted tile lists out to a sink
+
+    add_fix() only records the fix and wakes the worker, so it is cheap enough
+    to call from the GUI thread for every telemetry sample. Tiles already sent
+    recently are not sent again; tiles the sink did not accept (queue full)
+    are offered again on the next round.
+    """
+
+    def __init__(self, sink, tileset=None, min_interval=1.0, **predictor_options):
+        self.sink = sink
+        self.tileset = tileset
+        self.min_interval = min_interval
+        self.predictor = TrackPredictor(**predictor_options)
+        self.sent = OrderedDict()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='tile-prefetch', daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        self._wake.set()
+        if self._thread:
+            self._thread.join(timeout=2)
+
+    def add_fix(self, lat, lon):
+        with self._lock:
+            self.predictor.add_fix(lat, lon)
+        self._wake.set()
+
+    def on_telemetry(self, data):
+        """Slot for TelemetryThread.telemetry_updated"""
+        self.add_fix(data['gps']['lat'], data['gps']['lon'])
+
+    def on_telemetry_batch(self, batch):
+        """Slot for TelemetryThread.telemetry_batch: only the newest fix matters"""
+        if len(batch):
+            self.add_fix(float(batch['lat'][-1]), float(batch['lon'][-1]))
+
+    def set_tileset(self, tileset):
+        with self._lock:
+            self.tileset = tileset
+            self.sent.clear()
+
+    def set_zooms(self, zooms):
+        """Prefetch at these zoom levels from now on (e.g. the visible zoom ±1)"""
+        zooms = tuple(zooms)
+        with self._lock:
+            if zooms == self.predictor.zooms:
+                return
+            self.predictor.zooms = zooms
+        # Yeni seviyelerin tile'ları bir sonraki konumu beklemeden istenir
+        self._wake.set()
+
+    def _run(self):
+        while self._running:
+            self._wake.wait()
+            self._wake.clear()
+            if not self._running:
+                break
+            started = time.monotonic()
+            with self._lock:
+                tiles = self.predictor.tiles()
+                tileset = self.tileset
+                fresh = [list(tile) for tile in tiles if tile not in self.sent]
+            if fresh:
+                try:
+                    # Sink kabul ettiği tile sayısını döner; gerisi sonraki turda yeniden gönderilir
+                    delivered = self.sink(tileset, fresh)
+                except Exception as e:
+                    print(f"Tile prefetch error: {e}")
+                    delivered = 0
+                if delivered:
+                    with self._lock:
+                        for tile in fresh[:delivered]:
+                            self.sent[tuple(tile)] = None
+                        while len(self.sent) > MAX_SENT_MEMORY:
+                            self.sent.popitem(last=False)
+            # Düşük öncelik: saniyede en fazla bir tahmin turu
+            time.sleep(max(0.0, self.min_interval - (time.monotonic() - started)))
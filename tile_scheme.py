@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Tile Scheme Module
+Serves the tile service to QWebEngine through an in-process mbtiles:// URL scheme
+
+mbtiles://local/<yol> istekleri mbtiles_server.py ile aynı TileService
+tarafından yanıtlanır (/tiles/..., /batch/..., /static/...); TCP bağlantısı,
+ayrı süreç ya da port gerekmez. Okumalar iş parçacığı havuzunda yapılır,
+yanıtlar GUI iş parçacığına sinyal ile döner.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+from PyQt5.QtCore import QBuffer, QByteArray, pyqtSignal, pyqtSlot
+from PyQt5.QtWebEngineCore import QWebEngineUrlScheme, QWebEngineUrlSchemeHandler, QWebEngineUrlRequestJob
+
+from mbtiles_server import BodyParts, tile_bytes
+
+SCHEME = b'mbtiles'
+BASE_URL = 'mbtiles://local/'
+DEFAULT_SCHEME_WORKERS = 8
+
+
+def register_tile_scheme():
+    """Declare the mbtiles:// scheme; must run before the QApplication is created"""
+    scheme = QWebEngineUrlScheme(SCHEME)
+    scheme.setSyntax(QWebEngineUrlScheme.Syntax.Host)
+    scheme.setFlags(QWebEngineUrlScheme.SecureScheme | QWebEngineUrlScheme.LocalAccessAllowed |
+                    QWebEngineUrlScheme.CorsEnabled)
+    QWebEngineUrlScheme.registerScheme(scheme)
+
+
+class TileSchemeHandler(QWebEngineUrlSchemeHandler):
+    """Answers mbtiles:// requests from a TileService on a worker pool
+
+    A job can be destroyed by the page (e.g. a tile scrolled out of view)
+    before its answer arrives; such late answers are dropped.
+    """
+    response_ready = pyqtSignal(object, object)
+
+    def __init__(self, service, workers=DEFAULT_SCHEME_WORKERS, parent=None):
+        super().__init__(parent)
+        self.service = service
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='tile-scheme')
+        self._live = set()
+        # Çapraz iş parçacığı sinyali: yanıt GUI iş parçacığında kuyruklu olarak işlenir
+        self.response_ready.connect(self._reply)
+
+    def requestStarted(self, job):
+        method = bytes(job.requestMethod()).decode('latin-1')
+        if method not in ('GET', 'HEAD'):
+            job.fail(QWebEngineUrlRequestJob.RequestDenied)
+            return
+        url = job.requestUrl()
+        path = url.path() or '/'
+        if url.hasQuery():
+            path += '?' + url.query()
+        headers = {}
+        if hasattr(job, 'requestHeaders'):
+            headers = {bytes(k).decode('latin-1'): bytes(v).decode('latin-1')
+                       for k, v in job.requestHeaders().items()}
+        # Şema yanıtlarında durum kodu ve başlık yok: 304 ve sıkıştırılmış gövde gönderilemez
+        headers = {k: v for k, v in headers.items() if k.lower() not in ('if-none-match', 'accept-encoding')}
+        key = id(job)
+        self._live.add(key)
+        job.destroyed.connect(lambda *_, key=key: self._live.discard(key))
+        self._executor.submit(self._handle, job, key, path, _Headers(headers))
+
+    def _handle(self, job, key, path, headers):
+        try:
+            response = self.service.handle(path, headers)
+        except Exception as e:
+            print(f"Tile scheme error for {path}: {e}")
+            response = None
+        self.response_ready.emit((job, key), response)
+
+    @pyqtSlot(object, object)
+    def _reply(self, target, response):
+        job, key = target
+        if key not in self._live:
+            return
+        self._live.discard(key)
+        if response is None:
+            job.fail(QWebEngineUrlRequestJob.RequestFailed)
+            return
+        status, headers, body = response
+        if status == 404:
+            job.fail(QWebEngineUrlRequestJob.UrlNotFound)
+            return
+        if status >= 400:
+            job.fail(QWebEngineUrlRequestJob.RequestFailed)
+            return
+        content_type = dict(headers).get('Content-Type', 'application/octet-stream')
+        if isinstance(body, BodyParts):
+            data = b''.join(tile_bytes(part) for part in body.parts)
+        else:
+            data = tile_bytes(body)
+        # Tampon işin çocuğu: iş silinince tampon da silinir
+        buffer = QBuffer(job)
+        buffer.setData(QByteArray(data))
+        buffer.open(QBuffer.ReadOnly)
+        job.reply(content_type.split(';')[0].encode('latin-1'), buffer)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+class _Headers(dict):
+    """Case-insensitive header lookup compatible with http.server's headers"""
+
+    def __init__(self, headers):
+        super().__init__((name.lower(), value) for name, value in headers.items())
+
+    def get(self, name, default=None):
+        return dict.get(self, name.lower(), default)
@@ -0,0 +1,269 @@
+#!/usr/bin/env python3
+"""
+Tile Transcode Module
+Re-encodes stored PNG tiles as WebP/JPEG for clients that accept them, with a
+bounded in-memory cache in front of a bounded on-disk cache
+
+Çevrimdışı toplu mod bir tile setinin tamamını önceden disk önbelleğine yazar:
+    python tile_transcode.py map/ankara.mbtiles --formats webp,jpeg
+"""
+
+import io
+import os
+import sqlite3
+import argparse
+import threading
+import time
+from collections import OrderedDict
+from urllib.request import pathname2url
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+
+from PIL import Image
+
+from tile_cache import TileCache
+from mbtiles_server import tile_bytes, tile_etag, sniff_format, accepted_values
+
+TARGETS = {
+    'webp': ('image/webp', 'WEBP'),
+    'jpeg': ('image/jpeg', 'JPEG'),
+}
+DEFAULT_QUALITY = 80
+DEFAULT_TRANSCODE_CACHE_BYTES = 32 * 1024 * 1024
+DEFAULT_DISK_BYTES = 1024 * 1024 * 1024
+DEFAULT_TRANSCODE_WORKERS = 2
+# Yeniden kodlanan tile en az bu oranda küçülmüyorsa özgün PNG gönderilir
+MAX_SIZE_RATIO = 0.9
+TRANSCODE_DIR = '.transcode'
+
+
+def transcode_tile(data, target, quality=DEFAULT_QUALITY):
+    """Encode a PNG tile as target ('webp' or 'jpeg'), or None if it would lose transparency"""
+    with Image.open(io.BytesIO(data)) as image:
+        image.load()
+        if image.mode == 'P':
+            image = image.convert('RGBA' if 'transparency' in image.info else 'RGB')
+        if image.mode in ('RGBA', 'LA'):
+            # Tamamen opak alfa kanalı atılır; gerçekten saydam tile'lar JPEG'e çevrilmez
+            if image.getextrema()[-1][0] == 255:
+                image = image.convert('RGB')
+            elif target == 'jpeg':
+                return None
+        elif image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+        out = io.BytesIO()
+        image.save(out, TARGETS[target][1], quality=quality)
+    return out.getvalue()
+
+
+def accepted_targets(accept, targets):
+    """Targets (in server preference order) that an Accept header allows"""
+    allowed = accepted_values(accept)
+    return [t for t in targets if TARGETS[t][0] in allowed or 'image/*' in allowed or '*/*' in allowed]
+
+
+class DiskCache:
+    """Directory of transcoded tiles named by content, trimmed to max_bytes (oldest first)"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_DISK_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._files = OrderedDict()
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        entries = []
+        for name in os.listdir(directory):
+            if name.endswith('.tmp'):
+                continue
+            st = os.stat(os.path.join(directory, name))
+            entries.append((st.st_mtime, name, st.st_size))
+        for _, name, size in sorted(entries):
+            self._files[name] = size
+            self.current_bytes += size
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._files
+
+    def get(self, name):
+        with self._lock:
+            if name not in self._files:
+                return None
+            self._files.move_to_end(name)
+        try:
+            with open(os.path.join(self.directory, name), 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def put(self, name, data):
+        path = os.path.join(self.directory, name)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        evicted = []
+        with self._lock:
+            self.current_bytes += len(data) - self._files.pop(name, 0)
+            self._files[name] = len(data)
+            while self.current_bytes > self.max_bytes and len(self._files) > 1:
+                old, size = self._files.popitem(last=False)
+                self.current_bytes -= size
+                evicted.append(old)
+        for old in evicted:
+            try:
+                os.remove(os.path.join(self.directory, old))
+            except OSError:
+                pass
+
+
+class Transcoder:
+    """Negotiates and produces transcoded tiles on a small worker pool
+
+    Results are keyed by the source ETag (a content hash), so identical tiles
+    share one transcoded copy. Concurrent requests for the same tile share one job.
+    """
+
+    def __init__(self, targets=('webp',), quality=DEFAULT_QUALITY, cache_bytes=DEFAULT_TRANSCODE_CACHE_BYTES,
+                 disk_dir=None, disk_bytes=DEFAULT_DISK_BYTES, workers=DEFAULT_TRANSCODE_WORKERS):
+        self.targets = tuple(targets)
+        for target in self.targets:
+            if target not in TARGETS:
+                raise ValueError(f"Unsupported transcode format: {target}")
+        self.quality = quality
+        self.cache = TileCache(cache_bytes)
+        self.disk = None
+        if disk_dir and disk_bytes > 0:
+            try:
+                self.disk = DiskCache(disk_dir, disk_bytes)
+            except OSError as e:
+                print(f"Transcode disk cache disabled ({disk_dir}): {e}")
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='transcode')
+        self._jobs = {}
+        self._lock = threading.Lock()
+
+    def negotiate(self, accept, data):
+        """Target format for this client and source tile, or None to send it unchanged"""
+        if sniff_format(data) != 'image/png':
+            return None
+        targets = accepted_targets(accept, self.targets)
+        return targets[0] if targets else None
+
+    @staticmethod
+    def etag(source_etag, target):
+        return source_etag[:-1] + '.' + target + '"'
+
+    def get_cached(self, entry, target, lookups=None):
+        """Transcoded (data, ETag) from memory, the source entry if not worth it, or None if unknown"""
+        result = self.cache.get((entry[1], target), lookups)
+        if result is None:
+            return None
+        return result if result[0] is not None else entry
+
+    def get(self, entry, target):
+        """Transcoded (data, ETag), or the source entry when transcoding does not pay off"""
+        result = self.get_cached(entry, target)
+        if result is not None:
+            return result
+        key = (entry[1], target)
+        with self._lock:
+            future = self._jobs.get(key)
+            if future is None:
+                future = self._executor.submit(self._build, key, entry)
+                self._jobs[key] = future
+        result = future.result()
+        return result if result[0] is not None else entry
+
+    def _build(self, key, entry):
+        source_etag, target = key
+        etag = self.etag(source_etag, target)
+        name = etag.strip('"')
+        try:
+            data = self.disk.get(name) if self.disk is not None else None
+            if data is None:
+                source = tile_bytes(entry[0])
+                data = transcode_tile(source, target, self.quality)
+                if data is not None and len(data) > len(source) * MAX_SIZE_RATIO:
+                    data = None
+                if data is not None and self.disk is not None:
+                    try:
+                        self.disk.put(name, data)
+                    except OSError as e:
+                        print(f"Transcode disk cache write failed: {e}")
+            # Kodlamaya değmeyen tile'lar da hatırlanır (None verisiyle)
+            result = (data, etag) if data is not None else (None, None)
+            self.cache.put(key, result, len(data) if data is not None else 0)
+            return result
+        finally:
+            with self._lock:
+                self._jobs.pop(key, None)
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+
+def _transcode_job(args):
+    data, etag, targets, quality = args
+    results = []
+    for target in targets:
+        out = transcode_tile(data, target, quality)
+        if out is not None and len(out) <= len(data) * MAX_SIZE_RATIO:
+            results.append((Transcoder.etag(etag, target).strip('"'), out))
+    return len(data), results
+
+
+def pretranscode(mbtiles_path, targets, disk_dir, quality=DEFAULT_QUALITY, workers=None):
+    """Fill the disk cache with every distinct PNG tile of a tileset
+
+    Returns (distinct tiles transcoded, files written, source bytes, output bytes).
+    """
+    # Toplu modda boyut sınırı yok; sunucu sonraki yazımlarda kendi sınırına göre kırpar
+    disk = DiskCache(disk_dir, max_bytes=float('inf'))
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(mbtiles_path))}?mode=ro", uri=True)
+    seen = set()
+
+    def jobs():
+        for (data,) in conn.execute("SELECT tile_data FROM tiles"):
+            if sniff_format(data) != 'image/png':
+                continue
+            etag = tile_etag(data)
+            if etag in seen:
+                continue
+            seen.add(etag)
+            pending = [t for t in targets if Transcoder.etag(etag, t).strip('"') not in disk]
+            if pending:
+                yield data, etag, pending, quality
+
+    tiles = written = source_bytes = output_bytes = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for size, results in pool.map(_transcode_job, jobs(), chunksize=64):
+                tiles += 1
+                source_bytes += size
+                for name, data in results:
+                    disk.put(name, data)
+                    written += 1
+                    output_bytes += len(data)
+    finally:
+        conn.close()
+    return tiles, written, source_bytes, output_bytes
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Tile setini önceden WebP/JPEG'e dönüştür (sunucunun disk önbelleğine)")
+    parser.add_argument('mbtiles', help="Kaynak .mbtiles dosyası")
+    parser.add_argument('--formats', default='webp', help="Hedef biçimler, ör. webp,jpeg")
+    parser.add_argument('--cache-dir', help=f"Disk önbelleği (varsayılan: <harita dizini>/{TRANSCODE_DIR})")
+    parser.add_argument('--quality', type=int, default=DEFAULT_QUALITY)
+    parser.add_argument('--workers', type=int, help="Süreç sayısı (varsayılan: CPU sayısı)")
+    args = parser.parse_args()
+    targets = [t.strip() for t in args.formats.split(',') if t.strip()]
+    for target in targets:
+        if target not in TARGETS:
+            parser.error(f"Desteklenmeyen biçim: {target}")
+    cache_dir = args.cache_dir or os.path.join(os.path.dirname(os.path.abspath(args.mbtiles)), TRANSCODE_DIR)
+    start = time.perf_counter()
+    tiles, written, source_bytes, output_bytes = pretranscode(args.mbtiles, targets, cache_dir,
+                                                              args.quality, args.workers)
+    print(f"{tiles} tile işlendi, {written} dosya yazıldı ({cache_dir}); "
+          f"{source_bytes / 2**20:.1f} MB -> {output_bytes / 2**20:.1f} MB, {time.perf_counter() - start:.1f} s")